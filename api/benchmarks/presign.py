@@ -0,0 +1,80 @@
+"""
+Compares presigning file links through the aioboto3 client with the
+local SigV4 presigner, one link per call and in batches.
+
+Nothing is sent to the storage. Run it from the api directory with a
+configured environment (.env):
+
+    python -m benchmarks.presign [--links 20000] [--batch-size 50]
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from uuid import uuid4
+from typing import Awaitable, Callable
+
+
+async def measure(
+    name: str, links: int, sign: Callable[[], Awaitable[int]]
+) -> None:
+    await sign()  # Warms the client and the signing key up
+
+    signed = 0
+    started_at = time.perf_counter()
+    while signed < links:
+        signed += await sign()
+    elapsed = time.perf_counter() - started_at
+
+    print(
+        f"{name:<24}  links={signed}  "
+        f"links_per_second={signed / elapsed:,.0f}  "
+        f"per_link={elapsed / signed * 1e6:.1f}us"
+    )
+
+
+async def run(links: int, batch_size: int) -> None:
+    from micro_media.storage import STORAGE_CONTEXT, S3StorageManager
+
+    manager = STORAGE_CONTEXT.default_manager
+    if not isinstance(manager, S3StorageManager):
+        sys.exit("The default storage is not an S3 storage.")
+
+    keys = [f"image/{str(uuid4())[:8]}/{uuid4()}.jpg" for _ in range(1000)]
+
+    async def client_link() -> int:
+        async with manager.client() as client:
+            await client.generate_presigned_url(
+                "get_object",
+                ExpiresIn=3600,
+                Params={
+                    "Bucket": manager.storage_conf.bucket_name,
+                    "Key": keys[0],
+                },
+            )
+        return 1
+
+    async def local_link() -> int:
+        await manager.generate_file_link(keys[0])
+        return 1
+
+    async def local_links() -> int:
+        return len(await manager.generate_file_links(keys[:batch_size]))
+
+    await measure("client", links, client_link)
+    await measure("presigner", links, local_link)
+    await measure(f"presigner batch={batch_size}", links, local_links)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--links", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.links, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares the image resize pipeline with and without shrink-on-load.
+
+Each mode runs in a fresh process so peak RSS is measured separately.
+Run it from the api directory with a configured environment (.env):
+
+    python -m benchmarks.resize path/to/camera/images [--rounds 3]
+"""
+
+import sys
+import time
+import argparse
+import resource
+import multiprocessing
+from io import BytesIO
+from pathlib import Path
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+
+def load_corpus(directory: Path) -> list[tuple[str, bytes]]:
+    return [
+        (path.name, path.read_bytes())
+        for path in sorted(directory.iterdir())
+        if path.suffix.lower() in IMAGE_EXTENSIONS
+    ]
+
+
+def run_mode(
+    shrink_on_load: bool, corpus: list[tuple[str, bytes]], rounds: int
+) -> tuple[float, int]:
+    from micro_media.media import MEDIA_CONTEXT
+    from micro_media.media.manager import ImageMediaManager
+
+    config = MEDIA_CONTEXT.config.image.model_copy(deep=True)
+    if not config.resize:
+        sys.exit("The media config has no image resize box.")
+
+    config.resize.shrink_on_load = shrink_on_load
+    manager = ImageMediaManager(config=config, media_type="image")
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started_at = time.process_time()
+
+    for _ in range(rounds):
+        for filename, data in corpus:
+            manager.resize_and_set_format(filename, BytesIO(data))
+
+    cpu_time = time.process_time() - started_at
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return cpu_time, peak_rss - baseline_rss
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.directory)
+    if not corpus:
+        sys.exit("No images found.")
+
+    print(f"{len(corpus)} images, {args.rounds} rounds")
+
+    ctx = multiprocessing.get_context("spawn")
+    for shrink_on_load in (False, True):
+        with ctx.Pool(processes=1) as pool:
+            cpu_time, peak_rss = pool.apply(
+                run_mode, (shrink_on_load, corpus, args.rounds)
+            )
+
+        per_image = cpu_time / (len(corpus) * args.rounds) * 1000
+        print(
+            f"shrink_on_load={shrink_on_load!s:<5}  "
+            f"cpu={cpu_time:.2f}s  per_image={per_image:.1f}ms  "
+            f"peak_rss_delta={peak_rss / 1024:.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
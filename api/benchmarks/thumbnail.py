@@ -0,0 +1,117 @@
+"""
+Measures the CPU time of thumbnail redirects served through imgproxy,
+with memoized links and with links signed on every request, and of
+building the imgproxy link alone.
+
+Requests go through the app in process, after a first one warms the
+caches up. Run it from the api directory with a configured environment
+(.env) and the id of a ready image without stored thumbnails:
+
+    python -m benchmarks.thumbnail MEDIA_ID [--requests 5000] [--size md]
+"""
+
+import time
+import asyncio
+import argparse
+from uuid import UUID
+
+import httpx
+
+
+async def measure_requests(
+    client: httpx.AsyncClient, url: str, requests: int, memoize: bool
+) -> float:
+    from micro_media import links
+
+    started_at = time.process_time()
+    for _ in range(requests):
+        if not memoize:
+            links._imgproxy_links.clear()
+
+        response = await client.get(url)
+        assert response.status_code == 302, response.status_code
+
+    return time.process_time() - started_at
+
+
+def measure_links(
+    media_id: UUID, size: str, original_file_link: str, count: int
+) -> None:
+    from micro_media import links
+    from micro_media.media import MEDIA_CONTEXT
+    from micro_media.media.manager import ImageMediaManager
+
+    manager = MEDIA_CONTEXT.get_manager("image")
+    assert isinstance(manager, ImageMediaManager)
+
+    size_name = manager.resolve_thumbnail_size(
+        None if size == "default" else size
+    )
+    size_conf = manager.get_thumbnail_size_conf(size_name)
+    media = links.MediaLocator(
+        id=media_id,
+        media_type="image",
+        storage_id=media_id,
+        file_identifier="",
+    )
+
+    for memoize in (False, True):
+        started_at = time.process_time()
+        for _ in range(count):
+            if not memoize:
+                links._imgproxy_links.clear()
+
+            links.get_imgproxy_thumbnail_link(
+                media=media,
+                original_file_link=original_file_link,
+                size_name=size_name,
+                thumbnail_size=size_conf,
+            )
+        cpu_time = time.process_time() - started_at
+
+        print(
+            f"link only  memoize={memoize!s:<5}  "
+            f"per_link={cpu_time / count * 1e6:.1f}us"
+        )
+
+
+async def run(media_id: UUID, requests: int, size: str) -> None:
+    from micro_media.main import app
+    from micro_media.links import get_media_locator, get_original_link
+
+    url = f"/v1/public/media/thumbnail/{media_id}?size={size}"
+    transport = httpx.ASGITransport(app=app)
+
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+        response = await client.get(url)
+        if response.status_code != 302:
+            raise SystemExit(f"{url} responded {response.status_code}.")
+
+        for memoize in (False, True):
+            cpu_time = await measure_requests(client, url, requests, memoize)
+
+            print(
+                f"redirect  memoize={memoize!s:<5}  requests={requests}  "
+                f"per_request={cpu_time / requests * 1e6:.0f}us"
+            )
+
+        original_file_link = await get_original_link(
+            media=await get_media_locator(media_id)
+        )
+        measure_links(media_id, size, original_file_link, requests * 10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("media_id", type=UUID)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--size", default="default")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.media_id, args.requests, args.size))
+
+
+if __name__ == "__main__":
+    main()
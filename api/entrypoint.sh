@@ -4,6 +4,11 @@ set -e
 # Add /app to PYTHONPATH
 export PYTHONPATH="$(pwd):$PYTHONPATH"
 
+# Media processing worker, see MEDIA_PROCESSING_MODE
+if [[ "${1:-}" == "worker" ]]; then
+    exec python -m micro_media.worker
+fi
+
 gunicorn_bind="${GUNICORN_BIND:-}"
 gunicorn_certfile="${GUNICORN_CERT_FILE:-}"
 gunicorn_keyfile="${GUNICORN_KEY_FILE:-}"
@@ -0,0 +1,57 @@
+from uuid import UUID
+
+from redis.asyncio.client import Redis
+
+
+# Uploads can be finalized this long after their links expire
+FINALIZE_GRACE_PERIOD = 60 * 60  # 1 hour
+
+
+class DirectUploads:
+    """
+    Remembers which owner each direct upload's object key was issued to,
+    so only they can finalize it. Keys' prefixes only carry part of the
+    owner's id and might be guessed.
+    """
+
+    prefix: str
+    redis: Redis
+
+    @classmethod
+    def init(cls, redis: Redis, prefix: str) -> None:
+        cls.redis = redis
+        cls.prefix = prefix
+
+    @classmethod
+    def _key(cls, file_identifier: str) -> str:
+        return cls.prefix + file_identifier
+
+    @classmethod
+    async def issue(
+        cls, file_identifier: str, owner_id: UUID, expires_in: int
+    ) -> None:
+        """Records the object key as issued to the owner.
+
+        Args:
+            file_identifier (str): The issued object key.
+            owner_id (UUID): The owner's id.
+            expires_in (int): Seconds the upload link is valid for.
+        """
+        await cls.redis.setex(
+            cls._key(file_identifier),
+            expires_in + FINALIZE_GRACE_PERIOD,
+            str(owner_id),
+        )
+
+    @classmethod
+    async def is_issued_to(cls, file_identifier: str, owner_id: UUID) -> bool:
+        """Checks if the object key was issued to the owner.
+
+        Args:
+            file_identifier (str): The object key.
+            owner_id (UUID): The owner's id.
+
+        Returns:
+            bool: Whether it was issued to the owner and hasn't expired.
+        """
+        return await cls.redis.get(cls._key(file_identifier)) == str(owner_id)
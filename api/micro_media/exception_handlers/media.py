@@ -1,5 +1,6 @@
 import logging
 from http import HTTPStatus
+from typing import Any, Awaitable, Callable
 
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
@@ -7,7 +8,11 @@ from fastapi.responses import JSONResponse
 from micro_media.media import (
     InvalidFileNameError,
     InvalidFileExtensionError,
+    FileFormatMismatchError,
     FileTooLargeError,
+    ImageTooLargeError,
+    DirectUploadNotAllowedError,
+    MediaProcessingUnavailableError,
 )
 
 
@@ -40,6 +45,20 @@ async def invalid_file_extension_exception_handler(
     )
 
 
+async def file_format_mismatch_exception_handler(
+    request: Request, exc: FileFormatMismatchError
+):
+    return JSONResponse(
+        status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+        content={
+            "detail": f"محتوای فایل با پسوند {exc.extension} مطابقت ندارد.",
+            "extension": exc.extension,
+            "detectedFormats": exc.detected_formats,
+            "mediaType": exc.media_type,
+        },
+    )
+
+
 async def file_too_large_error_exception_handler(
     request: Request, exc: FileTooLargeError
 ):
@@ -56,13 +75,88 @@ async def file_too_large_error_exception_handler(
     )
 
 
-def register_exception_handlers(app: FastAPI):
-    app.exception_handler(InvalidFileNameError)(
-        invalid_filename_exception_handler
+async def image_too_large_exception_handler(
+    request: Request, exc: ImageTooLargeError
+):
+    return JSONResponse(
+        status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+        content={
+            "detail": "تعداد پیکسل‌های تصویر از حداکثر مقدار مجاز بیشتر است.",
+            "pixels": exc.pixels,
+            "maxPixels": exc.max_pixels,
+        },
+    )
+
+
+async def direct_upload_not_allowed_exception_handler(
+    request: Request, exc: DirectUploadNotAllowedError
+):
+    return JSONResponse(
+        status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+        content={
+            "detail": (
+                "آپلود مستقیم برای محتوای نوع " f"{exc.media_type} مجاز نیست."
+            ),
+            "mediaType": exc.media_type,
+        },
     )
-    app.exception_handler(InvalidFileExtensionError)(
-        invalid_file_extension_exception_handler
+
+
+async def media_processing_unavailable_exception_handler(
+    request: Request, exc: MediaProcessingUnavailableError
+):
+    logger.warning("Media processing unavailable: %s", exc)
+
+    return JSONResponse(
+        status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+        content={
+            "detail": "سرویس پردازش رسانه موقتا در دسترس نیست.",
+            "retryAfter": exc.retry_after,
+        },
+        headers=(
+            {"Retry-After": str(exc.retry_after)} if exc.retry_after else None
+        ),
     )
-    app.exception_handler(FileTooLargeError)(
-        file_too_large_error_exception_handler
+
+
+async def media_error_exception_handler(request: Request, exc: Exception):
+    logger.error("Could not save the media.", exc_info=exc)
+
+    return JSONResponse(
+        status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
+        content={"detail": "خطا در ذخیره فایل."},
     )
+
+
+MEDIA_EXCEPTION_HANDLERS: dict[
+    type[Exception], Callable[[Request, Any], Awaitable[JSONResponse]]
+] = {
+    InvalidFileNameError: invalid_filename_exception_handler,
+    InvalidFileExtensionError: invalid_file_extension_exception_handler,
+    FileFormatMismatchError: file_format_mismatch_exception_handler,
+    FileTooLargeError: file_too_large_error_exception_handler,
+    ImageTooLargeError: image_too_large_exception_handler,
+    DirectUploadNotAllowedError: direct_upload_not_allowed_exception_handler,
+    MediaProcessingUnavailableError: (
+        media_processing_unavailable_exception_handler
+    ),
+}
+
+
+def get_media_exception_handler(
+    exc: Exception,
+) -> Callable[[Request, Any], Awaitable[JSONResponse]]:
+    """
+    Finds the handler of the exception's closest handled base class, or
+    the generic one for unexpected errors.
+    """
+    for exc_class in type(exc).__mro__:
+        if handler := MEDIA_EXCEPTION_HANDLERS.get(exc_class):
+            return handler
+
+    return media_error_exception_handler
+
+
+def register_exception_handlers(app: FastAPI):
+    for exc_class, handler in MEDIA_EXCEPTION_HANDLERS.items():
+        app.exception_handler(exc_class)(handler)
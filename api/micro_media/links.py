@@ -0,0 +1,451 @@
+import json
+import asyncio
+from uuid import UUID
+from collections import defaultdict
+from typing import Any, NamedTuple, Sequence, cast
+
+import sqlalchemy as sa
+from cachetools import TTLCache
+
+from micro_media.models import AsyncSessionLocal, Media, MediaStatus
+from micro_media.storage import STORAGE_CONTEXT as SC
+from micro_media.media import MEDIA_CONTEXT as MC, IMGProxyThumbnailManager
+from micro_media.media.config import (
+    ImageMediaOutputFormatConfig,
+    ImageMediaThumbnailSizeConfig,
+)
+from micro_media.media.manager import ImageMediaManager
+from micro_media.uploads import save_output_format
+from micro_media.utils.cache import AsyncRedisCache
+from micro_media.utils.metrics import METRICS
+from micro_media.utils.sqlalchemy import get_one
+
+
+CACHE_TTL = 60 * 60  # 1 hour
+# Seconds storage links are valid for. Signing windows only lengthen
+# it, links are valid for at least this long from when they're made.
+LINK_EXPIRES_IN = 60 * 60
+# Cached links must stay valid while they're served
+LINK_CACHE_TTL = max(LINK_EXPIRES_IN - 30, 30)
+# Hottest entries are also kept in process, sparing a Redis round trip
+L1_CACHE_SIZE = 4096
+L1_CACHE_TTL = 60
+# A single worker computes a missing entry while others wait this long
+CACHE_LOCK_TIMEOUT = 5
+# Images are encoded in a format by a single worker at once, others wait
+# for it this long
+ENCODE_LOCK_TIMEOUT = 60
+
+THUMBNAIL_MANAGER = IMGProxyThumbnailManager()
+# Signed imgproxy links by media, size, format and the original link they
+# embed. Only kept in process, signing them is cheaper than Redis.
+_imgproxy_links: TTLCache[tuple, str] = TTLCache(
+    maxsize=L1_CACHE_SIZE, ttl=LINK_CACHE_TTL
+)
+
+
+class MediaLocator(NamedTuple):
+    """Where a ready media's files are stored, enough to link them."""
+
+    id: UUID
+    media_type: str
+    storage_id: UUID
+    file_identifier: str
+    thumbnails: dict[str, str] | None = None
+    variants: dict[str, str] | None = None
+
+    @classmethod
+    def from_media(cls, media: Media) -> "MediaLocator":
+        return cls(
+            id=media.id,
+            media_type=media.media_type,
+            storage_id=media.storage_id,
+            file_identifier=media.file_identifier,
+            thumbnails=media.thumbnails,
+            variants=media.variants,
+        )
+
+    def dumps(self) -> str:
+        return json.dumps(self._asdict(), default=str)
+
+    @classmethod
+    def loads(cls, value: str) -> "MediaLocator":
+        fields: dict[str, Any] = json.loads(value)
+
+        return cls(
+            **{
+                **fields,
+                "id": UUID(fields["id"]),
+                "storage_id": UUID(fields["storage_id"]),
+            }
+        )
+
+
+@AsyncRedisCache.aredis_cache(
+    key_generator=lambda media_id: f"media_locator:{media_id}",
+    cache_deserializer=MediaLocator.loads,
+    cache_serializer=MediaLocator.dumps,
+    ttl=CACHE_TTL,
+    l1_maxsize=L1_CACHE_SIZE,
+    l1_ttl=L1_CACHE_TTL,
+    lock_timeout=CACHE_LOCK_TIMEOUT,
+    name="media_locator",
+)
+async def get_media_locator(media_id: UUID) -> MediaLocator:
+    """
+    Locates the ready media's files, so linking cached media doesn't
+    need a database session.
+
+    Args:
+        media_id (UUID): The media's id.
+
+    Raises:
+        NoResultFound: When no ready media has the id.
+
+    Returns:
+        MediaLocator: The media's locator.
+    """
+    async with AsyncSessionLocal() as session:
+        media = await get_one(
+            session=session,
+            query=sa.select(Media).filter(
+                Media.id == media_id, Media.status == MediaStatus.READY
+            ),
+        )
+
+    return MediaLocator.from_media(media)
+
+
+async def _locate_media(
+    arguments: list[tuple[UUID]],
+) -> list[MediaLocator | None]:
+    media_ids = [media_id for media_id, in arguments]
+
+    async with AsyncSessionLocal() as session:
+        rows = await session.execute(
+            sa.select(
+                Media.id,
+                Media.media_type,
+                Media.storage_id,
+                Media.file_identifier,
+                Media.thumbnails,
+                Media.variants,
+            ).filter(
+                Media.id.in_(media_ids), Media.status == MediaStatus.READY
+            )
+        )
+
+    located = {row.id: MediaLocator._make(row) for row in rows}
+    return [located.get(media_id) for media_id in media_ids]
+
+
+async def get_media_locators(
+    media_ids: Sequence[UUID],
+) -> list[MediaLocator | None]:
+    """
+    Locates many ready media at once, with a single query for the ones
+    which aren't cached.
+
+    Args:
+        media_ids (Sequence[UUID]): The media's ids.
+
+    Returns:
+        list[MediaLocator | None]: The media's locators in the ids'
+            order, None for missing ones.
+    """
+    return await get_media_locator.many(
+        [(media_id,) for media_id in media_ids], _locate_media
+    )
+
+
+async def _generate_file_links(
+    files: list[tuple[MediaLocator, str]], expires_in: int = LINK_EXPIRES_IN
+) -> list[str]:
+    """Presigns the files' links in one go per storage.
+
+    Args:
+        files (list[tuple[MediaLocator, str]]): The media and their file
+            identifiers to link.
+        expires_in (int, optional): Seconds the links are valid for.
+            Defaults to 3600.
+
+    Returns:
+        list[str]: The links, in the files' order.
+    """
+    indexes_by_storage: dict[UUID, list[int]] = defaultdict(list)
+    for index, (media, _) in enumerate(files):
+        indexes_by_storage[media.storage_id].append(index)
+
+    links = [""] * len(files)
+    for storage_id, indexes in indexes_by_storage.items():
+        storage_links = await SC.get_manager(
+            storage_id=storage_id
+        ).generate_file_links(
+            [files[index][1] for index in indexes], expires_in=expires_in
+        )
+
+        for index, link in zip(indexes, storage_links):
+            links[index] = link
+
+    return links
+
+
+@AsyncRedisCache.aredis_cache(
+    key_generator=lambda media, expires_in=LINK_EXPIRES_IN: (
+        f"original_link:{media.id}"
+    ),
+    cache_deserializer=str,
+    cache_serializer=str,
+    ttl=LINK_CACHE_TTL,
+    l1_maxsize=L1_CACHE_SIZE,
+    l1_ttl=L1_CACHE_TTL,
+    lock_timeout=CACHE_LOCK_TIMEOUT,
+    name="original_link",
+)
+async def get_original_link(
+    media: MediaLocator, expires_in: int = LINK_EXPIRES_IN
+) -> str:
+    storage_manager = SC.get_manager(storage_id=media.storage_id)
+
+    file_link = await storage_manager.generate_file_link(
+        file_identifier=media.file_identifier, expires_in=expires_in
+    )
+
+    return file_link
+
+
+@AsyncRedisCache.aredis_cache(
+    key_generator=lambda media, file_extension, expires_in=LINK_EXPIRES_IN: (
+        f"variant_link:{media.id}:{file_extension}"
+    ),
+    cache_deserializer=str,
+    cache_serializer=str,
+    ttl=LINK_CACHE_TTL,
+    l1_maxsize=L1_CACHE_SIZE,
+    l1_ttl=L1_CACHE_TTL,
+    lock_timeout=CACHE_LOCK_TIMEOUT,
+    name="variant_link",
+)
+async def get_variant_link(
+    media: MediaLocator, file_extension: str, expires_in: int = LINK_EXPIRES_IN
+) -> str:
+    storage_manager = SC.get_manager(storage_id=media.storage_id)
+
+    file_link = await storage_manager.generate_file_link(
+        file_identifier=media.variants[file_extension], expires_in=expires_in
+    )
+
+    return file_link
+
+
+@AsyncRedisCache.aredis_cache(
+    key_generator=lambda media, size_name, expires_in=LINK_EXPIRES_IN: (
+        f"thumbnail_link:{media.id}:{size_name}"
+    ),
+    cache_deserializer=str,
+    cache_serializer=str,
+    ttl=LINK_CACHE_TTL,
+    l1_maxsize=L1_CACHE_SIZE,
+    l1_ttl=L1_CACHE_TTL,
+    lock_timeout=CACHE_LOCK_TIMEOUT,
+    name="thumbnail_link",
+)
+async def get_stored_thumbnail_link(
+    media: MediaLocator, size_name: str, expires_in: int = LINK_EXPIRES_IN
+) -> str:
+    storage_manager = SC.get_manager(storage_id=media.storage_id)
+
+    file_link = await storage_manager.generate_file_link(
+        file_identifier=media.thumbnails[size_name], expires_in=expires_in
+    )
+
+    return file_link
+
+
+@AsyncRedisCache.aredis_cache(
+    key_generator=lambda media, output_format: (
+        f"output_format:{media.id}:{output_format.file_extension}"
+    ),
+    cache_deserializer=str,
+    cache_serializer=str,
+    ttl=CACHE_TTL,
+    lock_timeout=ENCODE_LOCK_TIMEOUT,
+    name="output_format",
+)
+async def encode_output_format(
+    media: MediaLocator, output_format: ImageMediaOutputFormatConfig
+) -> str:
+    """
+    Encodes the image in the output format on demand, unless it's done
+    already. Concurrent requests share a single encoding, across
+    processes too, and no database connection is held while encoding.
+
+    Args:
+        media (MediaLocator): The image.
+        output_format (ImageMediaOutputFormatConfig): The output format.
+
+    Raises:
+        NoResultFound: When no ready media has the id.
+        MediaProcessingUnavailableError: When the encoding isn't admitted.
+
+    Returns:
+        str: The variant's file identifier.
+    """
+    async with AsyncSessionLocal() as session:
+        row = await get_one(
+            session=session,
+            query=sa.select(Media).filter(
+                Media.id == media.id, Media.status == MediaStatus.READY
+            ),
+        )
+
+    # Outdated locators, e.g. other processes' or of media sharing the
+    # file with the one it was encoded for
+    if row.variants and output_format.file_extension in row.variants:
+        file_identifier = row.variants[output_format.file_extension]
+    else:
+        file_identifier = await save_output_format(
+            storage_manager=SC.get_manager(storage_id=row.storage_id),
+            media_manager=cast(
+                ImageMediaManager, MC.get_manager(row.media_type)
+            ),
+            media=row,
+            output_format=output_format,
+        )
+
+    await get_media_locator.invalidate(media.id)
+    return file_identifier
+
+
+def get_imgproxy_thumbnail_link(
+    media: MediaLocator,
+    original_file_link: str,
+    size_name: str,
+    thumbnail_size: ImageMediaThumbnailSizeConfig,
+    file_extension: str | None = None,
+) -> str:
+    """
+    Links the media's thumbnail through imgproxy. Links are memoized
+    until the original link they embed changes or expires.
+
+    Args:
+        media (MediaLocator): The image.
+        original_file_link (str): The image's current original link.
+        size_name (str): The thumbnail size's name.
+        thumbnail_size (ImageMediaThumbnailSizeConfig): The size's config.
+        file_extension (str | None, optional): The output format's file
+            extension. Defaults to the original's format.
+
+    Returns:
+        str: The signed imgproxy link.
+    """
+    # The original link versions the entry, new ones are signed afresh
+    key = (media.id, size_name, file_extension, original_file_link)
+
+    if (link := _imgproxy_links.get(key)) is not None:
+        METRICS.incr("cache.imgproxy_link.hits")
+        return link
+
+    METRICS.incr("cache.imgproxy_link.misses")
+    link = _imgproxy_links[key] = THUMBNAIL_MANAGER.get_thumbnail_link(
+        original_file_link=original_file_link,
+        thumbnail_size=thumbnail_size,
+        file_extension=file_extension,
+    )
+
+    return link
+
+
+async def get_original_links(media: Sequence[MediaLocator]) -> list[str]:
+    """Links many media's original files at once, as `get_original_link()`.
+
+    Args:
+        media (Sequence[MediaLocator]): The media.
+
+    Returns:
+        list[str]: The links, in the media's order.
+    """
+
+    async def generate(arguments: list[tuple]) -> list[str]:
+        return await _generate_file_links(
+            [(media, media.file_identifier) for media, in arguments]
+        )
+
+    return cast(
+        list[str],
+        await get_original_link.many([(item,) for item in media], generate),
+    )
+
+
+async def get_variant_links(
+    files: Sequence[tuple[MediaLocator, str]],
+) -> list[str]:
+    """Links many media's stored variants at once, as `get_variant_link()`.
+
+    Args:
+        files (Sequence[tuple[MediaLocator, str]]): The media and their
+            variants' file extensions.
+
+    Returns:
+        list[str]: The links, in the files' order.
+    """
+
+    async def generate(arguments: list[tuple]) -> list[str]:
+        return await _generate_file_links(
+            [
+                (media, media.variants[file_extension])
+                for media, file_extension in arguments
+            ]
+        )
+
+    return cast(list[str], await get_variant_link.many(files, generate))
+
+
+async def get_stored_thumbnail_links(
+    files: Sequence[tuple[MediaLocator, str]],
+) -> list[str]:
+    """
+    Links many media's stored thumbnails at once, as
+    `get_stored_thumbnail_link()`.
+
+    Args:
+        files (Sequence[tuple[MediaLocator, str]]): The media and their
+            thumbnails' names.
+
+    Returns:
+        list[str]: The links, in the files' order.
+    """
+
+    async def generate(arguments: list[tuple]) -> list[str]:
+        return await _generate_file_links(
+            [
+                (media, media.thumbnails[size_name])
+                for media, size_name in arguments
+            ]
+        )
+
+    return cast(
+        list[str], await get_stored_thumbnail_link.many(files, generate)
+    )
+
+
+async def invalidate_media_links(media: Media | MediaLocator) -> None:
+    """
+    Drops the media's cached locator and links, e.g. once it's deleted.
+    Other processes keep theirs for up to `L1_CACHE_TTL` seconds.
+
+    Args:
+        media (Media | MediaLocator): The media.
+    """
+    await asyncio.gather(
+        get_media_locator.invalidate(media.id),
+        get_original_link.invalidate(media),
+        *(
+            get_variant_link.invalidate(media, file_extension)
+            for file_extension in media.variants or {}
+        ),
+        *(
+            get_stored_thumbnail_link.invalidate(media, size_name)
+            for size_name in media.thumbnails or {}
+        ),
+    )
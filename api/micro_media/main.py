@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -12,6 +13,10 @@ from micro_media.routers import router as base_router
 from micro_media.auth import validate_api_keys, get_api_key_user
 from micro_media.exception_handlers import register_exception_handlers
 from micro_media.utils.cache import AsyncRedisCache
+from micro_media.media.executors import IMAGE_EXECUTOR
+from micro_media.resumable import ResumableUploads
+from micro_media.direct_uploads import DirectUploads
+from micro_media.processing import MediaProcessingQueue
 from micro_media.settings import (
     DEBUG,
     APP_NAME,
@@ -22,6 +27,7 @@ from micro_media.settings import (
     CORS_ALLOWED_ORIGINS,
     REDIS_URL,
     REDIS_PREFIX,
+    RESUMABLE_UPLOAD_CLEANUP_INTERVAL,
 )
 
 
@@ -32,9 +38,21 @@ async def lifespan(app: FastAPI):
     redis = Redis.from_url(REDIS_URL, decode_responses=True)
     await redis.ping()
     AsyncRedisCache.init(redis=redis, prefix=REDIS_PREFIX + "caches:")
+    ResumableUploads.init(
+        redis=redis, prefix=REDIS_PREFIX + "resumable_uploads:"
+    )
+    DirectUploads.init(redis=redis, prefix=REDIS_PREFIX + "direct_uploads:")
+    MediaProcessingQueue.init(redis=redis, prefix=REDIS_PREFIX)
+
+    await IMAGE_EXECUTOR.start()
+    cleanup_task = asyncio.create_task(
+        ResumableUploads.run_cleanup(RESUMABLE_UPLOAD_CLEANUP_INTERVAL)
+    )
 
     yield
 
+    cleanup_task.cancel()
+    IMAGE_EXECUTOR.shutdown()
     await redis.aclose()
 
 
@@ -5,7 +5,11 @@ from .context import MediaContext, MEDIA_CONTEXT
 from .exceptions import (
     InvalidFileNameError,
     InvalidFileExtensionError,
+    FileFormatMismatchError,
     FileTooLargeError,
+    ImageTooLargeError,
+    DirectUploadNotAllowedError,
+    MediaProcessingUnavailableError,
 )
 
 __all__ = [
@@ -17,5 +21,9 @@ __all__ = [
     "MEDIA_CONTEXT",
     "InvalidFileNameError",
     "InvalidFileExtensionError",
+    "FileFormatMismatchError",
     "FileTooLargeError",
+    "ImageTooLargeError",
+    "DirectUploadNotAllowedError",
+    "MediaProcessingUnavailableError",
 ]
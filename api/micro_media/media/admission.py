@@ -0,0 +1,187 @@
+import math
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, cast
+
+from micro_media.settings import (
+    UPLOAD_MAX_CONCURRENCY,
+    UPLOAD_QUEUE_SIZE,
+    UPLOAD_QUEUE_TIMEOUT,
+)
+from micro_media.utils.metrics import METRICS
+from .exceptions import MediaProcessingUnavailableError
+
+# Weight of the latest job in the average service time
+SERVICE_TIME_SMOOTHING = 0.2
+
+
+class AdmissionController:
+    """
+    Bounds how many jobs run at the same time and how many may wait for
+    a slot. Jobs are rejected right away when the wait queue is full and
+    after `queue_timeout` seconds of waiting, so the work is not spent on
+    requests which would time out anyway.
+
+    With a `memory_budget`, admitted jobs also wait until the memory they
+    are estimated to need (their cost) fits in the budget next to the
+    running jobs'. A job exceeding the whole budget runs alone.
+
+    Queue depth, active jobs, reserved memory, wait and service times are
+    exposed as `admission.{name}.*` metrics.
+    """
+
+    name: str
+    max_concurrency: int
+    max_queue_size: int
+    queue_timeout: float
+    memory_budget: int | None
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue_size: int,
+        queue_timeout: float,
+        memory_budget: int | None = None,
+    ) -> None:
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self.memory_budget = memory_budget
+
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._memory = asyncio.Condition()
+        self._memory_used = 0
+        self._active = 0
+        self._waiting = 0
+        self._service_time = 1.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    @property
+    def retry_after(self) -> int:
+        """Estimated seconds until the current queue is drained."""
+        return max(
+            1,
+            math.ceil(
+                self._service_time * (self._waiting + 1) / self.max_concurrency
+            ),
+        )
+
+    def check(self) -> None:
+        """Rejects the job if it could not even be queued.
+
+        Raises:
+            MediaProcessingUnavailableError: When the wait queue is full.
+        """
+        if self._slots.locked() and self._waiting >= self.max_queue_size:
+            METRICS.incr(f"admission.{self.name}.rejected")
+            raise MediaProcessingUnavailableError(
+                f"The {self.name} queue is full.",
+                retry_after=self.retry_after,
+            )
+
+    @asynccontextmanager
+    async def admit(self, cost: int = 0) -> AsyncGenerator[None, None]:
+        """
+        Waits for a free slot and the job's memory, and holds them while
+        the context is open.
+
+        Args:
+            cost (int, optional): The job's estimated memory in bytes,
+                only counted against the `memory_budget`. Defaults to 0.
+
+        Raises:
+            MediaProcessingUnavailableError: When the wait queue is full or
+                no slot got free within `queue_timeout` seconds.
+        """
+        self.check()
+
+        self._waiting += 1
+        self._update_gauges()
+        queued_at = time.monotonic()
+
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await self._slots.acquire()
+
+                try:
+                    await self._reserve_memory(cost)
+                except BaseException:
+                    self._slots.release()
+                    raise
+
+        except TimeoutError as exc:
+            METRICS.incr(f"admission.{self.name}.timed_out")
+            raise MediaProcessingUnavailableError(
+                f"Timed out waiting in the {self.name} queue.",
+                retry_after=self.retry_after,
+            ) from exc
+
+        finally:
+            self._waiting -= 1
+            wait_time = time.monotonic() - queued_at
+            METRICS.set(f"admission.{self.name}.wait_time", wait_time)
+            METRICS.incr(f"admission.{self.name}.wait_time_total", wait_time)
+            self._update_gauges()
+
+        self._active += 1
+        self._update_gauges()
+        METRICS.incr(f"admission.{self.name}.admitted")
+        started_at = time.monotonic()
+
+        try:
+            yield
+        finally:
+            self._active -= 1
+            await self._release_memory(cost)
+            self._slots.release()
+            self._update_gauges()
+
+            self._service_time += SERVICE_TIME_SMOOTHING * (
+                time.monotonic() - started_at - self._service_time
+            )
+            METRICS.set(
+                f"admission.{self.name}.service_time", self._service_time
+            )
+
+    def _fits_memory(self, cost: int) -> bool:
+        # A job exceeding the whole budget still runs, alone
+        if not self._memory_used:
+            return True
+
+        return self._memory_used + cost <= cast(int, self.memory_budget)
+
+    async def _reserve_memory(self, cost: int) -> None:
+        if not self.memory_budget:
+            return
+
+        async with self._memory:
+            await self._memory.wait_for(lambda: self._fits_memory(cost))
+            self._memory_used += cost
+
+    async def _release_memory(self, cost: int) -> None:
+        if not self.memory_budget:
+            return
+
+        async with self._memory:
+            self._memory_used -= cost
+            self._memory.notify_all()
+
+    def _update_gauges(self) -> None:
+        METRICS.set(f"admission.{self.name}.queue_depth", self._waiting)
+        METRICS.set(f"admission.{self.name}.active", self._active)
+        METRICS.set(f"admission.{self.name}.memory", self._memory_used)
+
+
+# Admits upload requests before their bodies are read
+UPLOAD_ADMISSION = AdmissionController(
+    name="upload",
+    max_concurrency=UPLOAD_MAX_CONCURRENCY,
+    max_queue_size=UPLOAD_QUEUE_SIZE,
+    queue_timeout=UPLOAD_QUEUE_TIMEOUT,
+)
@@ -1,20 +1,50 @@
-from pydantic import BaseModel, model_validator
+from PIL import Image
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+try:
+    # Adds AVIF support to Pillow versions which lack it
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
 
 
 # <Base>
+class MediaAdmissionConfig(BaseModel):
+    # Jobs processed at the same time and jobs waiting for a free slot
+    max_concurrency: int = Field(default=4, ge=1)
+    max_queue_size: int = Field(default=16, ge=0)
+    # Seconds a job may wait before it's rejected
+    queue_timeout: float = Field(default=10, gt=0)
+
+
 class BaseMediaTypeConfig(BaseModel):
     max_file_size: int | None = None
     allowed_formats: list[str] | None = None
+    admission: MediaAdmissionConfig = MediaAdmissionConfig()
 
 
 # </Base>
 
 
 # <Image>
+class ImageMediaLaneConfig(MediaAdmissionConfig):
+    # Largest decode cost (width × height × bands) routed to the lane.
+    # Left out, the lane takes every image larger than the other lanes'.
+    max_cost: int | None = Field(default=None, gt=0)
+    # Decode cost which the lane's running jobs may add up to
+    memory_budget: int | None = Field(default=None, gt=0)
+
+
 class ImageMediaResizeConfig(BaseModel):
     max_width: int
     max_height: int
 
+    # Decode large images at a reduced scale (e.g. JPEG DCT scaling) as
+    # long as the decoded image stays `reducing_gap` times larger than
+    # the target size.
+    shrink_on_load: bool = True
+    reducing_gap: float = Field(default=1.5, ge=1.0)
+
 
 class ImageMediaForceFormatConfig(BaseModel):
     pil_format: str
@@ -22,6 +52,38 @@ class ImageMediaForceFormatConfig(BaseModel):
     convert_mode: str
 
 
+class ImageMediaOutputFormatConfig(BaseModel):
+    pil_format: str
+    file_extension: str
+    content_type: str
+    convert_mode: str | None = None
+    quality: int | None = Field(default=None, ge=1, le=100)
+
+    @field_validator("pil_format")
+    @classmethod
+    def validate_pil_format(cls, pil_format: str) -> str:
+        Image.init()
+
+        if pil_format.upper() not in Image.SAVE:
+            raise ValueError(f"Pillow can't encode `{pil_format}` images.")
+
+        return pil_format.upper()
+
+
+class ImageMediaOutputFormatsConfig(BaseModel):
+    # In order of preference, the first one accepted by a client is served
+    formats: list[ImageMediaOutputFormatConfig] = []
+    # Encode and store the image in all formats at upload instead of on
+    # the first request for each.
+    eager: bool = False
+
+
+class ImageMediaPlaceholderConfig(BaseModel):
+    # A tiny WebP of the image which clients blur while it's loading
+    max_size: int = Field(default=16, ge=1, le=64)
+    quality: int = Field(default=50, ge=1, le=100)
+
+
 class ImageMediaThumbnailSizeConfig(BaseModel):
     width: int
     height: int
@@ -30,6 +92,8 @@ class ImageMediaThumbnailSizeConfig(BaseModel):
 class ImageMediaThumbnailConfig(BaseModel):
     default_size: str
     sizes: dict[str, ImageMediaThumbnailSizeConfig] = {}
+    # Render and store all sizes at upload instead of using imgproxy
+    eager: bool = False
 
     @model_validator(mode="after")
     def validate_default_size(self):
@@ -47,9 +111,15 @@ class ImageMediaThumbnailConfig(BaseModel):
 
 
 class ImageMediaConfig(BaseMediaTypeConfig):
+    # Images with more pixels are rejected before being decoded
+    max_pixels: int | None = Field(default=None, gt=0)
+    # Size classes which image jobs are admitted in, instead of `admission`
+    lanes: dict[str, ImageMediaLaneConfig] = {}
     force_format: ImageMediaForceFormatConfig | None = None
     resize: ImageMediaResizeConfig | None = None
     thumbnails: ImageMediaThumbnailConfig | None = None
+    output_formats: ImageMediaOutputFormatsConfig | None = None
+    placeholder: ImageMediaPlaceholderConfig | None = None
 
 
 # <Image>
@@ -23,6 +23,24 @@ class InvalidFileExtensionError(ValueError):
         self.media_type = media_type
 
 
+class FileFormatMismatchError(ValueError):
+    extension: str
+    detected_formats: Sequence[str]
+    media_type: str
+
+    def __init__(
+        self,
+        *args: object,
+        extension: str,
+        detected_formats: Sequence[str],
+        media_type: str = ""
+    ) -> None:
+        super().__init__(*args)
+        self.extension = extension
+        self.detected_formats = detected_formats
+        self.media_type = media_type
+
+
 class FileTooLargeError(ValueError):
     file_size: int
     max_file_size: int
@@ -39,3 +57,38 @@ class FileTooLargeError(ValueError):
         self.file_size = file_size
         self.max_file_size = max_file_size
         self.media_type = media_type
+
+
+class ImageTooLargeError(ValueError):
+    # Unknown when Pillow rejected the image before its size was read
+    pixels: int | None
+    max_pixels: int
+    media_type: str
+
+    def __init__(
+        self,
+        *args: object,
+        pixels: int | None,
+        max_pixels: int,
+        media_type: str = ""
+    ) -> None:
+        super().__init__(*args)
+        self.pixels = pixels
+        self.max_pixels = max_pixels
+        self.media_type = media_type
+
+
+class DirectUploadNotAllowedError(ValueError):
+    media_type: str
+
+    def __init__(self, *args: object, media_type: str = "") -> None:
+        super().__init__(*args)
+        self.media_type = media_type
+
+
+class MediaProcessingUnavailableError(RuntimeError):
+    retry_after: int | None
+
+    def __init__(self, *args: object, retry_after: int | None = None) -> None:
+        super().__init__(*args)
+        self.retry_after = retry_after
@@ -0,0 +1,239 @@
+import io
+import os
+import asyncio
+import multiprocessing
+from abc import ABCMeta, abstractmethod
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, BinaryIO, Callable, TypeVar
+
+from micro_media.settings import (
+    IMAGE_PROCESSING_EXECUTOR,
+    IMAGE_PROCESSING_WORKERS,
+    IMAGE_PROCESSING_QUEUE_SIZE,
+    IMAGE_PROCESSING_TIMEOUT,
+)
+from micro_media.utils.buffers import MemoryViewReader
+from .exceptions import MediaProcessingUnavailableError
+
+T = TypeVar("T")
+
+# Validators and other jobs taking a filename and the file's content
+Job = Callable[[str, BinaryIO], T]
+
+
+class AbstractMediaExecutor(metaclass=ABCMeta):
+    async def start(self) -> None:
+        """Prepares the executor's workers."""
+
+    def shutdown(self) -> None:
+        """Stops the executor's workers."""
+
+    @abstractmethod
+    async def run(self, job: Job[T], filename: str, file: BinaryIO) -> T:
+        """Runs the job (e.g. a validator) without blocking the event loop.
+
+        Args:
+            job (Job[T]): The job to run.
+            filename (str): The file's filename.
+            file (BinaryIO): The file's content.
+
+        Returns:
+            T: The job's result.
+        """
+
+
+class ThreadMediaExecutor(AbstractMediaExecutor):
+    executor: ThreadPoolExecutor
+
+    def __init__(self, max_workers: int | None = None) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, job: Job[T], filename: str, file: BinaryIO) -> T:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, job, filename, file
+        )
+
+
+def _warm_up() -> None:
+    # Import Pillow and register its plugins once per worker process
+    from PIL import Image
+
+    Image.init()
+
+
+class _SameFile:
+    """Stands for the job's file in results which return it untouched."""
+
+
+def _rebuild_tuple(value: tuple, items: list[Any]) -> tuple:
+    # Named tuples (e.g. MediaInfo) keep their type
+    if hasattr(value, "_make"):
+        return value._make(items)
+
+    return tuple(items)
+
+
+def _detach(value: Any, file: BinaryIO) -> Any:
+    # The shared memory is released after the job, so instead of copying
+    # the untouched file back, the caller's own file is put in its place.
+    if value is file:
+        return _SameFile
+
+    if isinstance(value, tuple):
+        return _rebuild_tuple(value, [_detach(item, file) for item in value])
+
+    if isinstance(value, dict):
+        return {key: _detach(item, file) for key, item in value.items()}
+
+    return value
+
+
+def _attach(value: Any, file: BinaryIO) -> Any:
+    if value is _SameFile:
+        file.seek(0)
+        return file
+
+    if isinstance(value, tuple):
+        return _rebuild_tuple(value, [_attach(item, file) for item in value])
+
+    if isinstance(value, dict):
+        return {key: _attach(item, file) for key, item in value.items()}
+
+    return value
+
+
+def _run_in_process(job: Job[T], filename: str, shm_name: str, size: int) -> T:
+    shm = SharedMemory(name=shm_name)
+
+    try:
+        with shm.buf[:size] as view:
+            with io.BufferedReader(MemoryViewReader(view)) as file:
+                return _detach(job(filename, file), file)
+    finally:
+        shm.close()
+
+
+class ProcessMediaExecutor(AbstractMediaExecutor):
+    """
+    Runs jobs in worker processes so CPU-bound work is not limited
+    by the GIL. File content is handed over to workers through shared
+    memory and at most `max_workers + max_queue_size` jobs are accepted
+    at the same time.
+    """
+
+    executor: ProcessPoolExecutor
+    max_workers: int
+    timeout: float
+
+    def __init__(
+        self, max_workers: int, max_queue_size: int, timeout: float
+    ) -> None:
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up,
+        )
+        self._slots = asyncio.Semaphore(max_workers + max_queue_size)
+
+    async def start(self) -> None:
+        # Worker processes are spawned on demand, submit a job per worker
+        # so they are all up before the first request arrives.
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(self.executor, os.getpid)
+                for _ in range(self.max_workers)
+            )
+        )
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _copy_to_shared_memory(file: BinaryIO) -> tuple[SharedMemory, int]:
+        size = file.seek(0, os.SEEK_END)
+        file.seek(0)
+
+        shm = SharedMemory(create=True, size=max(size, 1))
+
+        try:
+            with shm.buf[:size] as view:
+                if file.readinto(view) != size:  # type: ignore[attr-defined]
+                    raise IOError("Could not read the whole file.")
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+
+        return shm, size
+
+    async def run(self, job: Job[T], filename: str, file: BinaryIO) -> T:
+        if self._slots.locked():
+            raise MediaProcessingUnavailableError(
+                "Media processing queue is full."
+            )
+
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+
+        try:
+            shm, size = await asyncio.to_thread(
+                self._copy_to_shared_memory, file
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+
+        def cleanup(_: Future) -> None:
+            # The worker might still be using the shared memory after a
+            # timeout, so it's released only when the job is done.
+            shm.close()
+            shm.unlink()
+            loop.call_soon_threadsafe(self._slots.release)
+
+        future = self.executor.submit(
+            _run_in_process, job, filename, shm.name, size
+        )
+        future.add_done_callback(cleanup)
+
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=self.timeout
+            )
+        except TimeoutError as exc:
+            raise MediaProcessingUnavailableError(
+                "Media processing timed out."
+            ) from exc
+
+        return _attach(result, file)
+
+
+def create_executor(
+    executor_type: str, max_workers: int, max_queue_size: int, timeout: float
+) -> AbstractMediaExecutor:
+    match executor_type:
+        case "thread":
+            return ThreadMediaExecutor()
+        case "process":
+            return ProcessMediaExecutor(
+                max_workers=max_workers,
+                max_queue_size=max_queue_size,
+                timeout=timeout,
+            )
+        case _:
+            raise ValueError(f"Unsupported executor `{executor_type}`.")
+
+
+THREAD_EXECUTOR = ThreadMediaExecutor()
+IMAGE_EXECUTOR = create_executor(
+    IMAGE_PROCESSING_EXECUTOR,
+    max_workers=IMAGE_PROCESSING_WORKERS,
+    max_queue_size=IMAGE_PROCESSING_QUEUE_SIZE,
+    timeout=IMAGE_PROCESSING_TIMEOUT,
+)
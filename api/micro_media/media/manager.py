@@ -1,36 +1,187 @@
-import asyncio
-from io import BytesIO
-from concurrent.futures import ThreadPoolExecutor
-from typing import Callable, Generic, TypeVar
+import io
+import os
+import math
+import base64
+import mimetypes
+from functools import partial
+from typing import (
+    BinaryIO,
+    Callable,
+    Generic,
+    NamedTuple,
+    Protocol,
+    TypeVar,
+    cast,
+)
 
 from PIL import Image
 
-from .exceptions import InvalidFileExtensionError, FileTooLargeError
+from micro_media.settings import UPLOAD_CHUNK_SIZE, IMGPROXY_RESIZE_ENLARGE
+from micro_media.utils.buffers import MediaBuffer, TeeWriter
+from micro_media.utils.http import parse_accept
+from micro_media.utils.metrics import METRICS
+from .exceptions import (
+    InvalidFileExtensionError,
+    FileFormatMismatchError,
+    FileTooLargeError,
+    ImageTooLargeError,
+)
 from .config import (
     BaseMediaTypeConfig,
     ImageMediaConfig,
+    ImageMediaOutputFormatConfig,
+    ImageMediaPlaceholderConfig,
+    ImageMediaResizeConfig,
     ImageMediaThumbnailSizeConfig,
 )
+from .executors import (
+    AbstractMediaExecutor,
+    Job,
+    ThreadMediaExecutor,
+    THREAD_EXECUTOR,
+    IMAGE_EXECUTOR,
+)
+from .admission import AdmissionController
+from .sniffing import SNIFF_SIZE, SNIFFABLE_FORMATS, sniff_formats
 from .utils import change_file_extension, get_file_extension
 
 
 T = TypeVar("T", bound=BaseMediaTypeConfig)
+R = TypeVar("R")
 
 
-thread_pool = ThreadPoolExecutor()
+class AsyncReadable(Protocol):
+    async def read(self, size: int = -1) -> bytes: ...
+
+
+class MediaInfo(NamedTuple):
+    file_size: int
+    content_type: str | None
+    width: int | None = None
+    height: int | None = None
+    # A tiny preview as a data URI
+    placeholder: str | None = None
 
 
 class BaseMediaManager(Generic[T]):
     media_type: str
     config: T
 
+    admission: AdmissionController
+
     def __init__(self, config: T, media_type: str = ""):
         self.media_type = media_type
         self.config = config
+        self.admission = AdmissionController(
+            name=media_type or "media",
+            max_concurrency=config.admission.max_concurrency,
+            max_queue_size=config.admission.max_queue_size,
+            queue_timeout=config.admission.queue_timeout,
+        )
+
+    def __getstate__(self) -> dict:
+        # Process executors' jobs pickle their manager, the admission
+        # controller (bound to the event loop) is only used by the caller.
+        state = self.__dict__.copy()
+        del state["admission"]
+        return state
+
+    @property
+    def supports_direct_upload(self) -> bool:
+        """
+        Whether files can be uploaded to the storage directly, without
+        passing through the API. Only possible when validators don't
+        transform the file's content.
+        """
+        return True
+
+    @property
+    def supports_streaming(self) -> bool:
+        """
+        Whether validators can hand the transformed content over to a
+        sink (e.g. a streaming upload) while producing it.
+        """
+        return False
+
+    @property
+    def executor(self) -> AbstractMediaExecutor:
+        """The executor which validators run on."""
+        return THREAD_EXECUTOR
+
+    async def arun(self, job: Job[R], filename: str, file: BinaryIO) -> R:
+        """
+        Runs the job on the executor once the media type's admission
+        controller lets it in.
+
+        Args:
+            job (Job[R]): The job to run.
+            filename (str): The file's filename.
+            file (BinaryIO): The file's content.
+
+        Raises:
+            MediaProcessingUnavailableError: When the job is not admitted.
+
+        Returns:
+            R: The job's result.
+        """
+        async with self.admission.admit():
+            return await self.executor.run(job, filename, file)
+
+    async def aread_media(
+        self,
+        filename: str,
+        file: AsyncReadable,
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+    ) -> BinaryIO:
+        """
+        Reads the file chunk by chunk into a media buffer.
+
+        The filename is validated before reading anything, the content's
+        format is sniffed from its first bytes and the size limit is
+        enforced as chunks arrive, so mismatching or oversized files are
+        rejected without being read completely.
+
+        Args:
+            filename (str): The file's filename.
+            file (AsyncReadable): The file to read from (e.g. UploadFile).
+            chunk_size (int, optional): Read chunk size in bytes.
+                Defaults to UPLOAD_CHUNK_SIZE.
+
+        Raises:
+            InvalidFileExtensionError: When the file extension is invalid.
+            FileFormatMismatchError: When the content does not match the
+                file extension.
+            FileTooLargeError: When file size exceeds the `max_file_size`.
+
+        Returns:
+            BinaryIO: The read file, rewound to its beginning.
+        """
+        spooled_file = cast(BinaryIO, MediaBuffer())
+
+        try:
+            self.check_file_extension(filename)
+
+            head = await file.read(SNIFF_SIZE)
+            self.check_file_format(filename, head)
+            self.check_file_size(len(head))
+            spooled_file.write(head)
+
+            file_size = len(head)
+            while chunk := await file.read(chunk_size):
+                file_size += len(chunk)
+                self.check_file_size(file_size)
+                spooled_file.write(chunk)
+
+        except BaseException:
+            spooled_file.close()
+            raise
+
+        spooled_file.seek(0)
+        return spooled_file
 
     def validate_media(
-        self, filename: str, data: bytes
-    ) -> tuple[str, BytesIO]:
+        self, filename: str, file: BinaryIO
+    ) -> tuple[str, BinaryIO]:
         """Validates the filename and file.
 
         Args:
@@ -38,9 +189,9 @@ class BaseMediaManager(Generic[T]):
             file (BinaryIO): The file's content.
 
         Returns:
-            tuple[str, BytesIO]: Validated filename and file.
+            tuple[str, BinaryIO]: Validated filename and file.
         """
-        file = BytesIO(data)
+        file.seek(0)
 
         # Run UploadFile validators one by one
         for validator in self.get_validators():
@@ -50,50 +201,104 @@ class BaseMediaManager(Generic[T]):
         return filename, file
 
     async def avalidate_media(
-        self, filename: str, data: bytes
-    ) -> tuple[str, BytesIO]:
+        self,
+        filename: str,
+        file: BinaryIO,
+        sink: Callable[[bytes], None] | None = None,
+    ) -> tuple[str, BinaryIO]:
         """Validates the filename and file asynchronously.
 
         Args:
             filename (str): The file's filename.
             file (BinaryIO): The file's content.
+            sink (Callable[[bytes], None] | None, optional): Receives the
+                transformed content while it's written, when the manager
+                supports streaming. Defaults to None.
+
+        Returns:
+            tuple[str, BinaryIO]: Validated filename and file.
+        """
+        return await self.arun(self.validate_media, filename, file)
+
+    async def ainspect_media(self, filename: str, file: BinaryIO) -> MediaInfo:
+        """Inspects the validated file asynchronously.
+
+        Args:
+            filename (str): The validated filename.
+            file (BinaryIO): The validated file content.
+
+        Returns:
+            MediaInfo: The file's info.
+        """
+        return self.inspect_media(filename, file)
+
+    def inspect_media(self, filename: str, file: BinaryIO) -> MediaInfo:
+        """
+        Returns the validated file's info, which is stored along with the
+        media so clients and reports don't need to fetch the file.
+
+        Args:
+            filename (str): The validated filename.
+            file (BinaryIO): The validated file content.
 
         Returns:
-            tuple[str, BytesIO]: Validated filename and file.
+            MediaInfo: The file's info.
         """
-        return await asyncio.get_event_loop().run_in_executor(
-            thread_pool, self.validate_media, filename, data
+        file_size = file.seek(0, os.SEEK_END)
+        file.seek(0)
+
+        return MediaInfo(
+            file_size=file_size,
+            content_type=mimetypes.guess_type(filename)[0],
         )
 
     def get_validators(
         self,
-    ) -> list[Callable[[str, BytesIO], tuple[str, BytesIO]]]:
+    ) -> list[Callable[[str, BinaryIO], tuple[str, BinaryIO]]]:
         """
-        Returns the validator methods.
+        Returns the validator methods. Validators which don't transform
+        the content return the given file itself, so it's never copied.
 
         Returns:
-            list[Callable[[str, BytesIO], tuple[str, BytesIO]]]: Validator
+            list[Callable[[str, BinaryIO], tuple[str, BinaryIO]]]: Validator
                 methods which take filename and file content and return
                 the validated filename and file content.
         """
         return [self.validate_file_size, self.validate_allowed_formats]
 
     def validate_allowed_formats(
-        self, filename: str, file: BytesIO
-    ) -> tuple[str, BytesIO]:
+        self, filename: str, file: BinaryIO
+    ) -> tuple[str, BinaryIO]:
         """
-        Checks if the file extension is valid.
+        Checks if the file extension is valid and matches the content.
 
         Args:
             filename (str): The file's filename.
-            file (BytesIO): The file's content.
+            file (BinaryIO): The file's content.
 
         Raises:
             InvalidFileExtensionError: When given filename's is not
                 present in the config's `allowed_formats`.
+            FileFormatMismatchError: When the content does not match the
+                file extension.
 
         Returns:
-            tuple[str, BytesIO]: Validated filename and file content.
+            tuple[str, BinaryIO]: Validated filename and file content.
+        """
+        self.check_file_extension(filename)
+        self.check_file_format(filename, file.read(SNIFF_SIZE))
+        return filename, file
+
+    def check_file_extension(self, filename: str) -> None:
+        """
+        Checks if the filename's extension is allowed.
+
+        Args:
+            filename (str): The file's filename.
+
+        Raises:
+            InvalidFileExtensionError: When given filename's is not
+                present in the config's `allowed_formats`.
         """
         extension = get_file_extension(filename)
 
@@ -106,49 +311,299 @@ class BaseMediaManager(Generic[T]):
                     media_type=self.media_type,
                 )
 
-        return filename, file
+    def check_file_format(self, filename: str, head: bytes) -> None:
+        """
+        Checks if the content's magic bytes match the filename's extension.
+        Extensions without a known signature are not checked.
+
+        Args:
+            filename (str): The file's filename.
+            head (bytes): The file's first `SNIFF_SIZE` bytes.
+
+        Raises:
+            FileFormatMismatchError: When the content does not match the
+                file extension.
+        """
+        extension = get_file_extension(filename).lower()
+        if extension not in SNIFFABLE_FORMATS:
+            return
+
+        detected_formats = sniff_formats(head)
+        if extension not in detected_formats:
+            raise FileFormatMismatchError(
+                f"Content does not match extension `{extension}`.",
+                extension=extension,
+                detected_formats=sorted(detected_formats),
+                media_type=self.media_type,
+            )
 
     def validate_file_size(
-        self, filename: str, file: BytesIO
-    ) -> tuple[str, BytesIO]:
+        self, filename: str, file: BinaryIO
+    ) -> tuple[str, BinaryIO]:
         """
         Checks if file size does not exceed the media_type's size limit.
 
         Args:
             filename (str): The file's filename.
-            file (BytesIO): The file's content.
+            file (BinaryIO): The file's content.
 
         Raises:
             FileTooLargeError: When file size exceeds the `max_file_size`.
 
         Returns:
-            tuple[str, BytesIO]: Validated filename and file content.
+            tuple[str, BinaryIO]: Validated filename and file content.
         """
-        max_file_size = self.config.max_file_size
+        if self.config.max_file_size:
+            self.check_file_size(file.seek(0, os.SEEK_END))
 
-        if max_file_size:
-            file_size = file.getbuffer().nbytes
+        return filename, file
 
-            if file_size > max_file_size:
-                raise FileTooLargeError(
-                    "Maximum file size exceeded.",
-                    file_size=file_size,
-                    max_file_size=max_file_size,
-                    media_type=self.media_type,
-                )
+    def check_file_size(self, file_size: int) -> None:
+        """
+        Checks if the given size does not exceed the size limit.
 
-        return filename, file
+        Args:
+            file_size (int): The file size in bytes.
+
+        Raises:
+            FileTooLargeError: When file size exceeds the `max_file_size`.
+        """
+        max_file_size = self.config.max_file_size
+
+        if max_file_size and file_size > max_file_size:
+            raise FileTooLargeError(
+                "Maximum file size exceeded.",
+                file_size=file_size,
+                max_file_size=max_file_size,
+                media_type=self.media_type,
+            )
 
 
 class ImageMediaManager(BaseMediaManager[ImageMediaConfig]):
+    # Admission controllers of the size classes by their max decode costs,
+    # from the smallest to the unbounded one.
+    lanes: list[tuple[int | None, AdmissionController]]
+
+    def __init__(self, config: ImageMediaConfig, media_type: str = ""):
+        super().__init__(config, media_type)
+        self.lanes = [
+            (
+                lane.max_cost,
+                AdmissionController(
+                    name=f"{media_type or 'media'}.{name}",
+                    max_concurrency=lane.max_concurrency,
+                    max_queue_size=lane.max_queue_size,
+                    queue_timeout=lane.queue_timeout,
+                    memory_budget=lane.memory_budget,
+                ),
+            )
+            for name, lane in sorted(
+                config.lanes.items(),
+                key=lambda item: item[1].max_cost or math.inf,
+            )
+        ]
+        self._set_decompression_limit()
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        del state["lanes"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        # Worker processes' Pillow needs the same limit
+        self._set_decompression_limit()
+
+    def _set_decompression_limit(self) -> None:
+        # Pillow's own bomb check rejects images above twice its limit
+        # while opening them, before `check_pixels()` could. The shared
+        # limit is raised to the largest `max_pixels`, never removed.
+        if max_pixels := self.config.max_pixels:
+            Image.MAX_IMAGE_PIXELS = max(
+                Image.MAX_IMAGE_PIXELS or 0, max_pixels
+            )
+
+    def _open_image(self, file: BinaryIO) -> Image.Image:
+        """Opens the image, parsing its header only.
+
+        Args:
+            file (BinaryIO): The image's content.
+
+        Raises:
+            ImageTooLargeError: When Pillow's bomb check rejects the image.
+
+        Returns:
+            Image.Image: The opened, not yet loaded, image.
+        """
+        try:
+            return Image.open(file)
+        except Image.DecompressionBombError as exc:
+            METRICS.incr("image.too_large")
+            raise ImageTooLargeError(
+                "Maximum pixel count exceeded.",
+                pixels=None,
+                max_pixels=self.config.max_pixels
+                or 2 * cast(int, Image.MAX_IMAGE_PIXELS),
+                media_type=self.media_type,
+            ) from exc
+
+    @property
+    def supports_direct_upload(self) -> bool:
+        return not (self.config.resize or self.config.force_format)
+
+    @property
+    def supports_streaming(self) -> bool:
+        # Sinks can't be handed over to worker processes
+        return not self.supports_direct_upload and isinstance(
+            self.executor, ThreadMediaExecutor
+        )
+
+    @property
+    def executor(self) -> AbstractMediaExecutor:
+        return IMAGE_EXECUTOR
+
+    async def arun(self, job: Job[R], filename: str, file: BinaryIO) -> R:
+        """
+        Runs the job on the executor once the lane of the image's size
+        class lets it in, so large images don't hold small ones up. The
+        decode cost is estimated from the image's header.
+
+        Args:
+            job (Job[R]): The job to run.
+            filename (str): The file's filename.
+            file (BinaryIO): The image's content.
+
+        Raises:
+            ImageTooLargeError: When the image has too many pixels.
+            MediaProcessingUnavailableError: When the job is not admitted.
+
+        Returns:
+            R: The job's result.
+        """
+        if not self.lanes and not self.config.max_pixels:
+            return await super().arun(job, filename, file)
+
+        with self._open_image(file) as img:
+            self.check_pixels(img)
+            cost = self.estimate_cost(img)
+
+        file.seek(0)
+
+        async with self.get_lane(cost).admit(cost):
+            return await self.executor.run(job, filename, file)
+
+    def get_lane(self, cost: int) -> AdmissionController:
+        """
+        Returns the admission controller of the smallest size class which
+        the decode cost fits in, the largest one if none.
+
+        Args:
+            cost (int): The image's estimated decode cost in bytes.
+
+        Returns:
+            AdmissionController: The lane's admission controller.
+        """
+        if not self.lanes:
+            return self.admission
+
+        return next(
+            (
+                lane
+                for max_cost, lane in self.lanes
+                if max_cost is None or cost <= max_cost
+            ),
+            self.lanes[-1][1],
+        )
+
+    @staticmethod
+    def estimate_cost(img: Image.Image) -> int:
+        """
+        Estimates the memory needed to decode the image from its header.
+
+        Args:
+            img (Image.Image): The opened, not yet loaded, image.
+
+        Returns:
+            int: The decoded image's size in bytes, one per band and pixel.
+        """
+        return img.width * img.height * len(img.getbands())
+
+    def check_pixels(self, img: Image.Image) -> None:
+        """
+        Checks if the image's pixel count does not exceed the limit, using
+        its header only.
+
+        Args:
+            img (Image.Image): The opened, not yet loaded, image.
+
+        Raises:
+            ImageTooLargeError: When the image has more than `max_pixels`.
+        """
+        max_pixels = self.config.max_pixels
+        pixels = img.width * img.height
+
+        if max_pixels and pixels > max_pixels:
+            METRICS.incr("image.too_large")
+            raise ImageTooLargeError(
+                "Maximum pixel count exceeded.",
+                pixels=pixels,
+                max_pixels=max_pixels,
+                media_type=self.media_type,
+            )
+
+    async def avalidate_media(
+        self,
+        filename: str,
+        file: BinaryIO,
+        sink: Callable[[bytes], None] | None = None,
+    ) -> tuple[str, BinaryIO]:
+        """
+        Runs the cheap base validators in place and hands the CPU-heavy
+        resizing over to the image executor.
+
+        Args:
+            filename (str): The file's filename.
+            file (BinaryIO): The file's content.
+            sink (Callable[[bytes], None] | None, optional): Receives the
+                re-encoded image while it's written. Only supported with
+                the thread executor. Defaults to None.
+
+        Raises:
+            ImageTooLargeError: When the image has too many pixels.
+
+        Returns:
+            tuple[str, BinaryIO]: Validated filename and file.
+        """
+        for validator in super().get_validators():
+            filename, file = validator(filename, file)
+            file.seek(0)
+
+        # Only parses the image's header
+        with self._open_image(file) as img:
+            self.check_pixels(img)
+            conforming = self.is_conforming(img)
+
+        file.seek(0)
+
+        if conforming:
+            METRICS.incr("image.passthrough")
+            return self.get_output_filename(filename), file
+
+        METRICS.incr("image.transcoded")
+        return await self.arun(
+            partial(self.resize_and_set_format, sink=sink),
+            filename,
+            file,
+        )
+
     def get_validators(
         self,
-    ) -> list[Callable[[str, BytesIO], tuple[str, BytesIO]]]:
+    ) -> list[Callable[[str, BinaryIO], tuple[str, BinaryIO]]]:
         """
         Returns the base and additional validator methods.
 
         Returns:
-            list[Callable[[str, BytesIO], tuple[str, BytesIO]]]: validator
+            list[Callable[[str, BinaryIO], tuple[str, BinaryIO]]]: validator
                 methods.
         """
         return [
@@ -157,41 +612,479 @@ class ImageMediaManager(BaseMediaManager[ImageMediaConfig]):
         ]
 
     def resize_and_set_format(
-        self, filename: str, file: BytesIO
-    ) -> tuple[str, BytesIO]:
+        self,
+        filename: str,
+        file: BinaryIO,
+        sink: Callable[[bytes], None] | None = None,
+    ) -> tuple[str, BinaryIO]:
         """
         Resizes and changes the format of the image if needed.
 
         Args:
             filename (str): The file's filename.
-            file (BytesIO): The file's content.
+            file (BinaryIO): The file's content.
+            sink (Callable[[bytes], None] | None, optional): Receives the
+                encoded image chunk by chunk while it's written.
+                Defaults to None.
+
+        Raises:
+            ImageTooLargeError: When the image has too many pixels.
 
         Returns:
-            tuple[str, BytesIO]: Validated filename and file content.
+            tuple[str, BinaryIO]: Validated filename and file content.
         """
-        result = BytesIO()
-        with Image.open(file) as img:
+        result = cast(BinaryIO, MediaBuffer())
+        with self._open_image(file) as img:
+            self.check_pixels(img)
+
+            if self.is_conforming(img):
+                file.seek(0)
+                return self.get_output_filename(filename), file
+
             img_format = img.format
 
             if resize := self.config.resize:
-                img.thumbnail(
-                    (resize.max_width, resize.max_height),
-                    resample=Image.Resampling.LANCZOS,
-                )
+                img = self._resize(img, resize)
+
+            filename = self.get_output_filename(filename)
 
             if force_format := self.config.force_format:
                 img_format = force_format.pil_format
-                filename = change_file_extension(
-                    filename, new_extension=force_format.file_extension
-                )
 
                 if img.mode != force_format.convert_mode:
                     img = img.convert(force_format.convert_mode)
 
-            img.save(result, format=img_format)
+            img.save(
+                TeeWriter(result, sink) if sink else result, format=img_format
+            )
 
         return filename, result
 
+    async def ainspect_media(self, filename: str, file: BinaryIO) -> MediaInfo:
+        """Inspects the image on the image executor.
+
+        Args:
+            filename (str): The validated filename.
+            file (BinaryIO): The validated file content.
+
+        Returns:
+            MediaInfo: The image's info.
+        """
+        return await self.arun(self.inspect_media, filename, file)
+
+    def inspect_media(self, filename: str, file: BinaryIO) -> MediaInfo:
+        """
+        Returns the image's info, including its dimensions and placeholder.
+        Only the placeholder needs the image to be decoded.
+
+        Args:
+            filename (str): The validated filename.
+            file (BinaryIO): The validated file content.
+
+        Returns:
+            MediaInfo: The image's info.
+        """
+        info = super().inspect_media(filename, file)
+
+        with self._open_image(file) as img:
+            info = info._replace(
+                content_type=Image.MIME.get(
+                    img.format or "", info.content_type
+                ),
+                width=img.width,
+                height=img.height,
+            )
+
+            if placeholder := self.config.placeholder:
+                info = info._replace(
+                    placeholder=self._render_placeholder(img, placeholder)
+                )
+
+        file.seek(0)
+        return info
+
+    @staticmethod
+    def _render_placeholder(
+        img: Image.Image, placeholder: ImageMediaPlaceholderConfig
+    ) -> str:
+        """
+        Encodes a tiny WebP of the image as a data URI.
+
+        Args:
+            img (Image.Image): The opened image, modified in place.
+            placeholder (ImageMediaPlaceholderConfig): The placeholder
+                config.
+
+        Returns:
+            str: The placeholder's data URI.
+        """
+        size = (placeholder.max_size, placeholder.max_size)
+
+        # Decoded at up to 1/8 scale where the format allows (JPEG)
+        img.draft("RGB", size)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if img.has_transparency_data else "RGB")
+
+        img.thumbnail(size)
+
+        buffer = io.BytesIO()
+        img.save(buffer, format="WEBP", quality=placeholder.quality)
+
+        encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+        return f"data:image/webp;base64,{encoded}"
+
+    def is_conforming(self, img: Image.Image) -> bool:
+        """
+        Checks if the image can be stored as is, using its header only.
+
+        Args:
+            img (Image.Image): The opened, not yet loaded, image.
+
+        Returns:
+            bool: Whether the image needs no resizing or conversion.
+        """
+        # Re-encoding strips metadata (e.g. GPS location), keep doing it.
+        if "exif" in img.info:
+            return False
+
+        if (resize := self.config.resize) and (
+            img.width > resize.max_width or img.height > resize.max_height
+        ):
+            return False
+
+        if force_format := self.config.force_format:
+            return (
+                img.format == force_format.pil_format
+                and img.mode == force_format.convert_mode
+            )
+
+        return True
+
+    def get_output_filename(self, filename: str) -> str:
+        """
+        Returns the filename which the processed image is stored with.
+
+        Args:
+            filename (str): The file's filename.
+
+        Returns:
+            str: The output filename.
+        """
+        if force_format := self.config.force_format:
+            return change_file_extension(
+                filename, new_extension=force_format.file_extension
+            )
+
+        return filename
+
+    @staticmethod
+    def _resize(
+        img: Image.Image, resize: ImageMediaResizeConfig
+    ) -> Image.Image:
+        """
+        Shrinks the image to fit in the resize box, keeping aspect ratio.
+
+        Args:
+            img (Image.Image): The image. Must not be loaded yet when
+                shrink_on_load is enabled.
+            resize (ImageMediaResizeConfig): The resize config.
+
+        Returns:
+            Image.Image: The resized image or the image itself if it
+                already fits in the resize box.
+        """
+        if not resize.shrink_on_load:
+            img.thumbnail(
+                (resize.max_width, resize.max_height),
+                resample=Image.Resampling.LANCZOS,
+            )
+            return img
+
+        ratio = min(
+            resize.max_width / img.width, resize.max_height / img.height
+        )
+        if ratio >= 1:
+            return img
+
+        target_size = (
+            max(round(img.width * ratio), 1),
+            max(round(img.height * ratio), 1),
+        )
+
+        # Ask the decoder for a reduced scale decode. It's a no-op for
+        # formats which don't support it, resize() reduces them instead.
+        draft = img.draft(
+            None,
+            (
+                math.ceil(target_size[0] * resize.reducing_gap),
+                math.ceil(target_size[1] * resize.reducing_gap),
+            ),
+        )
+
+        return img.resize(
+            target_size,
+            resample=Image.Resampling.LANCZOS,
+            box=draft[1] if draft else None,
+            reducing_gap=resize.reducing_gap,
+        )
+
+    @property
+    def eager_thumbnails(self) -> bool:
+        """Whether thumbnails are rendered and stored at upload."""
+        return bool(self.config.thumbnails and self.config.thumbnails.eager)
+
+    async def arender_thumbnails(
+        self, filename: str, file: BinaryIO
+    ) -> dict[str, BinaryIO]:
+        """Renders the thumbnails on the image executor.
+
+        Args:
+            filename (str): The validated filename.
+            file (BinaryIO): The validated file content.
+
+        Returns:
+            dict[str, BinaryIO]: Rendered thumbnails by their size names.
+        """
+        return await self.arun(self.render_thumbnails, filename, file)
+
+    def render_thumbnails(
+        self, filename: str, file: BinaryIO
+    ) -> dict[str, BinaryIO]:
+        """
+        Renders all configured thumbnail sizes. The image is decoded once
+        and each size is resampled from the previous, larger, one.
+
+        Args:
+            filename (str): The validated filename.
+            file (BinaryIO): The validated file content.
+
+        Returns:
+            dict[str, BinaryIO]: Rendered thumbnails by their size names.
+        """
+        if not self.config.thumbnails:
+            return {}
+
+        sizes = sorted(
+            self.config.thumbnails.sizes.items(),
+            key=lambda size: size[1].width * size[1].height,
+            reverse=True,
+        )
+        thumbnails: dict[str, BinaryIO] = {}
+
+        with self._open_image(file) as img:
+            img_format = img.format
+            current = img
+
+            for size_name, size_conf in sizes:
+                target_size = self._fit_size(
+                    current.size, (size_conf.width, size_conf.height)
+                )
+                if target_size != current.size:
+                    current = current.resize(
+                        target_size, resample=Image.Resampling.LANCZOS
+                    )
+
+                thumbnails[size_name] = cast(BinaryIO, MediaBuffer())
+                current.save(thumbnails[size_name], format=img_format)
+                thumbnails[size_name].seek(0)
+
+                if self.eager_output_formats:
+                    for output_format in self.output_formats:
+                        thumbnails[
+                            self.get_variant_name(size_name, output_format)
+                        ] = self._encode(current, output_format)
+
+        return thumbnails
+
+    @property
+    def output_formats(self) -> list[ImageMediaOutputFormatConfig]:
+        """Extra formats which images are served in, by preference."""
+        if self.config.output_formats:
+            return self.config.output_formats.formats
+
+        return []
+
+    @property
+    def eager_output_formats(self) -> bool:
+        """Whether images are encoded in all output formats at upload."""
+        return bool(
+            self.config.output_formats and self.config.output_formats.eager
+        )
+
+    @staticmethod
+    def get_variant_name(
+        name: str, output_format: ImageMediaOutputFormatConfig | None
+    ) -> str:
+        """
+        Returns the name of a variant (e.g. a thumbnail size) in the given
+        output format, e.g. `md.webp`.
+
+        Args:
+            name (str): The variant's name.
+            output_format (ImageMediaOutputFormatConfig | None): The output
+                format or None for the original's format.
+
+        Returns:
+            str: The variant's name in the output format.
+        """
+        if not output_format:
+            return name
+
+        return f"{name}.{output_format.file_extension}"
+
+    def get_output_format(
+        self, file_extension: str
+    ) -> ImageMediaOutputFormatConfig | None:
+        """Finds the output format by its file extension.
+
+        Args:
+            file_extension (str): The output format's file extension.
+
+        Returns:
+            ImageMediaOutputFormatConfig | None: The output format.
+        """
+        return next(
+            (
+                output_format
+                for output_format in self.output_formats
+                if output_format.file_extension == file_extension
+            ),
+            None,
+        )
+
+    def negotiate_output_format(
+        self, accept: str | None
+    ) -> ImageMediaOutputFormatConfig | None:
+        """
+        Picks the preferred output format which the client accepts. Only
+        explicitly listed content types count, clients send wildcards
+        (e.g. image/*) regardless of the formats they can decode.
+
+        Args:
+            accept (str | None): The request's Accept header.
+
+        Returns:
+            ImageMediaOutputFormatConfig | None: The output format or None
+                when the original's format should be served.
+        """
+        if not self.output_formats:
+            return None
+
+        accepted = parse_accept(accept)
+
+        return next(
+            (
+                output_format
+                for output_format in self.output_formats
+                if accepted.get(output_format.content_type, 0) > 0
+            ),
+            None,
+        )
+
+    async def arender_output_formats(
+        self,
+        filename: str,
+        file: BinaryIO,
+        file_extensions: list[str] | None = None,
+    ) -> dict[str, BinaryIO]:
+        """Encodes the image in the output formats on the image executor.
+
+        Args:
+            filename (str): The validated filename.
+            file (BinaryIO): The validated file content.
+            file_extensions (list[str] | None, optional): Only encodes the
+                formats with these file extensions. Defaults to None.
+
+        Returns:
+            dict[str, BinaryIO]: Encoded images by their file extensions.
+        """
+        return await self.arun(
+            partial(
+                self.render_output_formats, file_extensions=file_extensions
+            ),
+            filename,
+            file,
+        )
+
+    def render_output_formats(
+        self,
+        filename: str,
+        file: BinaryIO,
+        file_extensions: list[str] | None = None,
+    ) -> dict[str, BinaryIO]:
+        """
+        Encodes the image in the output formats, the image is decoded once.
+
+        Args:
+            filename (str): The validated filename.
+            file (BinaryIO): The validated file content.
+            file_extensions (list[str] | None, optional): Only encodes the
+                formats with these file extensions. Defaults to None.
+
+        Returns:
+            dict[str, BinaryIO]: Encoded images by their file extensions.
+        """
+        output_formats = [
+            output_format
+            for output_format in self.output_formats
+            if file_extensions is None
+            or output_format.file_extension in file_extensions
+        ]
+        if not output_formats:
+            return {}
+
+        with self._open_image(file) as img:
+            img.load()
+
+            return {
+                output_format.file_extension: self._encode(img, output_format)
+                for output_format in output_formats
+            }
+
+    @staticmethod
+    def _encode(
+        img: Image.Image, output_format: ImageMediaOutputFormatConfig
+    ) -> BinaryIO:
+        convert_mode = output_format.convert_mode
+        if convert_mode and img.mode != convert_mode:
+            img = img.convert(convert_mode)
+
+        options = {}
+        if output_format.quality:
+            options["quality"] = output_format.quality
+
+        encoded = cast(BinaryIO, MediaBuffer())
+        img.save(encoded, format=output_format.pil_format, **options)
+        encoded.seek(0)
+
+        return encoded
+
+    @staticmethod
+    def _fit_size(
+        size: tuple[int, int], box: tuple[int, int]
+    ) -> tuple[int, int]:
+        # Same as imgproxy's `fit` resizing type
+        ratio = min(box[0] / size[0], box[1] / size[1])
+        if ratio >= 1 and not IMGPROXY_RESIZE_ENLARGE:
+            return size
+
+        return max(round(size[0] * ratio), 1), max(round(size[1] * ratio), 1)
+
+    def resolve_thumbnail_size(self, size_name: str | None) -> str | None:
+        """
+        Returns the given size name or the default one when it's None.
+
+        Args:
+            size_name (str | None): Thumbnail size name or None.
+
+        Returns:
+            str | None: The thumbnail size name.
+        """
+        if size_name or not self.config.thumbnails:
+            return size_name
+
+        return self.config.thumbnails.default_size
+
     def get_thumbnail_sizes(self) -> list[str]:
         """Returns list of available thumbnail sizes.
 
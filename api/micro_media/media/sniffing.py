@@ -0,0 +1,127 @@
+"""
+Detects file formats from their first bytes (magic numbers), so uploads
+can be checked against their extension before being read completely.
+"""
+
+# Enough for every signature below, including the names of the first
+# entries of ZIP based documents.
+SNIFF_SIZE = 4096
+
+ZIP_SIGNATURE = b"PK\x03\x04"
+OLE2_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+EBML_SIGNATURE = b"\x1a\x45\xdf\xa3"
+
+ODT_MIMETYPE = b"mimetypeapplication/vnd.oasis.opendocument.text"
+
+# Office Open XML documents keep their parts in these directories
+OOXML_DIRECTORIES = ((b"word/", "docx"), (b"xl/", "xlsx"), (b"ppt/", "pptx"))
+OOXML_FORMATS = frozenset({"docx", "xlsx", "pptx", "zip"})
+
+# QuickTime files which predate `ftyp` start with one of these atoms
+QUICKTIME_ATOMS = (b"moov", b"mdat", b"wide", b"free", b"skip", b"pnot")
+
+# Extensions which have a known signature, so their content is checked.
+# Extensions of the same format (e.g. jpg and jpeg) share a signature.
+SNIFFABLE_FORMATS = frozenset(
+    {
+        "png",
+        "jpg",
+        "jpeg",
+        "gif",
+        "webp",
+        "mp4",
+        "mov",
+        "mkv",
+        "webm",
+        "pdf",
+        "doc",
+        "docx",
+        "xlsx",
+        "pptx",
+        "odt",
+    }
+)
+
+
+def sniff_formats(head: bytes) -> frozenset[str]:
+    """
+    Returns the extensions which the content may have, based on its
+    first bytes. Containers shared by several formats (e.g. MP4 and MOV)
+    match all of them.
+
+    Args:
+        head (bytes): The file's first `SNIFF_SIZE` bytes, or the whole
+            file if it's smaller.
+
+    Returns:
+        frozenset[str]: Matching extensions, empty when unknown.
+    """
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return frozenset({"png"})
+
+    if head.startswith(b"\xff\xd8\xff"):
+        return frozenset({"jpg", "jpeg"})
+
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return frozenset({"gif"})
+
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return frozenset({"webp"})
+
+    if head[4:8] == b"ftyp":
+        return _sniff_iso_media(head)
+
+    if head[4:8] in QUICKTIME_ATOMS:
+        return frozenset({"mov"})
+
+    if head.startswith(EBML_SIGNATURE):
+        return _sniff_matroska(head)
+
+    # Readers accept the header anywhere in the first KB
+    if b"%PDF-" in head[:1024]:
+        return frozenset({"pdf"})
+
+    if head.startswith(OLE2_SIGNATURE):
+        return frozenset({"doc"})
+
+    if head.startswith(ZIP_SIGNATURE):
+        return _sniff_zip_document(head)
+
+    return frozenset()
+
+
+def _sniff_iso_media(head: bytes) -> frozenset[str]:
+    brand = head[8:12]
+
+    if brand in (b"avif", b"avis"):
+        return frozenset({"avif"})
+
+    if brand in (b"heic", b"heix", b"mif1", b"msf1"):
+        return frozenset({"heic"})
+
+    # Both are ISO base media files and players accept either extension
+    return frozenset({"mp4", "mov"})
+
+
+def _sniff_matroska(head: bytes) -> frozenset[str]:
+    if b"webm" in head:
+        return frozenset({"webm"})
+
+    if b"matroska" in head:
+        return frozenset({"mkv"})
+
+    return frozenset({"mkv", "webm"})
+
+
+def _sniff_zip_document(head: bytes) -> frozenset[str]:
+    # ODF requires an uncompressed `mimetype` entry to come first
+    if ODT_MIMETYPE in head:
+        return frozenset({"odt"})
+
+    for directory, extension in OOXML_DIRECTORIES:
+        if directory in head:
+            return frozenset({extension})
+
+    # Office documents' entries may come in any order and the telling
+    # ones may be beyond the head, so any of them is possible.
+    return OOXML_FORMATS
@@ -11,6 +11,15 @@ from micro_media.settings import (
 )
 from .config import ImageMediaThumbnailSizeConfig
 
+# Keyed and salted once, each signature continues from a copy of it
+_SIGNATURE_HMAC = hmac.new(
+    key=bytes.fromhex(IMGPROXY_KEY),
+    msg=bytes.fromhex(IMGPROXY_SALT),
+    digestmod=hashlib.sha256,
+)
+# Links are absolute paths on the host, as `urljoin()` would make them
+_IMGPROXY_ORIGIN = urljoin(IMGPROXY_HOST, "/").rstrip("/")
+
 
 class IMGProxyThumbnailManager:
     @staticmethod
@@ -26,11 +35,9 @@ class IMGProxyThumbnailManager:
         if not unsigned_path.startswith("/"):
             raise ValueError("`unsigned_path` must start with `/`.")
 
-        signature = hmac.new(
-            key=bytes.fromhex(IMGPROXY_KEY),
-            msg=bytes.fromhex(IMGPROXY_SALT) + unsigned_path.encode("utf-8"),
-            digestmod=hashlib.sha256,
-        ).digest()
+        signature_hmac = _SIGNATURE_HMAC.copy()
+        signature_hmac.update(unsigned_path.encode("utf-8"))
+        signature = signature_hmac.digest()
 
         return base64.urlsafe_b64encode(signature).rstrip(b"=")
 
@@ -38,6 +45,7 @@ class IMGProxyThumbnailManager:
         self,
         original_file_link: str,
         thumbnail_size: ImageMediaThumbnailSizeConfig,
+        file_extension: str | None = None,
     ) -> str:
         processing_options = self._get_processing_options(
             thumbnail_size=thumbnail_size
@@ -48,9 +56,12 @@ class IMGProxyThumbnailManager:
         ).decode("utf-8")
 
         unsigned_path = f"/{processing_options}/{encoded_file_link}"
+        if file_extension:
+            # imgproxy encodes the result in the extension's format
+            unsigned_path += f".{file_extension}"
 
         encoded_signature = self._get_encoded_path_signature(
             unsigned_path=unsigned_path
         ).decode("utf-8")
 
-        return urljoin(IMGPROXY_HOST, f"/{encoded_signature}{unsigned_path}")
+        return f"{_IMGPROXY_ORIGIN}/{encoded_signature}{unsigned_path}"
@@ -10,7 +10,7 @@ from sqlalchemy.ext.asyncio import (
 from micro_media.settings import SQLALCHEMY_CONN_STR, SQLALCHEMY_ECHO
 
 from .base import Base
-from .media import Media, MediaType
+from .media import Media, MediaType, MediaStatus
 
 
 # create the engine only once
@@ -36,8 +36,10 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
 
 __all__ = [
     "Base",
+    "AsyncSessionLocal",
     "get_engine",
     "get_session",
     "Media",
     "MediaType",
+    "MediaStatus",
 ]
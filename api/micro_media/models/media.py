@@ -11,6 +11,12 @@ class MediaType(str, enum.Enum):
     DOCUMENT = "document"
 
 
+class MediaStatus(str, enum.Enum):
+    READY = "ready"
+    PROCESSING = "processing"
+    FAILED = "failed"
+
+
 class Media(Base):
     __tablename__ = "media"
 
@@ -27,9 +33,32 @@ class Media(Base):
 
     ack = sa.Column(sa.Boolean, nullable=False, default=False, index=True)
 
+    status = sa.Column(
+        sa.Enum(
+            *[choice.value for choice in MediaStatus], name="media_status"
+        ),
+        nullable=False,
+        default=MediaStatus.READY.value,
+        server_default=MediaStatus.READY.value,
+    )
+
     owner_id = sa.Column(sa.UUID, nullable=False, index=True)
     storage_id = sa.Column(sa.UUID, nullable=False, index=True)
     file_identifier = sa.Column(sa.String, nullable=False, index=True)
+    # SHA-256 of the stored content, used for deduplication
+    content_hash = sa.Column(sa.String(64), nullable=True)
+    # Stored thumbnails' file identifiers by their size names
+    thumbnails = sa.Column(sa.JSON, nullable=True)
+    # The image stored in other output formats by their file extensions
+    variants = sa.Column(sa.JSON, nullable=True)
+
+    # The stored file's info, unknown until it's processed
+    file_size = sa.Column(sa.BigInteger, nullable=True)
+    content_type = sa.Column(sa.String, nullable=True)
+    width = sa.Column(sa.Integer, nullable=True)
+    height = sa.Column(sa.Integer, nullable=True)
+    # A tiny preview of images as a data URI
+    placeholder = sa.Column(sa.String, nullable=True)
 
     created_at = sa.Column(
         sa.DateTime, nullable=False, server_default=sa.func.now()
@@ -37,7 +66,15 @@ class Media(Base):
     ack_at = sa.Column(sa.DateTime, nullable=True)
 
     __table_args__ = (
-        sa.UniqueConstraint(
-            "storage_id", "file_identifier", name="unique_identifier"
+        sa.Index(
+            "ix_media_storage_id_content_hash", "storage_id", "content_hash"
+        ),
+        # Deduplicated media share their files, others must not
+        sa.Index(
+            "unique_identifier",
+            "storage_id",
+            "file_identifier",
+            unique=True,
+            postgresql_where=content_hash.is_(None),
         ),
     )
@@ -0,0 +1,248 @@
+import logging
+from uuid import UUID
+
+import sqlalchemy as sa
+from PIL import Image
+from sqlalchemy.ext.asyncio import AsyncSession
+from redis.asyncio.client import Redis
+from redis.exceptions import ResponseError
+
+from micro_media.models import AsyncSessionLocal, Media, MediaStatus
+from micro_media.media import MEDIA_CONTEXT as MC
+from micro_media.storage import STORAGE_CONTEXT as SC
+from micro_media.settings import MEDIA_PROCESSING_CLAIM_IDLE_TIME
+from micro_media.uploads import (
+    discard_stored_media,
+    open_streaming_upload,
+    save_media_file,
+)
+from micro_media.utils.buffers import MediaBuffer
+
+
+logger = logging.getLogger(__name__)
+
+
+class MediaProcessingQueue:
+    """
+    A Redis stream of uploaded media waiting to be processed. Workers
+    read it through a consumer group, so each job is handled by one
+    worker and jobs of crashed workers are claimed by others.
+    """
+
+    group = "workers"
+
+    redis: Redis
+    stream: str
+
+    @classmethod
+    def init(cls, redis: Redis, prefix: str) -> None:
+        cls.redis = redis
+        cls.stream = prefix + "media_processing"
+
+    @classmethod
+    async def enqueue(cls, media_id: UUID, filename: str) -> None:
+        """Adds the media to the queue.
+
+        Args:
+            media_id (UUID): The media's id.
+            filename (str): The uploaded file's original filename.
+        """
+        await cls.redis.xadd(
+            cls.stream, {"media_id": str(media_id), "filename": filename}
+        )
+
+    @classmethod
+    async def create_group(cls) -> None:
+        try:
+            await cls.redis.xgroup_create(
+                cls.stream, cls.group, id="0", mkstream=True
+            )
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    @classmethod
+    async def read(
+        cls, consumer: str, count: int = 1, block: int = 1000
+    ) -> list[tuple[str, dict[str, str]]]:
+        """
+        Reads jobs which were left idle by other workers first and then
+        new ones.
+
+        Args:
+            consumer (str): The worker's consumer name.
+            count (int, optional): Max number of jobs. Defaults to 1.
+            block (int, optional): Milliseconds to wait for new jobs.
+                Defaults to 1000.
+
+        Returns:
+            list[tuple[str, dict[str, str]]]: Jobs' ids and fields.
+        """
+        _, claimed, *_ = await cls.redis.xautoclaim(
+            cls.stream,
+            cls.group,
+            consumer,
+            min_idle_time=MEDIA_PROCESSING_CLAIM_IDLE_TIME * 1000,
+            count=count,
+        )
+        # Deleted jobs are claimed without their fields
+        if claimed := [job for job in claimed if job[1]]:
+            return claimed
+
+        response = await cls.redis.xreadgroup(
+            cls.group, consumer, {cls.stream: ">"}, count=count, block=block
+        )
+        return response[0][1] if response else []
+
+    @classmethod
+    async def get_delivery_count(cls, job_id: str) -> int:
+        pending = await cls.redis.xpending_range(
+            cls.stream, cls.group, min=job_id, max=job_id, count=1
+        )
+        return pending[0]["times_delivered"] if pending else 0
+
+    @classmethod
+    async def ack(cls, job_id: str) -> None:
+        async with cls.redis.pipeline(transaction=True) as pipe:
+            pipe.xack(cls.stream, cls.group, job_id)
+            pipe.xdel(cls.stream, job_id)
+            await pipe.execute()
+
+
+def _select_processing_media(media_id: UUID, skip_locked: bool = True):
+    # Locked while it's swapped, so neither other workers nor deletions
+    # touch the media meanwhile.
+    return (
+        sa.select(Media)
+        .where(Media.id == media_id, Media.status == MediaStatus.PROCESSING)
+        .with_for_update(skip_locked=skip_locked)
+    )
+
+
+async def _is_processing(session: AsyncSession, media_id: UUID) -> bool:
+    return bool(
+        await session.scalar(
+            sa.select(
+                sa.exists().where(
+                    Media.id == media_id,
+                    Media.status == MediaStatus.PROCESSING,
+                )
+            )
+        )
+    )
+
+
+async def process_media(media_id: UUID, filename: str) -> bool:
+    """
+    Processes the raw uploaded file, stores the result and swaps it in
+    place of the raw file. Skips media which were deleted or processed.
+
+    The media's row is only locked for the swap, not while the file is
+    processed, so another worker may process it concurrently once its
+    job is claimed again. The first swap wins and the others' results
+    are discarded.
+
+    Args:
+        media_id (UUID): The media's id.
+        filename (str): The uploaded file's original filename.
+
+    Raises:
+        ValueError: When the uploaded file is invalid.
+
+    Returns:
+        bool: False when the media was locked by another transaction and
+            should be processed again later, True otherwise.
+    """
+    async with AsyncSessionLocal() as session:
+        media = await session.scalar(
+            sa.select(Media).where(
+                Media.id == media_id, Media.status == MediaStatus.PROCESSING
+            )
+        )
+        if not media:
+            return True
+
+    storage_manager = SC.get_manager(storage_id=media.storage_id)
+    media_manager = MC.get_manager(media.media_type)
+    raw_file_identifier = media.file_identifier
+
+    # Only used if the content turns out to be a duplicate, connections
+    # are checked out lazily.
+    async with AsyncSessionLocal() as session:
+        with MediaBuffer() as raw_file:
+            raw_file.write(
+                await storage_manager.read_file(raw_file_identifier)
+            )
+            raw_file.seek(0)
+
+            async with open_streaming_upload(
+                storage_manager=storage_manager,
+                media_manager=media_manager,
+                media_type=media.media_type,
+                owner_id=media.owner_id,
+                filename=filename,
+            ) as stream:
+                try:
+                    filename, file = await media_manager.avalidate_media(
+                        filename=filename,
+                        file=raw_file,
+                        sink=stream and stream.write,
+                    )
+                except (OSError, Image.DecompressionBombError) as exc:
+                    # Pillow's errors for images it can't decode
+                    raise ValueError(f"Undecodable image: {exc}") from exc
+
+                if file is not raw_file:
+                    raw_file.close()
+
+                with file:
+                    stored_media = await save_media_file(
+                        session=session,
+                        storage_manager=storage_manager,
+                        media_manager=media_manager,
+                        media_type=media.media_type,
+                        owner_id=media.owner_id,
+                        filename=filename,
+                        file=file,
+                        stream=stream,
+                    )
+
+        try:
+            media = await session.scalar(_select_processing_media(media_id))
+            if media:
+                media.file_identifier = stored_media.file_identifier
+                media.content_hash = stored_media.content_hash
+                media.thumbnails = stored_media.thumbnails
+                media.variants = stored_media.variants
+                for column, value in stored_media.get_info_columns().items():
+                    setattr(media, column, value)
+                media.status = MediaStatus.READY.value
+                await session.commit()
+            else:
+                locked = await _is_processing(session, media_id)
+        except BaseException:
+            await discard_stored_media(storage_manager, [stored_media])
+            raise
+
+    if not media:
+        # Processed or deleted meanwhile, or being swapped by another
+        # worker which may still fail.
+        await discard_stored_media(storage_manager, [stored_media])
+        return not locked
+
+    await storage_manager.delete_file(raw_file_identifier)
+    return True
+
+
+async def fail_media_processing(media_id: UUID) -> None:
+    """Marks the media's processing as failed.
+
+    Args:
+        media_id (UUID): The media's id.
+    """
+    async with AsyncSessionLocal() as session:
+        if media := await session.scalar(
+            _select_processing_media(media_id, skip_locked=False)
+        ):
+            media.status = MediaStatus.FAILED.value
+            await session.commit()
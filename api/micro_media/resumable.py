@@ -0,0 +1,444 @@
+import io
+import time
+import asyncio
+import logging
+import contextlib
+from uuid import UUID, uuid4
+from typing import AsyncIterator
+
+from pydantic import BaseModel
+from redis.asyncio.client import Redis
+from redis.asyncio.lock import Lock
+from redis.exceptions import LockError, LockNotOwnedError
+from starlette.requests import ClientDisconnect
+
+from micro_media.settings import RESUMABLE_UPLOAD_EXPIRES_IN
+from micro_media.storage import STORAGE_CONTEXT as SC
+from micro_media.storage.manager import AbstractStorageManager
+
+
+logger = logging.getLogger(__name__)
+
+PENDING_PART_VARIANT = "pending-part"
+
+# Saves the upload's state only while the request's lock is still held
+SAVE_LOCKED_SCRIPT = """
+if redis.call("get", KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call("setex", KEYS[2], ARGV[2], ARGV[3])
+redis.call("zadd", KEYS[3], ARGV[4], ARGV[5])
+return 1
+"""
+
+
+class UploadLengthExceededError(ValueError):
+    pass
+
+
+class ResumableUpload(BaseModel):
+    id: str
+    owner_id: UUID
+    storage_id: UUID
+    media_type: str
+    filename: str
+    content_type: str | None = None
+    title: str | None = None
+    description: str | None = None
+    file_identifier: str
+    upload_id: str
+    length: int
+    offset: int = 0
+    # Uploaded parts' numbers and tags
+    parts: list[tuple[int, str]] = []
+    # The received data which does not fill a whole part yet
+    pending_file_identifier: str | None = None
+    pending_size: int = 0
+    expires_at: float
+
+    @property
+    def is_complete(self) -> bool:
+        return self.offset == self.length
+
+
+class ResumableUploads:
+    """
+    Keeps resumable uploads' state in Redis. Every upload expires after
+    `RESUMABLE_UPLOAD_EXPIRES_IN` seconds of inactivity, expired uploads
+    are tracked in a sorted set so their storage parts can be aborted.
+    """
+
+    prefix: str
+    redis: Redis
+
+    @classmethod
+    def init(cls, redis: Redis, prefix: str) -> None:
+        cls.redis = redis
+        cls.prefix = prefix
+
+    @classmethod
+    def _key(cls, upload_id: str) -> str:
+        return cls.prefix + upload_id
+
+    @classmethod
+    def _expiry_key(cls) -> str:
+        return cls.prefix + "expiry"
+
+    @classmethod
+    async def get(cls, upload_id: str) -> ResumableUpload | None:
+        value = await cls.redis.get(cls._key(upload_id))
+        if value is None:
+            return None
+
+        return ResumableUpload.model_validate_json(value)
+
+    @classmethod
+    async def save(
+        cls, upload: ResumableUpload, lock: Lock | None = None
+    ) -> None:
+        """Saves the upload's state and postpones its expiry.
+
+        Args:
+            upload (ResumableUpload): The upload's state.
+            lock (Lock | None, optional): The upload's lock, if the state
+                may only be saved while it's held. Defaults to None.
+
+        Raises:
+            LockNotOwnedError: When the lock is no longer held, e.g. it
+                expired and another request took the upload over.
+        """
+        upload.expires_at = time.time() + RESUMABLE_UPLOAD_EXPIRES_IN
+        # Outlives the expiry so the cleanup can still abort the parts
+        ttl = RESUMABLE_UPLOAD_EXPIRES_IN * 2
+
+        if lock:
+            if not await cls.redis.eval(
+                SAVE_LOCKED_SCRIPT,
+                3,
+                lock.name,
+                cls._key(upload.id),
+                cls._expiry_key(),
+                lock.local.token,
+                ttl,
+                upload.model_dump_json(),
+                upload.expires_at,
+                upload.id,
+            ):
+                raise LockNotOwnedError(
+                    "Upload's lock is no longer owned.", lock_name=lock.name
+                )
+            return
+
+        async with cls.redis.pipeline(transaction=True) as pipe:
+            pipe.setex(cls._key(upload.id), ttl, upload.model_dump_json())
+            pipe.zadd(cls._expiry_key(), {upload.id: upload.expires_at})
+            await pipe.execute()
+
+    @classmethod
+    async def delete(cls, upload: ResumableUpload) -> None:
+        async with cls.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(cls._key(upload.id))
+            pipe.zrem(cls._expiry_key(), upload.id)
+            await pipe.execute()
+
+    @classmethod
+    def lock(cls, upload_id: str, timeout: float = 60) -> Lock:
+        """
+        Returns a non-blocking lock which prevents concurrent appends to
+        the same upload.
+
+        Args:
+            upload_id (str): The upload's id.
+            timeout (float, optional): The lock's expiry in seconds.
+                Defaults to 60.
+
+        Returns:
+            Lock: The upload's lock.
+        """
+        return cls.redis.lock(
+            cls._key(upload_id) + ":lock", timeout=timeout, blocking=False
+        )
+
+    @classmethod
+    @contextlib.asynccontextmanager
+    async def hold(
+        cls, upload_id: str, timeout: float = 60
+    ) -> AsyncIterator[Lock]:
+        """
+        Acquires the upload's lock and keeps extending it in the
+        background until the context exits, so it doesn't expire while
+        a request's body stalls.
+
+        Args:
+            upload_id (str): The upload's id.
+            timeout (float, optional): The lock's expiry in seconds, if
+                the holder stops extending it. Defaults to 60.
+
+        Raises:
+            LockError: When the upload is locked already.
+
+        Yields:
+            Lock: The acquired lock.
+        """
+        lock = cls.lock(upload_id, timeout=timeout)
+        if not await lock.acquire():
+            raise LockError("Upload is locked.", lock_name=lock.name)
+
+        async def extend() -> None:
+            while True:
+                await asyncio.sleep(timeout / 3)
+
+                try:
+                    await lock.reacquire()
+                except LockError:
+                    # Saving the upload's state fails from now on
+                    logger.warning("Lost the lock of upload %s.", upload_id)
+                    return
+
+        extender = asyncio.create_task(extend())
+        try:
+            yield lock
+        finally:
+            extender.cancel()
+            # Expired locks might be taken by others already
+            with contextlib.suppress(LockError):
+                await lock.release()
+
+    @classmethod
+    async def cleanup_expired(cls) -> int:
+        """Aborts expired uploads and frees their storage parts.
+
+        Returns:
+            int: Number of the aborted uploads.
+        """
+        expired = await cls.redis.zrangebyscore(
+            cls._expiry_key(), 0, time.time()
+        )
+        aborted = 0
+
+        for upload_id in expired:
+            try:
+                async with cls.hold(upload_id):
+                    # Refreshed since it was listed
+                    expires_at = await cls.redis.zscore(
+                        cls._expiry_key(), upload_id
+                    )
+                    if expires_at is None or expires_at > time.time():
+                        continue
+
+                    if upload := await cls.get(upload_id):
+                        await abort_resumable_upload(
+                            SC.get_manager(storage_id=upload.storage_id),
+                            upload,
+                        )
+                    else:
+                        await cls.redis.zrem(cls._expiry_key(), upload_id)
+
+                    aborted += 1
+
+            except LockError:
+                # Being appended to right now
+                continue
+
+            except Exception:
+                logger.exception("Could not abort upload %s.", upload_id)
+
+        return aborted
+
+    @classmethod
+    async def run_cleanup(cls, interval: float) -> None:
+        """
+        Periodically aborts expired uploads until cancelled. A single
+        process cleans up each interval, others skip it.
+
+        Args:
+            interval (float): Seconds between each cleanup.
+        """
+        while True:
+            await asyncio.sleep(interval)
+
+            lock = cls.redis.lock(
+                cls.prefix + "cleanup:lock", timeout=interval, blocking=False
+            )
+            if not await lock.acquire():
+                continue
+
+            try:
+                if aborted := await cls.cleanup_expired():
+                    logger.info("Aborted %d expired uploads.", aborted)
+            except Exception:
+                logger.exception("Could not clean up expired uploads.")
+            finally:
+                # Held until it expires when the cleanup took longer
+                with contextlib.suppress(LockError):
+                    await lock.release()
+
+
+async def create_resumable_upload(
+    storage_manager: AbstractStorageManager,
+    owner_id: UUID,
+    media_type: str,
+    filename: str,
+    length: int,
+    content_type: str | None = None,
+    title: str | None = None,
+    description: str | None = None,
+) -> ResumableUpload:
+    """Starts a multipart upload on the storage and saves its state.
+
+    Args:
+        storage_manager (AbstractStorageManager): The storage manager.
+        owner_id (UUID): The file owner's id.
+        media_type (str): The media's type.
+        filename (str): The file's filename.
+        length (int): The file's whole size.
+        content_type (str | None, optional): The file's content type.
+        title (str | None, optional): The media's title.
+        description (str | None, optional): The media's description.
+
+    Returns:
+        ResumableUpload: The upload's state.
+    """
+    multipart_upload = await storage_manager.create_multipart_upload(
+        media_type=media_type,
+        owner_id=owner_id,
+        filename=filename,
+        content_type=content_type,
+    )
+
+    upload = ResumableUpload(
+        id=uuid4().hex,
+        owner_id=owner_id,
+        storage_id=storage_manager.storage_id,
+        media_type=media_type,
+        filename=filename,
+        content_type=content_type,
+        title=title,
+        description=description,
+        file_identifier=multipart_upload.file_identifier,
+        upload_id=multipart_upload.upload_id,
+        length=length,
+        expires_at=0,
+    )
+
+    await ResumableUploads.save(upload)
+    return upload
+
+
+async def append_resumable_upload(
+    storage_manager: AbstractStorageManager,
+    upload: ResumableUpload,
+    stream: AsyncIterator[bytes],
+    lock: Lock,
+) -> ResumableUpload:
+    """
+    Appends the streamed chunk to the upload. Whole parts are uploaded as
+    soon as they are received and the rest is kept on the storage until
+    the next append. The upload's offset is saved after every part, so
+    the received data is kept even if the client disconnects.
+
+    Args:
+        storage_manager (AbstractStorageManager): The storage manager.
+        upload (ResumableUpload): The upload's state.
+        stream (AsyncIterator[bytes]): The chunk's content.
+        lock (Lock): The upload's held lock, the state is only saved
+            while it's held.
+
+    Raises:
+        UploadLengthExceededError: When the chunk exceeds the upload's
+            length. Data received before the exceeding chunk is kept.
+        LockNotOwnedError: When the lock was lost, e.g. to another
+            request after it expired.
+
+    Returns:
+        ResumableUpload: The upload's updated state.
+    """
+    part_size = storage_manager.part_size
+
+    buffer = bytearray()
+    if upload.pending_size and upload.pending_file_identifier:
+        buffer += await storage_manager.read_file(
+            upload.pending_file_identifier
+        )
+
+    async def flush(body: bytes | memoryview) -> None:
+        part_number = len(upload.parts) + 1
+        etag = await storage_manager.upload_part(
+            file_identifier=upload.file_identifier,
+            upload_id=upload.upload_id,
+            part_number=part_number,
+            body=body,
+        )
+        upload.parts.append((part_number, etag))
+
+    try:
+        async for chunk in stream:
+            if upload.offset + len(chunk) > upload.length:
+                raise UploadLengthExceededError(
+                    "Chunk exceeds the upload's length."
+                )
+
+            buffer += chunk
+            upload.offset += len(chunk)
+
+            while len(buffer) >= part_size:
+                with memoryview(buffer) as view, view[:part_size] as part:
+                    await flush(part)
+                del buffer[:part_size]
+
+                # Only the uploaded parts are durable until the pending
+                # data gets saved at the end.
+                await ResumableUploads.save(
+                    upload.model_copy(
+                        update={
+                            "offset": upload.offset - len(buffer),
+                            "pending_size": 0,
+                        }
+                    ),
+                    lock=lock,
+                )
+
+    except ClientDisconnect:
+        pass
+
+    finally:
+        if upload.is_complete and (buffer or not upload.parts):
+            with memoryview(buffer) as view:
+                await flush(view)
+            buffer.clear()
+
+        if buffer:
+            upload.pending_file_identifier = (
+                await storage_manager.save_variant(
+                    file_identifier=upload.file_identifier,
+                    variant=PENDING_PART_VARIANT,
+                    file=io.BytesIO(buffer),
+                )
+            )
+        elif upload.pending_file_identifier:
+            await storage_manager.delete_file(upload.pending_file_identifier)
+            upload.pending_file_identifier = None
+
+        upload.pending_size = len(buffer)
+        await ResumableUploads.save(upload, lock=lock)
+
+    return upload
+
+
+async def abort_resumable_upload(
+    storage_manager: AbstractStorageManager, upload: ResumableUpload
+) -> None:
+    """Aborts the upload, frees its stored data and deletes its state.
+
+    Args:
+        storage_manager (AbstractStorageManager): The storage manager.
+        upload (ResumableUpload): The upload's state.
+    """
+    await storage_manager.abort_multipart_upload(
+        file_identifier=upload.file_identifier, upload_id=upload.upload_id
+    )
+
+    if upload.pending_file_identifier:
+        await storage_manager.delete_file(upload.pending_file_identifier)
+
+    await ResumableUploads.delete(upload)
@@ -2,9 +2,10 @@ from fastapi import APIRouter, Depends
 from auth_utils import auth_required
 from micro_media.schemas import APIKeyUser
 
-from . import media
+from . import media, metrics
 
 router = APIRouter(
     dependencies=[Depends(auth_required(user_class=APIKeyUser))]
 )
 router.include_router(media.router, prefix="/media")
+router.include_router(metrics.router, prefix="/metrics")
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+from auth_utils import auth_required
+
+from micro_media.schemas import APIKeyUser, APIKeyPermission
+from micro_media.utils.metrics import METRICS
+
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    dependencies=[
+        Depends(
+            auth_required(
+                permissions=[APIKeyPermission(scopes=["metrics:read"])],
+                user_class=APIKeyUser,
+            ),
+        )
+    ],
+    response_model=dict[str, float],
+)
+async def get_metrics():
+    return METRICS.snapshot()
@@ -1,68 +1,143 @@
+import time
+import asyncio
 from uuid import UUID
-from typing import Annotated, Literal, cast
+from typing import Annotated, Iterable, Literal, cast
 
-import sqlalchemy as sa
-from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends
+from sqlalchemy.exc import NoResultFound
+from fastapi import APIRouter, Header, HTTPException, Response
 from starlette.responses import RedirectResponse
 
+from micro_media.schemas import v1 as schemas
+from micro_media.settings import BATCH_LINKS_MAX_MEDIA
 from micro_media.utils import truthy_or_404
-from micro_media.utils.sqlalchemy import get_one
-from micro_media.utils.cache import AsyncRedisCache
-from micro_media.models import get_session, Media, MediaType
+from micro_media.models import MediaType
 from micro_media.storage import STORAGE_CONTEXT as SC
-from micro_media.media import MEDIA_CONTEXT as MC, IMGProxyThumbnailManager
+from micro_media.media import (
+    MEDIA_CONTEXT as MC,
+    MediaProcessingUnavailableError,
+)
+from micro_media.media.config import ImageMediaOutputFormatConfig
 from micro_media.media.manager import ImageMediaManager
+from micro_media.links import (
+    MediaLocator,
+    get_media_locator,
+    get_media_locators,
+    encode_output_format,
+    get_imgproxy_thumbnail_link,
+    get_original_link,
+    get_original_links,
+    get_variant_link,
+    get_variant_links,
+    get_stored_thumbnail_link,
+    get_stored_thumbnail_links,
+)
 
 
 router = APIRouter()
 
-THUMBNAIL_MANAGER = IMGProxyThumbnailManager()
 IMAGE_MEDIA_MANAGER: ImageMediaManager = cast(
     ImageMediaManager, MC.get_manager("image")
 )
 
-CACHE_TTL = 60 * 60  # 1 hour
+# Caches drop responses this long before their links expire
+LINK_EXPIRY_MARGIN = 60
 
 
-@AsyncRedisCache.aredis_cache(
-    key_generator=lambda media, expires_in: f"original_link:{media.id}",
-    cache_deserializer=str,
-    cache_serializer=str,
-    ttl=max(CACHE_TTL - 30, 30),
-)
-async def _get_original_link(media: Media, expires_in: int) -> str:
-    storage_manager = SC.get_manager(storage_id=media.storage_id)
+async def _get_output_format_link(
+    media: MediaLocator, output_format: ImageMediaOutputFormatConfig
+) -> str:
+    file_extension = output_format.file_extension
+
+    if not media.variants or file_extension not in media.variants:
+        # Encoded on the first request unless it was done on upload
+        try:
+            file_identifier = await encode_output_format(
+                media=media, output_format=output_format
+            )
+        except MediaProcessingUnavailableError:
+            return await get_original_link(media=media)
+
+        media = media._replace(
+            variants={
+                **(media.variants or {}),
+                file_extension: file_identifier,
+            }
+        )
+
+    return await get_variant_link(media=media, file_extension=file_extension)
+
+
+def _get_vary_headers() -> dict[str, str]:
+    # Shared caches must not serve one client's format to another
+    if IMAGE_MEDIA_MANAGER.output_formats:
+        return {"vary": "Accept"}
+
+    return {}
+
 
-    file_link = await storage_manager.generate_file_link(
-        file_identifier=media.file_identifier, expires_in=expires_in
+def _get_cache_headers(
+    file_links: Iterable[tuple[MediaLocator, str]], shared: bool = True
+) -> dict[str, str]:
+    # Cacheable for as long as all the response's links stay valid
+    expiries = [
+        SC.get_manager(storage_id=media.storage_id).get_link_expiry(link)
+        for media, link in file_links
+    ]
+    if not expiries or None in expiries:
+        return {"cache-control": "no-cache"}
+
+    max_age = (
+        int(min(cast(list[float], expiries)) - time.time())
+        - LINK_EXPIRY_MARGIN
     )
+    if max_age <= 0:
+        return {"cache-control": "no-cache"}
 
-    return file_link
+    scope = "public" if shared else "private"
+    return {"cache-control": f"{scope}, max-age={max_age}"}
 
 
 @router.get("/original/{media_id}", status_code=302)
 async def get_original_file(
-    media_id: UUID, session: Annotated[AsyncSession, Depends(get_session)]
+    media_id: UUID,
+    accept: Annotated[str | None, Header()] = None,
 ):
-    media = await get_one(
-        session=session, query=sa.select(Media).filter(Media.id == media_id)
-    )
+    # Cached media are linked without a database session
+    media = await get_media_locator(media_id)
+
+    if media.media_type != MediaType.IMAGE:
+        file_link = await get_original_link(media=media)
+
+        return RedirectResponse(
+            url=file_link,
+            status_code=302,
+            headers=_get_cache_headers([(media, file_link)]),
+        )
+
+    if output_format := IMAGE_MEDIA_MANAGER.negotiate_output_format(accept):
+        file_link = await _get_output_format_link(
+            media=media, output_format=output_format
+        )
+    else:
+        file_link = await get_original_link(media=media)
 
     return RedirectResponse(
-        url=await _get_original_link(media=media, expires_in=3600),
+        url=file_link,
         status_code=302,
-        headers={"max-age": f"{CACHE_TTL}"},
+        headers={
+            **_get_cache_headers([(media, file_link)]),
+            **_get_vary_headers(),
+        },
     )
 
 
 @router.get("/thumbnail/{media_id}", status_code=302)
 async def get_thumbnail(
     media_id: UUID,
-    session: Annotated[AsyncSession, Depends(get_session)],
     size: Literal[
         "default", *IMAGE_MEDIA_MANAGER.get_thumbnail_sizes()
     ] = "default",
+    accept: Annotated[str | None, Header()] = None,
 ):
     size_conf = truthy_or_404(
         IMAGE_MEDIA_MANAGER.get_thumbnail_size_conf(
@@ -71,20 +146,131 @@ async def get_thumbnail(
         message="Invalid thumbnail size.",
     )
 
-    media = await get_one(
-        session=session,
-        query=sa.select(Media).filter(
-            Media.media_type == MediaType.IMAGE, Media.id == media_id
-        ),
+    media = await get_media_locator(media_id)
+    if media.media_type != MediaType.IMAGE:
+        raise NoResultFound("No row was found when one was required")
+
+    size_name = IMAGE_MEDIA_MANAGER.resolve_thumbnail_size(
+        None if size == "default" else size
     )
 
-    thumbnail_link = THUMBNAIL_MANAGER.get_thumbnail_link(
-        original_file_link=await _get_original_link(
-            media=media, expires_in=3600
-        ),
-        thumbnail_size=size_conf,
+    output_format = IMAGE_MEDIA_MANAGER.negotiate_output_format(accept)
+    variant_name = IMAGE_MEDIA_MANAGER.get_variant_name(
+        size_name, output_format
     )
 
+    if media.thumbnails and variant_name in media.thumbnails:
+        # Rendered on upload, serve it straight from the storage
+        thumbnail_link = file_link = await get_stored_thumbnail_link(
+            media=media, size_name=variant_name
+        )
+    else:
+        # imgproxy fetches the original through the embedded link
+        file_link = await get_original_link(media=media)
+        thumbnail_link = get_imgproxy_thumbnail_link(
+            media=media,
+            original_file_link=file_link,
+            size_name=size_name,
+            thumbnail_size=size_conf,
+            file_extension=output_format and output_format.file_extension,
+        )
+
     return RedirectResponse(
-        url=thumbnail_link, status_code=302, headers={"max-age": "3600"}
+        url=thumbnail_link,
+        status_code=302,
+        headers={
+            **_get_cache_headers([(media, file_link)]),
+            **_get_vary_headers(),
+        },
+    )
+
+
+@router.post("/links", response_model=dict[UUID, schemas.MediaLinks])
+async def get_links(
+    data: schemas.MediaLinksRequest,
+    response: Response,
+    accept: Annotated[str | None, Header()] = None,
+):
+    """
+    Resolves many media's final original and thumbnail links at once,
+    so pages can embed them without a redirect each. Missing media are
+    left out.
+    """
+    media_ids = list(dict.fromkeys(data.ids))
+    if len(media_ids) > BATCH_LINKS_MAX_MEDIA:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BATCH_LINKS_MAX_MEDIA} media are allowed.",
+        )
+
+    size_name = IMAGE_MEDIA_MANAGER.resolve_thumbnail_size(
+        None if data.size == "default" else data.size
+    )
+    size_conf = IMAGE_MEDIA_MANAGER.get_thumbnail_size_conf(
+        size_name=size_name
+    )
+
+    output_format = IMAGE_MEDIA_MANAGER.negotiate_output_format(accept)
+    file_extension = output_format and output_format.file_extension
+    thumbnail_name = IMAGE_MEDIA_MANAGER.get_variant_name(
+        size_name, output_format
+    )
+
+    located = [media for media in await get_media_locators(media_ids) if media]
+    # Unlike single requests, variants aren't encoded on demand here
+    with_variant = [
+        media
+        for media in located
+        if file_extension and media.variants
+        if file_extension in media.variants
+    ]
+    with_thumbnail = [
+        media
+        for media in located
+        if media.media_type == MediaType.IMAGE and media.thumbnails
+        if thumbnail_name in media.thumbnails
+    ]
+
+    original_links, variant_links, thumbnail_links = await asyncio.gather(
+        get_original_links(located),
+        get_variant_links([(media, file_extension) for media in with_variant]),
+        get_stored_thumbnail_links(
+            [(media, thumbnail_name) for media in with_thumbnail]
+        ),
+    )
+    originals = dict(zip((media.id for media in located), original_links))
+    variants = dict(zip((media.id for media in with_variant), variant_links))
+    thumbnails = dict(
+        zip((media.id for media in with_thumbnail), thumbnail_links)
+    )
+
+    links = {}
+    file_links = []
+    for media in located:
+        original_link = variants.get(media.id, originals[media.id])
+        file_links.append((media, original_link))
+
+        if thumbnail_link := thumbnails.get(media.id):
+            file_links.append((media, thumbnail_link))
+        elif size_conf and media.media_type == MediaType.IMAGE:
+            thumbnail_link = get_imgproxy_thumbnail_link(
+                media=media,
+                original_file_link=originals[media.id],
+                size_name=size_name,
+                thumbnail_size=size_conf,
+                file_extension=file_extension,
+            )
+            file_links.append((media, originals[media.id]))
+
+        links[media.id] = schemas.MediaLinks(
+            original=original_link, thumbnail=thumbnail_link
+        )
+
+    # Shared caches would serve one request body's links for another's
+    response.headers.update(
+        {
+            **_get_cache_headers(file_links, shared=False),
+            **_get_vary_headers(),
+        }
     )
+    return links
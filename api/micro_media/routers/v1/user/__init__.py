@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends
 from auth_utils import auth_required
 from micro_media.schemas import JWTUser
 
-from . import media
+from . import media, resumable
 
 router = APIRouter(dependencies=[Depends(auth_required(user_class=JWTUser))])
 router.include_router(media.router, prefix="/media")
+router.include_router(resumable.router, prefix="/media/resumable")
@@ -1,56 +1,286 @@
+import json
+import asyncio
 from uuid import UUID
 from typing import Annotated
 
 import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from auth_utils import get_user
-from fastapi import APIRouter, Depends
-from micro_media.models import get_session, Media
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile
+from micro_media.models import get_session, Media, MediaStatus
 
 from micro_media.schemas import JWTUser, v1 as schemas
-from micro_media.media import MEDIA_CONTEXT as MC
+from micro_media.media import MEDIA_CONTEXT as MC, DirectUploadNotAllowedError
 from micro_media.storage import STORAGE_CONTEXT as SC
+from micro_media.settings import (
+    DIRECT_UPLOAD_EXPIRES_IN,
+    BATCH_UPLOAD_MAX_FILES,
+    BATCH_UPLOAD_CONCURRENCY,
+)
+from micro_media.processing import MediaProcessingQueue
+from micro_media.direct_uploads import DirectUploads
+from micro_media.links import invalidate_media_links
+from micro_media.uploads import (
+    StoredMedia,
+    save_upload,
+    check_stored_media,
+    discard_stored_media,
+    release_media,
+    delete_media_files,
+)
+from micro_media.exception_handlers.media import get_media_exception_handler
+from micro_media.media.admission import UPLOAD_ADMISSION
+from micro_media.utils import truthy_or_404
+from micro_media.utils.routing import admission_route
 from micro_media.utils.sqlalchemy import get_one
 
 
 router = APIRouter()
+# Uploads are admitted before their bodies are read
+upload_router = APIRouter(
+    route_class=admission_route(UPLOAD_ADMISSION, max_files=1)
+)
+batch_upload_router = APIRouter(
+    route_class=admission_route(
+        UPLOAD_ADMISSION, max_files=BATCH_UPLOAD_MAX_FILES
+    )
+)
 
 
-@router.post("/upload", response_model=schemas.MediaRead)
+@upload_router.post("/upload", response_model=schemas.MediaRead)
 async def save_media(
     user: Annotated[JWTUser, Depends(get_user)],
     data: Annotated[schemas.MediaCreate, Depends(schemas.MediaCreate.as_form)],
     session: Annotated[AsyncSession, Depends(get_session)],
 ):
     storage_manager = SC.default_manager
-    media_manager = MC.get_manager(data.media_type.value)
 
-    file_data = await data.file.read()
-    await data.file.close()
-    filename, file = await media_manager.avalidate_media(
-        filename=data.file.filename or "",
-        data=file_data,
+    stored_media = await save_upload(
+        session=session,
+        storage_manager=storage_manager,
+        media_manager=MC.get_manager(data.media_type.value),
+        media_type=data.media_type,
+        owner_id=user.identity,
+        upload=data.file,
     )
 
-    file_identifier = await storage_manager.save_media(
+    media = Media(
+        **data.model_dump(exclude={"file"}),
+        file_identifier=stored_media.file_identifier,
+        content_hash=stored_media.content_hash,
+        thumbnails=stored_media.thumbnails,
+        variants=stored_media.variants,
+        status=stored_media.status.value,
+        storage_id=storage_manager.storage_id,
+        owner_id=user.identity,
+        **stored_media.get_info_columns(),
+    )
+
+    session.add(media)
+    await session.commit()
+
+    if stored_media.status == MediaStatus.PROCESSING:
+        await MediaProcessingQueue.enqueue(
+            media_id=media.id, filename=data.file.filename or ""
+        )
+
+    return media
+
+
+@batch_upload_router.post(
+    "/upload/batch", response_model=list[schemas.MediaBatchItem]
+)
+async def save_media_batch(
+    request: Request,
+    user: Annotated[JWTUser, Depends(get_user)],
+    data: Annotated[
+        schemas.MediaBatchCreate, Depends(schemas.MediaBatchCreate.as_form)
+    ],
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    storage_manager = SC.default_manager
+    media_manager = MC.get_manager(data.media_type.value)
+    slots = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+    session_lock = asyncio.Lock()
+    stored: list[StoredMedia] = []
+
+    async def process(upload: UploadFile) -> Media | dict:
+        async with slots:
+            try:
+                stored_media = await save_upload(
+                    session=session,
+                    storage_manager=storage_manager,
+                    media_manager=media_manager,
+                    media_type=data.media_type,
+                    owner_id=user.identity,
+                    upload=upload,
+                    session_lock=session_lock,
+                )
+            except Exception as exc:
+                # Report the file's error as its own upload would have
+                handler = get_media_exception_handler(exc)
+                response = await handler(request, exc)
+                return json.loads(response.body)
+
+        stored.append(stored_media)
+        return Media(
+            media_type=data.media_type,
+            file_identifier=stored_media.file_identifier,
+            content_hash=stored_media.content_hash,
+            thumbnails=stored_media.thumbnails,
+            variants=stored_media.variants,
+            status=stored_media.status.value,
+            storage_id=storage_manager.storage_id,
+            owner_id=user.identity,
+            **stored_media.get_info_columns(),
+        )
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(process(upload)) for upload in data.files]
+
+        results = [task.result() for task in tasks]
+
+        # All of the batch's media are inserted in a single transaction
+        session.add_all(
+            [result for result in results if isinstance(result, Media)]
+        )
+        await session.commit()
+    except BaseException:
+        # Nothing references the batch's saved files
+        await discard_stored_media(
+            storage_manager=storage_manager, stored_media=stored
+        )
+        raise
+
+    for upload, result in zip(data.files, results):
+        if (
+            isinstance(result, Media)
+            and result.status == MediaStatus.PROCESSING.value
+        ):
+            await MediaProcessingQueue.enqueue(
+                media_id=result.id, filename=upload.filename or ""
+            )
+
+    return [
+        schemas.MediaBatchItem(
+            filename=upload.filename or "",
+            media=(
+                schemas.MediaRead.model_validate(result, from_attributes=True)
+                if isinstance(result, Media)
+                else None
+            ),
+            error=None if isinstance(result, Media) else result,
+        )
+        for upload, result in zip(data.files, results)
+    ]
+
+
+@router.post("/upload/initiate", response_model=schemas.MediaUploadLink)
+async def initiate_media_upload(
+    user: Annotated[JWTUser, Depends(get_user)],
+    data: schemas.MediaUploadInitiate,
+):
+    storage_manager = SC.default_manager
+    media_manager = MC.get_manager(data.media_type.value)
+
+    if not media_manager.supports_direct_upload:
+        raise DirectUploadNotAllowedError(
+            "Media type requires server-side processing.",
+            media_type=data.media_type.value,
+        )
+
+    media_manager.check_file_extension(data.filename)
+
+    upload_link = await storage_manager.generate_upload_link(
         owner_id=user.identity,
         media_type=data.media_type,
-        filename=filename,
-        file=file,
-        content_type=data.file.content_type,
+        filename=data.filename,
+        max_file_size=media_manager.config.max_file_size,
+        content_type=data.content_type,
+        expires_in=DIRECT_UPLOAD_EXPIRES_IN,
+    )
+    await DirectUploads.issue(
+        file_identifier=upload_link.file_identifier,
+        owner_id=user.identity,
+        expires_in=DIRECT_UPLOAD_EXPIRES_IN,
+    )
+
+    return schemas.MediaUploadLink(
+        file_identifier=upload_link.file_identifier,
+        url=upload_link.url,
+        fields=upload_link.fields,
+        expires_in=DIRECT_UPLOAD_EXPIRES_IN,
     )
 
-    file.close()
+
+@router.post("/upload/finalize", response_model=schemas.MediaRead)
+async def finalize_media_upload(
+    user: Annotated[JWTUser, Depends(get_user)],
+    data: schemas.MediaUploadFinalize,
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    storage_manager = SC.default_manager
+    media_manager = MC.get_manager(data.media_type.value)
+
+    if not media_manager.supports_direct_upload:
+        raise DirectUploadNotAllowedError(
+            "Media type requires server-side processing.",
+            media_type=data.media_type.value,
+        )
+
+    # Only keys issued to the user by `initiate` can be finalized
+    truthy_or_404(
+        storage_manager.check_file_identifier(
+            file_identifier=data.file_identifier,
+            media_type=data.media_type,
+            owner_id=user.identity,
+        )
+        and await DirectUploads.is_issued_to(
+            file_identifier=data.file_identifier, owner_id=user.identity
+        ),
+        message="Uploaded file not found.",
+    )
+    file_info = truthy_or_404(
+        await storage_manager.get_file_info(data.file_identifier),
+        message="Uploaded file not found.",
+    )
+
+    if await session.scalar(
+        sa.select(
+            sa.exists().where(
+                Media.storage_id == storage_manager.storage_id,
+                Media.file_identifier == data.file_identifier,
+            )
+        )
+    ):
+        raise HTTPException(status_code=409, detail="Already finalized.")
+
+    await check_stored_media(
+        storage_manager=storage_manager,
+        media_manager=media_manager,
+        file_identifier=data.file_identifier,
+        file_size=file_info.size,
+    )
 
     media = Media(
-        **data.model_dump(exclude={"file"}),
-        file_identifier=file_identifier,
+        **data.model_dump(exclude={"file_identifier"}),
+        file_identifier=data.file_identifier,
+        file_size=file_info.size,
+        content_type=file_info.content_type,
         storage_id=storage_manager.storage_id,
         owner_id=user.identity,
     )
 
     session.add(media)
-    await session.commit()
+    try:
+        await session.commit()
+    except IntegrityError as exc:
+        # Finalized concurrently, after the check above
+        raise HTTPException(
+            status_code=409, detail="Already finalized."
+        ) from exc
 
     return media
 
@@ -61,7 +291,6 @@ async def delete_media(
     user: Annotated[JWTUser, Depends(get_user)],
     session: Annotated[AsyncSession, Depends(get_session)],
 ):
-    storage_manager = SC.default_manager
     media = await get_one(
         session=session,
         query=sa.select(Media).where(
@@ -71,7 +300,17 @@ async def delete_media(
         ),
     )
 
-    await storage_manager.delete_file(media.file_identifier)
+    unreferenced = await release_media(session=session, media=media)
+    # Public links are served without checking the database
+    await invalidate_media_links(media)
 
-    await session.delete(media)
-    await session.commit()
+    # Deduplicated files are deleted along with their last reference
+    if unreferenced:
+        await delete_media_files(
+            storage_manager=SC.get_manager(storage_id=media.storage_id),
+            media=media,
+        )
+
+
+router.include_router(upload_router)
+router.include_router(batch_upload_router)
@@ -0,0 +1,216 @@
+import contextlib
+from typing import AsyncIterator, Annotated
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from redis.asyncio.lock import Lock
+from redis.exceptions import LockError
+from auth_utils import get_user
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from starlette.responses import Response
+
+from micro_media.models import get_session, Media, MediaStatus
+from micro_media.schemas import JWTUser, v1 as schemas
+from micro_media.media import MEDIA_CONTEXT as MC, DirectUploadNotAllowedError
+from micro_media.storage import STORAGE_CONTEXT as SC
+from micro_media.processing import MediaProcessingQueue
+from micro_media.uploads import check_stored_media, is_processed_in_queue
+from micro_media.resumable import (
+    ResumableUpload,
+    ResumableUploads,
+    UploadLengthExceededError,
+    create_resumable_upload,
+    append_resumable_upload,
+    abort_resumable_upload,
+)
+from micro_media.utils import truthy_or_404
+
+
+router = APIRouter()
+
+CHUNK_CONTENT_TYPE = "application/offset+octet-stream"
+
+
+async def _get_upload(upload_id: str, user: JWTUser) -> ResumableUpload:
+    upload = await ResumableUploads.get(upload_id)
+
+    return truthy_or_404(
+        upload if upload and upload.owner_id == user.identity else None,
+        message="Upload not found.",
+    )
+
+
+@contextlib.asynccontextmanager
+async def _hold_upload(upload_id: str) -> AsyncIterator[Lock]:
+    try:
+        async with ResumableUploads.hold(upload_id) as lock:
+            yield lock
+    except LockError as exc:
+        raise HTTPException(
+            status_code=423, detail="Upload is being appended to."
+        ) from exc
+
+
+def _get_upload_headers(upload: ResumableUpload) -> dict[str, str]:
+    return {
+        "Upload-Offset": str(upload.offset),
+        "Upload-Length": str(upload.length),
+        "Cache-Control": "no-store",
+    }
+
+
+@router.post("", status_code=201, response_model=schemas.MediaResumableRead)
+async def create_upload(
+    user: Annotated[JWTUser, Depends(get_user)],
+    data: schemas.MediaResumableCreate,
+    response: Response,
+):
+    """
+    Starts a resumable upload. Media types which need server-side
+    processing (e.g. resized images) are only accepted when
+    `MEDIA_PROCESSING_MODE` is "queue", their completed uploads are
+    processed by the queue's workers.
+    """
+    storage_manager = SC.default_manager
+    media_manager = MC.get_manager(data.media_type.value)
+
+    if not (
+        media_manager.supports_direct_upload
+        or is_processed_in_queue(media_manager)
+    ):
+        raise DirectUploadNotAllowedError(
+            "Media type requires server-side processing, which resumable "
+            "uploads only get in the queue processing mode.",
+            media_type=data.media_type.value,
+        )
+
+    media_manager.check_file_extension(data.filename)
+    media_manager.check_file_size(data.length)
+
+    upload = await create_resumable_upload(
+        storage_manager=storage_manager,
+        owner_id=user.identity,
+        media_type=data.media_type.value,
+        filename=data.filename,
+        length=data.length,
+        content_type=data.content_type,
+        title=data.title,
+        description=data.description,
+    )
+
+    response.headers["Location"] = f"/v1/user/media/resumable/{upload.id}"
+    response.headers.update(_get_upload_headers(upload))
+
+    return upload
+
+
+@router.head("/{upload_id}", status_code=200)
+async def get_upload_offset(
+    upload_id: str, user: Annotated[JWTUser, Depends(get_user)]
+):
+    upload = await _get_upload(upload_id=upload_id, user=user)
+
+    return Response(status_code=200, headers=_get_upload_headers(upload))
+
+
+@router.patch("/{upload_id}", response_model=schemas.MediaRead)
+async def append_upload(
+    upload_id: str,
+    request: Request,
+    user: Annotated[JWTUser, Depends(get_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    response: Response,
+    upload_offset: Annotated[int, Header(alias="Upload-Offset")],
+    content_type: Annotated[str, Header(alias="Content-Type")],
+):
+    """
+    Appends the request's body to the upload at the given offset. Responds
+    with 204 and the new offset, or with the created media once the
+    whole file is received. Media which need processing are created
+    with the "processing" status and processed by the queue's workers.
+    """
+    if content_type != CHUNK_CONTENT_TYPE:
+        raise HTTPException(
+            status_code=415, detail=f"Expected {CHUNK_CONTENT_TYPE}."
+        )
+
+    async with _hold_upload(upload_id) as lock:
+        upload = await _get_upload(upload_id=upload_id, user=user)
+
+        if upload_offset != upload.offset:
+            raise HTTPException(
+                status_code=409,
+                detail="Offset does not match.",
+                headers=_get_upload_headers(upload),
+            )
+
+        storage_manager = SC.get_manager(storage_id=upload.storage_id)
+
+        try:
+            upload = await append_resumable_upload(
+                storage_manager=storage_manager,
+                upload=upload,
+                stream=request.stream(),
+                lock=lock,
+            )
+        except UploadLengthExceededError as exc:
+            raise HTTPException(status_code=413, detail=str(exc)) from exc
+
+        if not upload.is_complete:
+            return Response(
+                status_code=204, headers=_get_upload_headers(upload)
+            )
+
+        await storage_manager.complete_multipart_upload(
+            file_identifier=upload.file_identifier,
+            upload_id=upload.upload_id,
+            parts=upload.parts,
+        )
+        await ResumableUploads.delete(upload)
+
+    media_manager = MC.get_manager(upload.media_type)
+    await check_stored_media(
+        storage_manager=storage_manager,
+        media_manager=media_manager,
+        file_identifier=upload.file_identifier,
+        file_size=upload.length,
+    )
+
+    processed = is_processed_in_queue(media_manager)
+    media = Media(
+        title=upload.title,
+        description=upload.description,
+        media_type=upload.media_type,
+        file_identifier=upload.file_identifier,
+        file_size=upload.length,
+        content_type=upload.content_type,
+        storage_id=upload.storage_id,
+        owner_id=upload.owner_id,
+        status=(
+            MediaStatus.PROCESSING.value
+            if processed
+            else MediaStatus.READY.value
+        ),
+    )
+
+    session.add(media)
+    await session.commit()
+
+    if processed:
+        await MediaProcessingQueue.enqueue(
+            media_id=media.id, filename=upload.filename
+        )
+
+    response.headers.update(_get_upload_headers(upload))
+    return media
+
+
+@router.delete("/{upload_id}", status_code=204)
+async def abort_upload(
+    upload_id: str, user: Annotated[JWTUser, Depends(get_user)]
+):
+    async with _hold_upload(upload_id):
+        upload = await _get_upload(upload_id=upload_id, user=user)
+        await abort_resumable_upload(
+            storage_manager=SC.get_manager(storage_id=upload.storage_id),
+            upload=upload,
+        )
@@ -1,3 +1,27 @@
-from .media import MediaCreate, MediaRead
+from .media import (
+    MediaCreate,
+    MediaBatchCreate,
+    MediaBatchItem,
+    MediaRead,
+    MediaLinksRequest,
+    MediaLinks,
+    MediaUploadInitiate,
+    MediaUploadLink,
+    MediaUploadFinalize,
+    MediaResumableCreate,
+    MediaResumableRead,
+)
 
-__all__ = ["MediaCreate", "MediaRead"]
+__all__ = [
+    "MediaCreate",
+    "MediaBatchCreate",
+    "MediaBatchItem",
+    "MediaRead",
+    "MediaLinksRequest",
+    "MediaLinks",
+    "MediaUploadInitiate",
+    "MediaUploadLink",
+    "MediaUploadFinalize",
+    "MediaResumableCreate",
+    "MediaResumableRead",
+]
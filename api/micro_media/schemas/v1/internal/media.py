@@ -2,7 +2,7 @@ from uuid import UUID
 from pydantic import BaseModel
 from micro_media.utils import APIModel
 
-from ..media import MediaType
+from ..media import MediaType, MediaStatus
 
 
 class InternalMediaRead(APIModel):
@@ -12,6 +12,7 @@ class InternalMediaRead(APIModel):
     media_type: MediaType
     owner_id: UUID
     ack: bool
+    status: MediaStatus
 
 
 class BulkMediaAckFilters(BaseModel):
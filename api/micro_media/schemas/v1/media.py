@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Annotated, Literal
+from typing import Annotated, Any, Literal
 
 from uuid import UUID
 from pydantic import Field, computed_field, create_model
@@ -16,6 +16,12 @@ class MediaType(str, Enum):
     DOCUMENT = "document"
 
 
+class MediaStatus(str, Enum):
+    READY = "ready"
+    PROCESSING = "processing"
+    FAILED = "failed"
+
+
 class MediaBase(APIModel):
     title: str | None = None
     description: str | None = None
@@ -43,6 +49,50 @@ class MediaCreate(MediaBase):
         )
 
 
+class MediaBatchCreate(APIModel):
+    media_type: MediaType
+    files: list[UploadFile]
+
+    @classmethod
+    def as_form(
+        cls,
+        files: Annotated[list[UploadFile], File()],
+        media_type: Annotated[
+            MediaType, Form(alias="mediaType", validation_alias="mediaType")
+        ],
+    ) -> "MediaBatchCreate":
+        return cls(media_type=media_type, files=files)
+
+
+class MediaUploadInitiate(MediaBase):
+    filename: str
+    content_type: str | None = None
+
+
+class MediaUploadLink(APIModel):
+    file_identifier: str
+    url: str
+    fields: dict[str, str]
+    expires_in: int
+
+
+class MediaUploadFinalize(MediaBase):
+    file_identifier: str
+
+
+class MediaResumableCreate(MediaBase):
+    filename: str
+    content_type: str | None = None
+    length: int = Field(ge=0)
+
+
+class MediaResumableRead(APIModel):
+    id: str
+    offset: int
+    length: int
+    expires_at: float
+
+
 THUMBNAIL_SIZES = MC.get_manager("image").get_thumbnail_sizes()
 
 ThumbnailSizesModel = create_model(
@@ -53,6 +103,12 @@ ThumbnailSizesModel = create_model(
 
 class MediaRead(MediaBase):
     id: UUID
+    status: MediaStatus = MediaStatus.READY
+    file_size: int | None = None
+    content_type: str | None = None
+    width: int | None = None
+    height: int | None = None
+    placeholder: str | None = None
 
     @computed_field
     def original_path(self) -> str:
@@ -69,3 +125,21 @@ class MediaRead(MediaBase):
                 for size in THUMBNAIL_SIZES
             }
         )
+
+
+class MediaLinksRequest(APIModel):
+    ids: list[UUID] = Field(min_length=1)
+    size: Literal["default", *THUMBNAIL_SIZES] = "default"
+
+
+class MediaLinks(APIModel):
+    original: str
+    # Only images have thumbnails
+    thumbnail: str | None = None
+
+
+class MediaBatchItem(APIModel):
+    filename: str
+    media: MediaRead | None = None
+    # The same content as the single upload's error response
+    error: dict[str, Any] | None = None
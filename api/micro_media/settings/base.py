@@ -41,3 +41,84 @@ IMGPROXY_RESIZE_ENLARGE = cast(
 
 REDIS_URL = cast(str, config("REDIS_URL"))
 REDIS_PREFIX = cast(str, config("REDIS_PREFIX", default="micro_media:"))
+
+# Uploads are read chunk by chunk and spooled to disk above the max size.
+UPLOAD_CHUNK_SIZE = cast(
+    int, config("UPLOAD_CHUNK_SIZE", cast=int, default=64 * 1024)
+)
+UPLOAD_SPOOL_MAX_SIZE = cast(
+    int, config("UPLOAD_SPOOL_MAX_SIZE", cast=int, default=1024 * 1024)
+)
+
+# Validity duration of direct (presigned) upload policies in seconds
+DIRECT_UPLOAD_EXPIRES_IN = cast(
+    int, config("DIRECT_UPLOAD_EXPIRES_IN", cast=int, default=15 * 60)
+)
+
+# Resumable uploads expire after this many seconds of inactivity and
+# expired uploads are aborted every cleanup interval.
+RESUMABLE_UPLOAD_EXPIRES_IN = cast(
+    int, config("RESUMABLE_UPLOAD_EXPIRES_IN", cast=int, default=24 * 3600)
+)
+RESUMABLE_UPLOAD_CLEANUP_INTERVAL = cast(
+    int, config("RESUMABLE_UPLOAD_CLEANUP_INTERVAL", cast=int, default=300)
+)
+
+# Upload requests handled at the same time and waiting for their turn,
+# checked before reading the request's body.
+UPLOAD_MAX_CONCURRENCY = cast(
+    int, config("UPLOAD_MAX_CONCURRENCY", cast=int, default=32)
+)
+UPLOAD_QUEUE_SIZE = cast(
+    int, config("UPLOAD_QUEUE_SIZE", cast=int, default=64)
+)
+UPLOAD_QUEUE_TIMEOUT = cast(
+    float, config("UPLOAD_QUEUE_TIMEOUT", cast=float, default=10)
+)
+
+# Max files per batch upload request and how many are processed at once
+BATCH_UPLOAD_MAX_FILES = cast(
+    int, config("BATCH_UPLOAD_MAX_FILES", cast=int, default=20)
+)
+BATCH_UPLOAD_CONCURRENCY = cast(
+    int, config("BATCH_UPLOAD_CONCURRENCY", cast=int, default=4)
+)
+# Max media per batch link resolution request
+BATCH_LINKS_MAX_MEDIA = cast(
+    int, config("BATCH_LINKS_MAX_MEDIA", cast=int, default=100)
+)
+
+# Image processing executor: "thread" or "process"
+IMAGE_PROCESSING_EXECUTOR = cast(
+    str, config("IMAGE_PROCESSING_EXECUTOR", default="thread")
+)
+IMAGE_PROCESSING_WORKERS = cast(
+    int, config("IMAGE_PROCESSING_WORKERS", cast=int, default=2)
+)
+IMAGE_PROCESSING_QUEUE_SIZE = cast(
+    int, config("IMAGE_PROCESSING_QUEUE_SIZE", cast=int, default=16)
+)
+IMAGE_PROCESSING_TIMEOUT = cast(
+    float, config("IMAGE_PROCESSING_TIMEOUT", cast=float, default=30)
+)
+# Upload processed images' parts to the storage while they're encoded,
+# only with the "thread" executor.
+IMAGE_PROCESSING_STREAMING = cast(
+    bool, config("IMAGE_PROCESSING_STREAMING", cast=bool, default=False)
+)
+
+# Media processing mode: "inline" processes uploads within the request,
+# "queue" stores the raw upload and leaves processing to the workers.
+MEDIA_PROCESSING_MODE = cast(
+    str, config("MEDIA_PROCESSING_MODE", default="inline")
+)
+MEDIA_PROCESSING_CONCURRENCY = cast(
+    int, config("MEDIA_PROCESSING_CONCURRENCY", cast=int, default=2)
+)
+MEDIA_PROCESSING_MAX_ATTEMPTS = cast(
+    int, config("MEDIA_PROCESSING_MAX_ATTEMPTS", cast=int, default=3)
+)
+# Seconds after which jobs of a crashed worker are claimed by others
+MEDIA_PROCESSING_CLAIM_IDLE_TIME = cast(
+    int, config("MEDIA_PROCESSING_CLAIM_IDLE_TIME", cast=int, default=300)
+)
@@ -1,7 +1,13 @@
 from .config import Storage, StorageProvider
 from .context import StorageContext, STORAGE_CONTEXT
 from .exceptions import StorageNotFoundError
-from .manager import S3StorageManager
+from .manager import (
+    S3StorageManager,
+    FileInfo,
+    UploadLink,
+    MultipartUpload,
+)
+from .presigner import S3Presigner
 
 __all__ = [
     "Storage",
@@ -10,4 +16,8 @@ __all__ = [
     "STORAGE_CONTEXT",
     "StorageNotFoundError",
     "S3StorageManager",
+    "FileInfo",
+    "UploadLink",
+    "MultipartUpload",
+    "S3Presigner",
 ]
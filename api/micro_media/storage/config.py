@@ -1,22 +1,39 @@
 from uuid import UUID
 from typing import Literal
 
-from pydantic import BaseModel, model_validator
+from pydantic import BaseModel, Field, model_validator
 
 StorageProvider = Literal["s3"]
 
+S3_MIN_PART_SIZE = 5 * 1024 * 1024  # 5 MB
+
 
 class S3Config(BaseModel):
     endpoint_url: str | None = None
+    # Signs links for this region, falls back to the AWS environment's
+    region_name: str | None = None
     access_key_id: str
     secret_access_key: str
     bucket_name: str
 
+    # Files larger than the threshold are uploaded using multipart uploads
+    multipart_threshold: int = 8 * 1024 * 1024
+    multipart_part_size: int = Field(
+        default=8 * 1024 * 1024, ge=S3_MIN_PART_SIZE
+    )
+    multipart_max_concurrency: int = Field(default=4, ge=1)
+
+    # Links signed within a window of this many seconds are identical,
+    # so CDNs and browsers can cache them. 0 signs every link afresh.
+    link_signing_window: int = Field(default=0, ge=0, le=24 * 60 * 60)
+
 
 class Storage(BaseModel):
     id: UUID
     provider: StorageProvider = "s3"
     random_filenames: bool = True
+    # Reuse stored objects with identical content instead of uploading
+    deduplicate: bool = False
 
     s3: S3Config
 
@@ -1,19 +1,45 @@
 from abc import ABCMeta, abstractmethod
+import os
 import asyncio
+import itertools
 from contextlib import asynccontextmanager
 from functools import cached_property
-from io import BytesIO
-from typing import TYPE_CHECKING, AsyncGenerator
+from typing import (
+    TYPE_CHECKING,
+    AsyncGenerator,
+    BinaryIO,
+    Iterable,
+    NamedTuple,
+)
 from uuid import UUID, uuid4
 
 import aioboto3
+from botocore.exceptions import ClientError
 
+from micro_media.utils.buffers import MemoryViewReader
 from .config import S3Config, Storage
+from .presigner import S3Presigner, get_link_expiry
 
 if TYPE_CHECKING:
     from types_aiobotocore_s3.client import S3Client
 
 
+class FileInfo(NamedTuple):
+    size: int
+    content_type: str | None
+
+
+class UploadLink(NamedTuple):
+    file_identifier: str
+    url: str
+    fields: dict[str, str]
+
+
+class MultipartUpload(NamedTuple):
+    file_identifier: str
+    upload_id: str
+
+
 class AbstractStorageManager(metaclass=ABCMeta):
     storage: Storage
 
@@ -30,7 +56,7 @@ class AbstractStorageManager(metaclass=ABCMeta):
         media_type: str,
         owner_id: UUID,
         filename: str,
-        file: BytesIO,
+        file: BinaryIO,
         **kwargs,
     ) -> str:
         """Saves given file to the storage.
@@ -44,12 +70,127 @@ class AbstractStorageManager(metaclass=ABCMeta):
 
             filename (str): The file's filename.
 
-            file (BytesIO): File content.
+            file (BinaryIO): File content.
 
         Returns:
             str: File's identifier.
         """
 
+    @abstractmethod
+    async def save_variant(
+        self,
+        file_identifier: str,
+        variant: str,
+        file: BinaryIO,
+        file_extension: str | None = None,
+        **kwargs,
+    ) -> str:
+        """Saves a variant (e.g. a thumbnail) of a stored file next to it.
+
+        Args:
+            file_identifier (str): The original file's identifier.
+
+            variant (str): The variant's name.
+
+            file (BinaryIO): The variant's content.
+
+            file_extension (str | None, optional): The variant's file
+                extension when it's in another format than the original.
+
+        Returns:
+            str: The variant's file identifier.
+        """
+
+    @abstractmethod
+    async def read_file(
+        self, file_identifier: str, length: int | None = None, **kwargs
+    ) -> bytes:
+        """Reads the given file's content from storage.
+
+        Args:
+            file_identifier (str): The file's identifier.
+            length (int | None, optional): Only reads the first `length`
+                bytes when given. Defaults to None.
+
+        Returns:
+            bytes: The file's content.
+        """
+
+    @property
+    @abstractmethod
+    def part_size(self) -> int:
+        """The size of every multipart upload's part except the last."""
+
+    @abstractmethod
+    async def create_multipart_upload(
+        self,
+        media_type: str,
+        owner_id: UUID,
+        filename: str,
+        content_type: str | None = None,
+        **kwargs,
+    ) -> MultipartUpload:
+        """Starts a multipart upload which gets uploaded part by part.
+
+        Args:
+            media_type (str): The media's type.
+            owner_id (UUID): The file owner's id.
+            filename (str): The file's filename.
+            content_type (str | None, optional): The file's content type.
+
+        Returns:
+            MultipartUpload: The file's identifier and the upload's id.
+        """
+
+    @abstractmethod
+    async def upload_part(
+        self,
+        file_identifier: str,
+        upload_id: str,
+        part_number: int,
+        body: bytes | memoryview,
+        **kwargs,
+    ) -> str:
+        """Uploads a part of a multipart upload.
+
+        Args:
+            file_identifier (str): The file's identifier.
+            upload_id (str): The multipart upload's id.
+            part_number (int): The part's number, starting from 1.
+            body (bytes | memoryview): The part's content, which is read
+                without copying it.
+
+        Returns:
+            str: The part's tag which is needed for completing the upload.
+        """
+
+    @abstractmethod
+    async def complete_multipart_upload(
+        self,
+        file_identifier: str,
+        upload_id: str,
+        parts: list[tuple[int, str]],
+        **kwargs,
+    ) -> None:
+        """Assembles the uploaded parts into the file.
+
+        Args:
+            file_identifier (str): The file's identifier.
+            upload_id (str): The multipart upload's id.
+            parts (list[tuple[int, str]]): Uploaded parts' numbers and tags.
+        """
+
+    @abstractmethod
+    async def abort_multipart_upload(
+        self, file_identifier: str, upload_id: str, **kwargs
+    ) -> None:
+        """Aborts the multipart upload and frees its uploaded parts.
+
+        Args:
+            file_identifier (str): The file's identifier.
+            upload_id (str): The multipart upload's id.
+        """
+
     @abstractmethod
     async def delete_file(
         self,
@@ -73,6 +214,85 @@ class AbstractStorageManager(metaclass=ABCMeta):
             str: The file's link.
         """
 
+    async def generate_file_links(
+        self, file_identifiers: Iterable[str], **kwargs
+    ) -> list[str]:
+        """Generates links for given file identifiers.
+
+        Args:
+            file_identifiers (Iterable[str]): Media's file identifiers.
+
+        Returns:
+            list[str]: The files' links, in the identifiers' order.
+        """
+        return [
+            await self.generate_file_link(file_identifier, **kwargs)
+            for file_identifier in file_identifiers
+        ]
+
+    def get_link_expiry(self, file_link: str) -> float | None:
+        """Tells when a generated file link expires.
+
+        Args:
+            file_link (str): The file's link.
+
+        Returns:
+            float | None: The expiry's timestamp or None if it's unknown.
+        """
+        return None
+
+    @abstractmethod
+    async def generate_upload_link(
+        self,
+        media_type: str,
+        owner_id: UUID,
+        filename: str,
+        max_file_size: int | None = None,
+        content_type: str | None = None,
+        **kwargs,
+    ) -> UploadLink:
+        """Generates a link for uploading a file to the storage directly.
+
+        Args:
+            media_type (str): The media's type.
+            owner_id (UUID): The file owner's id.
+            filename (str): The file's filename.
+            max_file_size (int | None, optional): Maximum allowed file size.
+            content_type (str | None, optional): The file's content type.
+
+        Returns:
+            UploadLink: The upload link and the file's identifier.
+        """
+
+    @abstractmethod
+    def check_file_identifier(
+        self, file_identifier: str, media_type: str, owner_id: UUID
+    ) -> bool:
+        """
+        Checks if the file identifier is laid out for the given owner and
+        type. Only part of the owner's id might be checked, it's not an
+        ownership check on its own.
+
+        Args:
+            file_identifier (str): The file's identifier.
+            media_type (str): The media's type.
+            owner_id (UUID): The file owner's id.
+
+        Returns:
+            bool: Whether the file identifier matches.
+        """
+
+    @abstractmethod
+    async def get_file_info(self, file_identifier: str) -> FileInfo | None:
+        """Fetches the stored file's info.
+
+        Args:
+            file_identifier (str): The file's identifier.
+
+        Returns:
+            FileInfo | None: The file's info or None if it does not exist.
+        """
+
 
 class S3StorageManager(AbstractStorageManager):
     storage: Storage
@@ -97,12 +317,28 @@ class S3StorageManager(AbstractStorageManager):
         async with self.client_lock:
             if not self._client:
                 client = self.session.client(
-                    "s3", endpoint_url=self.storage_conf.endpoint_url
+                    "s3",
+                    endpoint_url=self.storage_conf.endpoint_url,
+                    region_name=self.storage_conf.region_name,
                 )
                 self._client = await client.__aenter__()
 
         yield self._client
 
+    @cached_property
+    def presigner(self) -> S3Presigner:
+        # Signs links locally, sparing the client's lock and event hooks
+        return S3Presigner(
+            access_key_id=self.storage_conf.access_key_id,
+            secret_access_key=self.storage_conf.secret_access_key,
+            bucket_name=self.storage_conf.bucket_name,
+            region_name=(
+                self.storage_conf.region_name or self.session.region_name
+            ),
+            endpoint_url=self.storage_conf.endpoint_url,
+            signing_window=self.storage_conf.link_signing_window,
+        )
+
     def _generate_object_key(
         self, media_type: str, owner_id: UUID, filename: str
     ) -> str:
@@ -134,14 +370,18 @@ class S3StorageManager(AbstractStorageManager):
             ext = filename.rsplit(".", maxsplit=1)[1]
             filename = f"{uuid4()}.{ext}"
 
-        return "/".join((media_type, str(owner_id)[:8], filename))
+        return self._get_object_key_prefix(media_type, owner_id) + filename
+
+    @staticmethod
+    def _get_object_key_prefix(media_type: str, owner_id: UUID) -> str:
+        return "/".join((media_type, str(owner_id)[:8], ""))
 
     async def save_media(
         self,
         media_type: str,
         owner_id: UUID,
         filename: str,
-        file: BytesIO,
+        file: BinaryIO,
         content_type: str | None = None,
         **kwargs,
     ) -> str:
@@ -156,7 +396,7 @@ class S3StorageManager(AbstractStorageManager):
             filename (str): Original filename. Might be overridden when
                 storage's random_filename is enabled.
 
-            file (BytesIO): The file content.
+            file (BinaryIO): The file content.
 
         Returns:
             str: The object key as file identifier.
@@ -165,19 +405,288 @@ class S3StorageManager(AbstractStorageManager):
             media_type=media_type, owner_id=owner_id, filename=filename
         )
 
+        await self._put_file(key=key, file=file, content_type=content_type)
+        return key
+
+    async def save_variant(
+        self,
+        file_identifier: str,
+        variant: str,
+        file: BinaryIO,
+        file_extension: str | None = None,
+        content_type: str | None = None,
+        **kwargs,
+    ) -> str:
+        """
+        Uploads the variant next to the original object as
+        {original_key}_{variant}.{file_extension or original_extension}
+
+        Args:
+            file_identifier (str): The original object's key.
+
+            variant (str): The variant's name.
+
+            file (BinaryIO): The variant's content.
+
+            file_extension (str | None, optional): The variant's file
+                extension when it's in another format than the original.
+
+            content_type (str | None, optional): The variant's content type.
+
+        Returns:
+            str: The variant's object key.
+        """
+        name, ext = file_identifier.rsplit(".", maxsplit=1)
+        key = f"{name}_{variant}.{file_extension or ext}"
+
+        await self._put_file(key=key, file=file, content_type=content_type)
+        return key
+
+    async def _put_file(
+        self, key: str, file: BinaryIO, content_type: str | None = None
+    ) -> None:
         additional_args = {}
         if content_type:
             additional_args["ContentType"] = content_type
 
+        file_size = file.seek(0, os.SEEK_END)
+        file.seek(0)
+
+        if file_size > self.storage_conf.multipart_threshold:
+            await self._multipart_upload(key=key, file=file, **additional_args)
+            return
+
         async with self.client() as client:
             await client.put_object(
                 Key=key,
-                Body=file.getvalue(),
+                Body=file,
                 Bucket=self.storage_conf.bucket_name,
                 **additional_args,
             )
 
-        return key
+    async def _multipart_upload(
+        self, key: str, file: BinaryIO, **kwargs
+    ) -> None:
+        """
+        Uploads the file using a multipart upload. The upload gets aborted
+        on failure so no orphaned parts are left behind.
+
+        Args:
+            key (str): The object key.
+            file (BinaryIO): The file content.
+            kwargs: Additional create_multipart_upload() arguments.
+        """
+        bucket = self.storage_conf.bucket_name
+
+        async with self.client() as client:
+            upload = await client.create_multipart_upload(
+                Bucket=bucket, Key=key, **kwargs
+            )
+            upload_id = upload["UploadId"]
+
+            try:
+                parts = await self._upload_parts(
+                    client=client, key=key, upload_id=upload_id, file=file
+                )
+                await client.complete_multipart_upload(
+                    Bucket=bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+
+            except BaseException:
+                await client.abort_multipart_upload(
+                    Bucket=bucket, Key=key, UploadId=upload_id
+                )
+                raise
+
+    async def _upload_parts(
+        self, client: "S3Client", key: str, upload_id: str, file: BinaryIO
+    ) -> list[dict]:
+        """
+        Uploads the file's parts concurrently. At most
+        `multipart_max_concurrency` parts are read into memory and
+        in-flight at the same time.
+
+        Args:
+            client (S3Client): The S3 client.
+            key (str): The object key.
+            upload_id (str): The multipart upload's id.
+            file (BinaryIO): The file content.
+
+        Returns:
+            list[dict]: Uploaded parts' numbers and ETags.
+        """
+        parts: list[dict] = []
+        part_size = self.storage_conf.multipart_part_size
+        in_flight = asyncio.Semaphore(
+            self.storage_conf.multipart_max_concurrency
+        )
+
+        async def upload_part(part_number: int, body: bytes) -> None:
+            try:
+                response = await client.upload_part(
+                    Bucket=self.storage_conf.bucket_name,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=body,
+                )
+                parts.append(
+                    {"PartNumber": part_number, "ETag": response["ETag"]}
+                )
+            finally:
+                in_flight.release()
+
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                for part_number in itertools.count(start=1):
+                    await in_flight.acquire()
+
+                    # Spooled uploads are read from disk
+                    body = await asyncio.to_thread(file.read, part_size)
+                    if not body:
+                        in_flight.release()
+                        break
+
+                    task_group.create_task(upload_part(part_number, body))
+
+        except ExceptionGroup as exc_group:
+            # Surface the first failure instead of the group
+            raise exc_group.exceptions[0] from exc_group
+
+        return sorted(parts, key=lambda part: part["PartNumber"])
+
+    async def read_file(
+        self, file_identifier: str, length: int | None = None, **kwargs
+    ) -> bytes:
+        """Downloads the given object's content.
+
+        Args:
+            file_identifier (str): The object key.
+            length (int | None, optional): Only downloads the first
+                `length` bytes when given. Defaults to None.
+
+        Returns:
+            bytes: The object's content.
+        """
+        additional_args = {}
+        if length:
+            additional_args["Range"] = f"bytes=0-{length - 1}"
+
+        async with self.client() as client:
+            response = await client.get_object(
+                Key=file_identifier,
+                Bucket=self.storage_conf.bucket_name,
+                **additional_args,
+            )
+
+            async with response["Body"] as body:
+                return await body.read()
+
+    @property
+    def part_size(self) -> int:
+        return self.storage_conf.multipart_part_size
+
+    async def create_multipart_upload(
+        self,
+        media_type: str,
+        owner_id: UUID,
+        filename: str,
+        content_type: str | None = None,
+        **kwargs,
+    ) -> MultipartUpload:
+        """
+        Starts an S3 multipart upload. Every part except the last one
+        must be exactly `multipart_part_size` bytes.
+
+        Args:
+            media_type (str): The media type (image/video/...).
+
+            owner_id (UUID): Media owner's id.
+
+            filename (str): Original filename. Might be overridden when
+                storage's random_filename is enabled.
+
+            content_type (str | None, optional): The file's content type.
+
+        Returns:
+            MultipartUpload: The object key and the multipart upload's id.
+        """
+        key = self._generate_object_key(
+            media_type=media_type, owner_id=owner_id, filename=filename
+        )
+
+        additional_args = {}
+        if content_type:
+            additional_args["ContentType"] = content_type
+
+        async with self.client() as client:
+            upload = await client.create_multipart_upload(
+                Bucket=self.storage_conf.bucket_name,
+                Key=key,
+                **additional_args,
+            )
+
+        return MultipartUpload(
+            file_identifier=key, upload_id=upload["UploadId"]
+        )
+
+    async def upload_part(
+        self,
+        file_identifier: str,
+        upload_id: str,
+        part_number: int,
+        body: bytes | memoryview,
+        **kwargs,
+    ) -> str:
+        async with self.client() as client:
+            with MemoryViewReader(memoryview(body)) as reader:
+                response = await client.upload_part(
+                    Bucket=self.storage_conf.bucket_name,
+                    Key=file_identifier,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=reader,
+                )
+
+        return response["ETag"]
+
+    async def complete_multipart_upload(
+        self,
+        file_identifier: str,
+        upload_id: str,
+        parts: list[tuple[int, str]],
+        **kwargs,
+    ) -> None:
+        async with self.client() as client:
+            await client.complete_multipart_upload(
+                Bucket=self.storage_conf.bucket_name,
+                Key=file_identifier,
+                UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": [
+                        {"PartNumber": part_number, "ETag": etag}
+                        for part_number, etag in parts
+                    ]
+                },
+            )
+
+    async def abort_multipart_upload(
+        self, file_identifier: str, upload_id: str, **kwargs
+    ) -> None:
+        async with self.client() as client:
+            try:
+                await client.abort_multipart_upload(
+                    Bucket=self.storage_conf.bucket_name,
+                    Key=file_identifier,
+                    UploadId=upload_id,
+                )
+            except ClientError as exc:
+                # Already completed or aborted
+                if exc.response.get("Error", {}).get("Code") != "NoSuchUpload":
+                    raise
 
     async def delete_file(self, file_identifier: str, **kwargs) -> None:
         """Deletes the given file from storage.
@@ -194,7 +703,8 @@ class S3StorageManager(AbstractStorageManager):
         self, file_identifier: str, expires_in: int = 3600, **kwargs
     ) -> str:
         """
-        Generate a file link for given file_identifier.
+        Generate a file link for given file_identifier, presigned with
+        SigV4. Links are identical within the storage's signing window.
 
         Args:
             file_identifier (str): The object key returned from save_media().
@@ -204,12 +714,123 @@ class S3StorageManager(AbstractStorageManager):
         Returns:
             str: The object's link.
         """
+        return self.presigner.presign(file_identifier, expires_in=expires_in)
+
+    async def generate_file_links(
+        self,
+        file_identifiers: Iterable[str],
+        expires_in: int = 3600,
+        **kwargs,
+    ) -> list[str]:
+        """
+        Generate file links for given file_identifiers in one go.
+
+        Args:
+            file_identifiers (Iterable[str]): The object keys.
+            expires_in (int, optional): The amount of time in seconds which
+                the links will be valid. Defaults to 3600.
+
+        Returns:
+            list[str]: The objects' links, in the keys' order.
+        """
+        return self.presigner.presign_many(
+            file_identifiers, expires_in=expires_in
+        )
+
+    def get_link_expiry(self, file_link: str) -> float | None:
+        return get_link_expiry(file_link)
+
+    async def generate_upload_link(
+        self,
+        media_type: str,
+        owner_id: UUID,
+        filename: str,
+        max_file_size: int | None = None,
+        content_type: str | None = None,
+        expires_in: int = 3600,
+        **kwargs,
+    ) -> UploadLink:
+        """
+        Generates a presigned POST policy for uploading the file directly.
+
+        Args:
+            media_type (str): The media type (image/video/...).
+
+            owner_id (UUID): Media owner's id.
+
+            filename (str): Original filename. Might be overridden when
+                storage's random_filename is enabled.
+
+            max_file_size (int | None, optional): Maximum allowed file
+                size. Enforced by S3 using the policy's conditions.
+
+            content_type (str | None, optional): The file's content type.
+                Enforced by S3 when given.
+
+            expires_in (int, optional): The amount of time in seconds which
+                the policy will be valid. Defaults to 3600.
+
+        Returns:
+            UploadLink: The POST url, form fields and the object key.
+        """
+        key = self._generate_object_key(
+            media_type=media_type, owner_id=owner_id, filename=filename
+        )
+
+        fields: dict[str, str] = {}
+        conditions: list = []
+
+        if max_file_size:
+            conditions.append(["content-length-range", 1, max_file_size])
+
+        if content_type:
+            fields["Content-Type"] = content_type
+            conditions.append({"Content-Type": content_type})
+
         async with self.client() as client:
-            return await client.generate_presigned_url(
-                "get_object",
+            post = await client.generate_presigned_post(
+                Bucket=self.storage_conf.bucket_name,
+                Key=key,
+                Fields=fields,
+                Conditions=conditions,
                 ExpiresIn=expires_in,
-                Params={
-                    "Bucket": self.storage_conf.bucket_name,
-                    "Key": file_identifier,
-                },
             )
+
+        return UploadLink(
+            file_identifier=key, url=post["url"], fields=post["fields"]
+        )
+
+    def check_file_identifier(
+        self, file_identifier: str, media_type: str, owner_id: UUID
+    ) -> bool:
+        return file_identifier.startswith(
+            self._get_object_key_prefix(media_type, owner_id)
+        )
+
+    async def get_file_info(self, file_identifier: str) -> FileInfo | None:
+        """
+        Fetches the object's size and content type using a HEAD request.
+
+        Args:
+            file_identifier (str): The object key.
+
+        Returns:
+            FileInfo | None: The object's info or None if it does not exist.
+        """
+        async with self.client() as client:
+            try:
+                head = await client.head_object(
+                    Key=file_identifier, Bucket=self.storage_conf.bucket_name
+                )
+            except ClientError as exc:
+                if exc.response.get("Error", {}).get("Code") in (
+                    "404",
+                    "NoSuchKey",
+                ):
+                    return None
+
+                raise
+
+        return FileInfo(
+            size=head["ContentLength"], content_type=head.get("ContentType")
+        )
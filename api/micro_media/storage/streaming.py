@@ -0,0 +1,183 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Future
+from uuid import UUID
+
+from .manager import AbstractStorageManager, MultipartUpload
+
+
+class StreamingUpload:
+    """
+    Uploads a file to the storage while it's being written, so the
+    transfer overlaps with producing it (e.g. encoding an image). Written
+    data is buffered until a part is full and full parts are uploaded in
+    the background. Writers block while `max_pending_parts` parts are
+    still being uploaded, which bounds the buffered memory.
+
+    `write()` is called from a worker thread, everything else on the
+    event loop. Files smaller than a part are not uploaded at all and
+    `complete()` leaves saving them to the caller.
+    """
+
+    storage_manager: AbstractStorageManager
+    media_type: str
+    owner_id: UUID
+    filename: str
+    content_type: str | None
+    max_pending_parts: int
+
+    def __init__(
+        self,
+        storage_manager: AbstractStorageManager,
+        media_type: str,
+        owner_id: UUID,
+        filename: str,
+        content_type: str | None = None,
+        max_pending_parts: int = 2,
+    ) -> None:
+        self.storage_manager = storage_manager
+        self.media_type = media_type
+        self.owner_id = owner_id
+        self.filename = filename
+        self.content_type = content_type
+        self.max_pending_parts = max_pending_parts
+
+        self._loop = asyncio.get_running_loop()
+        self._upload: MultipartUpload | None = None
+        self._upload_lock = asyncio.Lock()
+        self._buffer = bytearray()
+        self._part_number = 0
+        self._pending: deque[Future[tuple[int, str]]] = deque()
+        self._last_part: asyncio.Task[tuple[int, str]] | None = None
+        self._parts: list[tuple[int, str]] = []
+        # Set once completed or aborted, nothing may be uploaded then
+        self._closed = False
+
+    def write(self, data: bytes) -> None:
+        """
+        Buffers the data and uploads every part which got full. Must not
+        be called from the event loop's thread.
+
+        Args:
+            data (bytes): The file's next bytes.
+
+        Raises:
+            RuntimeError: When the upload is completed or aborted.
+        """
+        if self._closed:
+            raise RuntimeError("The upload is closed.")
+
+        self._buffer += data
+
+        part_size = self.storage_manager.part_size
+        while len(self._buffer) >= part_size:
+            part = bytes(self._buffer[:part_size])
+            del self._buffer[:part_size]
+
+            # Wait for the oldest part while too many are in flight
+            while len(self._pending) >= self.max_pending_parts:
+                self._parts.append(self._pending.popleft().result())
+
+            self._part_number += 1
+            self._pending.append(
+                asyncio.run_coroutine_threadsafe(
+                    self._upload_part(self._part_number, part), self._loop
+                )
+            )
+
+    async def _start(self) -> MultipartUpload:
+        async with self._upload_lock:
+            if not self._upload:
+                # Parts written after an abort must not start a new upload
+                if self._closed:
+                    raise RuntimeError("The upload is closed.")
+
+                self._upload = (
+                    await self.storage_manager.create_multipart_upload(
+                        media_type=self.media_type,
+                        owner_id=self.owner_id,
+                        filename=self.filename,
+                        content_type=self.content_type,
+                    )
+                )
+
+        return self._upload
+
+    async def _upload_part(
+        self, part_number: int, body: bytes
+    ) -> tuple[int, str]:
+        upload = await self._start()
+
+        etag = await self.storage_manager.upload_part(
+            file_identifier=upload.file_identifier,
+            upload_id=upload.upload_id,
+            part_number=part_number,
+            body=body,
+        )
+        return part_number, etag
+
+    async def complete(self) -> str | None:
+        """
+        Uploads the remaining data as the last part and assembles the
+        file, once the writing is done.
+
+        Returns:
+            str | None: The file's identifier or None if nothing was
+                uploaded, as the file was smaller than a part.
+        """
+        if not self._part_number:
+            self._buffer.clear()
+            self._closed = True
+            return None
+
+        if self._buffer:
+            self._part_number += 1
+            self._last_part = asyncio.create_task(
+                self._upload_part(self._part_number, bytes(self._buffer))
+            )
+            self._buffer.clear()
+
+        # Kept until they're all done, so `abort()` waits for the parts
+        # still in flight when one fails
+        parts = [*self._parts, *await asyncio.gather(*self._in_flight())]
+        self._pending.clear()
+        self._last_part = None
+
+        upload = await self._start()
+
+        await self.storage_manager.complete_multipart_upload(
+            file_identifier=upload.file_identifier,
+            upload_id=upload.upload_id,
+            parts=sorted(parts),
+        )
+
+        # Nothing is left to abort
+        self._upload = None
+        self._closed = True
+        return upload.file_identifier
+
+    def _in_flight(self) -> list[asyncio.Future[tuple[int, str]]]:
+        return [
+            *(asyncio.wrap_future(future) for future in self._pending),
+            *([self._last_part] if self._last_part else []),
+        ]
+
+    async def abort(self) -> None:
+        """
+        Waits for the parts in flight and frees the uploaded ones. Does
+        nothing once the upload is completed. Nothing can be written
+        afterwards.
+        """
+        self._closed = True
+
+        await asyncio.gather(*self._in_flight(), return_exceptions=True)
+        self._pending.clear()
+        self._last_part = None
+        self._buffer.clear()
+
+        if upload := self._upload:
+            self._upload = None
+            await self.storage_manager.abort_multipart_upload(
+                file_identifier=upload.file_identifier,
+                upload_id=upload.upload_id,
+            )
@@ -0,0 +1,755 @@
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import contextlib
+from uuid import UUID
+from typing import (
+    Any,
+    AsyncIterator,
+    BinaryIO,
+    Coroutine,
+    Iterable,
+    NamedTuple,
+    cast,
+)
+
+import sqlalchemy as sa
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import UploadFile
+
+from micro_media.models import AsyncSessionLocal, Media, MediaStatus
+from micro_media.settings import (
+    UPLOAD_CHUNK_SIZE,
+    MEDIA_PROCESSING_MODE,
+    IMAGE_PROCESSING_STREAMING,
+)
+from micro_media.media.manager import (
+    BaseMediaManager,
+    ImageMediaManager,
+    MediaInfo,
+)
+from micro_media.media.config import ImageMediaOutputFormatConfig
+from micro_media.media.sniffing import SNIFF_SIZE
+from micro_media.utils.buffers import MediaBuffer, iter_chunks
+from micro_media.storage.manager import AbstractStorageManager
+from micro_media.storage.streaming import StreamingUpload
+
+
+logger = logging.getLogger(__name__)
+
+
+class StoredMedia(NamedTuple):
+    file_identifier: str
+    content_hash: str | None
+    thumbnails: dict[str, str] | None = None
+    status: MediaStatus = MediaStatus.READY
+    variants: dict[str, str] | None = None
+    info: MediaInfo | None = None
+    # Whether the files are another media's, which must not delete them
+    duplicate: bool = False
+
+    def get_info_columns(self) -> dict[str, Any]:
+        """Media columns of the file's info, empty until it's processed."""
+        return self.info._asdict() if self.info else {}
+
+
+def hash_file(file: BinaryIO, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    """Calculates the file's SHA-256 hash chunk by chunk.
+
+    Args:
+        file (BinaryIO): The file's content.
+        chunk_size (int, optional): Read chunk size in bytes.
+
+    Returns:
+        str: The hex digest.
+    """
+    file_hash = hashlib.sha256()
+
+    for chunk in iter_chunks(file, chunk_size):
+        file_hash.update(chunk)
+
+    file.seek(0)
+    return file_hash.hexdigest()
+
+
+async def lock_content(
+    session: AsyncSession, storage_id: UUID, content_hash: str
+) -> None:
+    """
+    Serializes reusing and deleting stored objects with the same content
+    until the session's transaction ends.
+
+    Args:
+        session (AsyncSession): The database session.
+        storage_id (UUID): The storage's id.
+        content_hash (str): The content's SHA-256 hash.
+    """
+    await session.execute(
+        sa.select(
+            sa.func.pg_advisory_xact_lock(
+                sa.func.hashtextextended(f"{storage_id}:{content_hash}", 0)
+            )
+        )
+    )
+
+
+def _find_duplicate_query(storage_id: UUID, content_hash: str):
+    return (
+        sa.select(Media)
+        .where(
+            Media.storage_id == storage_id, Media.content_hash == content_hash
+        )
+        .limit(1)
+    )
+
+
+async def find_duplicate(
+    session: AsyncSession, storage_id: UUID, content_hash: str
+) -> Media | None:
+    """
+    Finds a media with the same stored content. The content stays
+    referenced until the session's transaction ends.
+
+    Args:
+        session (AsyncSession): The database session.
+        storage_id (UUID): The storage's id.
+        content_hash (str): The content's SHA-256 hash.
+
+    Returns:
+        Media | None: A media referencing the same content if any.
+    """
+    # Look the content up without holding the request's connection first,
+    # most uploads are not duplicates.
+    async with AsyncSessionLocal() as lookup_session:
+        if not await lookup_session.scalar(
+            _find_duplicate_query(storage_id, content_hash)
+        ):
+            return None
+
+    # Make sure it's not being deleted concurrently
+    await lock_content(session, storage_id, content_hash)
+    return await session.scalar(
+        _find_duplicate_query(storage_id, content_hash)
+    )
+
+
+async def delete_files(
+    storage_manager: AbstractStorageManager, file_identifiers: Iterable[str]
+) -> None:
+    """
+    Deletes files which were saved for a media that won't be inserted.
+    Failures are only logged, not to shadow the error being handled.
+
+    Args:
+        storage_manager (AbstractStorageManager): The storage manager.
+        file_identifiers (Iterable[str]): The files' identifiers.
+    """
+    file_identifiers = list(file_identifiers)
+    results = await asyncio.gather(
+        *(
+            storage_manager.delete_file(file_identifier)
+            for file_identifier in file_identifiers
+        ),
+        return_exceptions=True,
+    )
+
+    for file_identifier, result in zip(file_identifiers, results):
+        if isinstance(result, Exception):
+            logger.error(
+                "Could not delete file %s.", file_identifier, exc_info=result
+            )
+
+
+async def discard_stored_media(
+    storage_manager: AbstractStorageManager,
+    stored_media: Iterable[StoredMedia],
+) -> None:
+    """
+    Deletes the files of stored media which won't be inserted, except the
+    ones reused from duplicates.
+
+    Args:
+        storage_manager (AbstractStorageManager): The storage manager.
+        stored_media (Iterable[StoredMedia]): The stored media.
+    """
+    await delete_files(
+        storage_manager=storage_manager,
+        file_identifiers=(
+            file_identifier
+            for stored in stored_media
+            if not stored.duplicate
+            for file_identifier in (
+                stored.file_identifier,
+                *(stored.thumbnails or {}).values(),
+                *(stored.variants or {}).values(),
+            )
+        ),
+    )
+
+
+async def _save_variants(
+    storage_manager: AbstractStorageManager,
+    saves: dict[str, Coroutine[Any, Any, str]],
+) -> dict[str, str]:
+    """
+    Saves variants concurrently, all or none of them. The saved ones are
+    deleted when any fails.
+
+    Args:
+        storage_manager (AbstractStorageManager): The storage manager.
+        saves (dict[str, Coroutine[Any, Any, str]]): Saves returning the
+            variants' file identifiers, by the variants' names.
+
+    Returns:
+        dict[str, str]: Variants' file identifiers by their names.
+    """
+    results = await asyncio.gather(*saves.values(), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, Exception)]
+
+    if errors:
+        await delete_files(
+            storage_manager=storage_manager,
+            file_identifiers=(
+                result for result in results if isinstance(result, str)
+            ),
+        )
+        raise errors[0]
+
+    return dict(zip(saves.keys(), cast(list[str], results)))
+
+
+async def save_thumbnails(
+    storage_manager: AbstractStorageManager,
+    media_manager: ImageMediaManager,
+    file_identifier: str,
+    thumbnails: dict[str, BinaryIO],
+    content_type: str | None = None,
+) -> dict[str, str]:
+    """
+    Saves rendered thumbnails next to the original file concurrently.
+    Thumbnails named `{size_name}.{file_extension}` are in that output
+    format, others in the original's format.
+
+    Args:
+        storage_manager (AbstractStorageManager): The storage manager.
+        media_manager (ImageMediaManager): The image media manager.
+        file_identifier (str): The original file's identifier.
+        thumbnails (dict[str, BinaryIO]): Thumbnails by their names.
+        content_type (str | None, optional): The original's content type.
+
+    Returns:
+        dict[str, str]: Thumbnails' file identifiers by their names.
+    """
+
+    async def save_thumbnail(name: str, thumbnail: BinaryIO) -> str:
+        size_name, _, file_extension = name.partition(".")
+        output_format = media_manager.get_output_format(file_extension)
+
+        return await storage_manager.save_variant(
+            file_identifier=file_identifier,
+            variant=size_name,
+            file=thumbnail,
+            file_extension=file_extension or None,
+            content_type=(
+                output_format.content_type if output_format else content_type
+            ),
+        )
+
+    return await _save_variants(
+        storage_manager=storage_manager,
+        saves={
+            name: save_thumbnail(name, file)
+            for name, file in thumbnails.items()
+        },
+    )
+
+
+async def save_output_formats(
+    storage_manager: AbstractStorageManager,
+    media_manager: ImageMediaManager,
+    file_identifier: str,
+    encoded: dict[str, BinaryIO],
+) -> dict[str, str]:
+    """Saves the image's encodings next to the original file concurrently.
+
+    Args:
+        storage_manager (AbstractStorageManager): The storage manager.
+        media_manager (ImageMediaManager): The image media manager.
+        file_identifier (str): The original file's identifier.
+        encoded (dict[str, BinaryIO]): Encoded images by the output
+            formats' file extensions.
+
+    Returns:
+        dict[str, str]: Encodings' file identifiers by file extensions.
+    """
+    return await _save_variants(
+        storage_manager=storage_manager,
+        saves={
+            file_extension: storage_manager.save_variant(
+                file_identifier=file_identifier,
+                variant=file_extension,
+                file=file,
+                file_extension=file_extension,
+                content_type=media_manager.get_output_format(
+                    file_extension
+                ).content_type,
+            )
+            for file_extension, file in encoded.items()
+        },
+    )
+
+
+async def save_media_file(
+    session: AsyncSession,
+    storage_manager: AbstractStorageManager,
+    media_manager: BaseMediaManager,
+    media_type: str,
+    owner_id: UUID,
+    filename: str,
+    file: BinaryIO,
+    content_type: str | None = None,
+    session_lock: asyncio.Lock | None = None,
+    stream: StreamingUpload | None = None,
+) -> StoredMedia:
+    """
+    Inspects the validated file and saves it along with its eager
+    thumbnails to the storage. When the storage has deduplication enabled
+    and a file with the same content is already stored, its identifiers
+    and info are reused instead.
+
+    Args:
+        session (AsyncSession): The database session which the media
+            gets inserted with.
+        storage_manager (AbstractStorageManager): The storage manager.
+        media_manager (BaseMediaManager): The media type's manager.
+        media_type (str): The media's type.
+        owner_id (UUID): The file owner's id.
+        filename (str): The validated filename.
+        file (BinaryIO): The validated file content.
+        content_type (str | None, optional): The file's content type, if
+            it can't be detected from the content.
+        session_lock (asyncio.Lock | None, optional): Serializes the
+            session's usage when files are saved concurrently with it.
+        stream (StreamingUpload | None, optional): The upload which the
+            file was streamed to while processing it, if any. Gets
+            completed unless the content turns out to be a duplicate.
+
+    Returns:
+        StoredMedia: The stored file's identifiers, content hash and info.
+    """
+    content_hash = await asyncio.to_thread(hash_file, file)
+
+    duplicate = None
+    if storage_manager.storage.deduplicate:
+        async with session_lock or contextlib.nullcontext():
+            duplicate = await find_duplicate(
+                session=session,
+                storage_id=storage_manager.storage_id,
+                content_hash=content_hash,
+            )
+
+    # Media stored before their info was recorded have no file size
+    if duplicate and duplicate.file_size is not None:
+        info = MediaInfo(
+            file_size=duplicate.file_size,
+            content_type=duplicate.content_type,
+            width=duplicate.width,
+            height=duplicate.height,
+            placeholder=duplicate.placeholder,
+        )
+    else:
+        info = await media_manager.ainspect_media(filename, file)
+        # The detected type wins, processing may have changed the format
+        info = info._replace(content_type=info.content_type or content_type)
+
+    if duplicate:
+        if stream:
+            await stream.abort()
+
+        return StoredMedia(
+            file_identifier=duplicate.file_identifier,
+            content_hash=content_hash,
+            thumbnails=duplicate.thumbnails,
+            variants=duplicate.variants,
+            info=info,
+            duplicate=True,
+        )
+
+    file_identifier = (
+        stream and await stream.complete()
+    ) or await storage_manager.save_media(
+        owner_id=owner_id,
+        media_type=media_type,
+        filename=filename,
+        file=file,
+        content_type=info.content_type,
+    )
+
+    thumbnails = None
+    variants = None
+    try:
+        if isinstance(media_manager, ImageMediaManager):
+            if media_manager.eager_thumbnails:
+                rendered = await media_manager.arender_thumbnails(
+                    filename, file
+                )
+                try:
+                    thumbnails = await save_thumbnails(
+                        storage_manager=storage_manager,
+                        media_manager=media_manager,
+                        file_identifier=file_identifier,
+                        thumbnails=rendered,
+                        content_type=info.content_type,
+                    )
+                finally:
+                    for thumbnail in rendered.values():
+                        thumbnail.close()
+
+            if media_manager.eager_output_formats:
+                encoded = await media_manager.arender_output_formats(
+                    filename, file
+                )
+                try:
+                    variants = await save_output_formats(
+                        storage_manager=storage_manager,
+                        media_manager=media_manager,
+                        file_identifier=file_identifier,
+                        encoded=encoded,
+                    )
+                finally:
+                    for variant in encoded.values():
+                        variant.close()
+    except BaseException:
+        # No media references the saved files, e.g. when rendering isn't
+        # admitted under load
+        await delete_files(
+            storage_manager=storage_manager,
+            file_identifiers=(file_identifier, *(thumbnails or {}).values()),
+        )
+        raise
+
+    return StoredMedia(
+        file_identifier=file_identifier,
+        content_hash=content_hash,
+        thumbnails=thumbnails,
+        variants=variants,
+        info=info,
+    )
+
+
+@contextlib.asynccontextmanager
+async def open_streaming_upload(
+    storage_manager: AbstractStorageManager,
+    media_manager: BaseMediaManager,
+    media_type: str,
+    owner_id: UUID,
+    filename: str,
+) -> AsyncIterator[StreamingUpload | None]:
+    """
+    Opens an upload which the processed file is streamed to while it's
+    being produced, when enabled and supported by the media manager. The
+    upload is aborted on exit unless it was completed.
+
+    Args:
+        storage_manager (AbstractStorageManager): The storage manager.
+        media_manager (BaseMediaManager): The media type's manager.
+        media_type (str): The media's type.
+        owner_id (UUID): The file owner's id.
+        filename (str): The uploaded file's filename.
+
+    Yields:
+        StreamingUpload | None: The upload or None when not streaming.
+    """
+    if not (
+        IMAGE_PROCESSING_STREAMING
+        and isinstance(media_manager, ImageMediaManager)
+        and media_manager.supports_streaming
+    ):
+        yield None
+        return
+
+    output_filename = media_manager.get_output_filename(filename)
+    stream = StreamingUpload(
+        storage_manager=storage_manager,
+        media_type=media_type,
+        owner_id=owner_id,
+        filename=output_filename,
+        content_type=mimetypes.guess_type(output_filename)[0],
+    )
+
+    try:
+        yield stream
+    finally:
+        await stream.abort()
+
+
+async def release_media(session: AsyncSession, media: Media) -> bool:
+    """
+    Deletes the media and commits the session.
+
+    Args:
+        session (AsyncSession): The database session.
+        media (Media): The media to delete.
+
+    Returns:
+        bool: Whether the media's file is no longer referenced and
+            should be deleted from the storage.
+    """
+    if media.content_hash:
+        await lock_content(session, media.storage_id, media.content_hash)
+
+    await session.delete(media)
+    await session.flush()
+
+    referenced = await session.scalar(
+        sa.select(
+            sa.exists().where(
+                Media.storage_id == media.storage_id,
+                Media.file_identifier == media.file_identifier,
+            )
+        )
+    )
+    await session.commit()
+
+    return not referenced
+
+
+def is_processed_in_queue(media_manager: BaseMediaManager) -> bool:
+    """
+    Whether the media type's files are stored as uploaded and processed by
+    the queue's workers, instead of while they're uploaded.
+
+    Args:
+        media_manager (BaseMediaManager): The media type's manager.
+
+    Returns:
+        bool: Whether the files are processed by the queue's workers.
+    """
+    return (
+        MEDIA_PROCESSING_MODE == "queue"
+        and not media_manager.supports_direct_upload
+    )
+
+
+async def save_upload(
+    session: AsyncSession,
+    storage_manager: AbstractStorageManager,
+    media_manager: BaseMediaManager,
+    media_type: str,
+    owner_id: UUID,
+    upload: UploadFile,
+    session_lock: asyncio.Lock | None = None,
+) -> StoredMedia:
+    """
+    Reads, validates and saves an uploaded file. In the "queue" processing
+    mode, files which need processing are stored as uploaded instead and
+    must be enqueued once their media is inserted.
+
+    Args:
+        session (AsyncSession): The database session which the media
+            gets inserted with.
+        storage_manager (AbstractStorageManager): The storage manager.
+        media_manager (BaseMediaManager): The media type's manager.
+        media_type (str): The media's type.
+        owner_id (UUID): The file owner's id.
+        upload (UploadFile): The uploaded file.
+        session_lock (asyncio.Lock | None, optional): Serializes the
+            session's usage when files are saved concurrently with it.
+
+    Returns:
+        StoredMedia: The stored file's identifiers and content hash.
+    """
+    raw_file = await media_manager.aread_media(
+        filename=upload.filename or "", file=upload
+    )
+    await upload.close()
+
+    with raw_file:
+        if is_processed_in_queue(media_manager):
+            file_identifier = await storage_manager.save_media(
+                media_type=media_type,
+                owner_id=owner_id,
+                filename=upload.filename or "",
+                file=raw_file,
+                content_type=upload.content_type,
+            )
+            return StoredMedia(
+                file_identifier=file_identifier,
+                content_hash=None,
+                status=MediaStatus.PROCESSING,
+            )
+
+        async with open_streaming_upload(
+            storage_manager=storage_manager,
+            media_manager=media_manager,
+            media_type=media_type,
+            owner_id=owner_id,
+            filename=upload.filename or "",
+        ) as stream:
+            filename, file = await media_manager.avalidate_media(
+                filename=upload.filename or "",
+                file=raw_file,
+                sink=stream and stream.write,
+            )
+
+            # Only the transformed content stays resident from here on
+            if file is not raw_file:
+                raw_file.close()
+
+            with file:
+                return await save_media_file(
+                    session=session,
+                    storage_manager=storage_manager,
+                    media_manager=media_manager,
+                    media_type=media_type,
+                    owner_id=owner_id,
+                    filename=filename,
+                    file=file,
+                    content_type=upload.content_type,
+                    session_lock=session_lock,
+                    stream=stream,
+                )
+
+
+async def check_stored_media(
+    storage_manager: AbstractStorageManager,
+    media_manager: BaseMediaManager,
+    file_identifier: str,
+    file_size: int,
+) -> None:
+    """
+    Validates a file which was stored without passing through the
+    service. The file gets deleted when it's invalid.
+
+    Args:
+        storage_manager (AbstractStorageManager): The storage manager.
+        media_manager (BaseMediaManager): The media type's manager.
+        file_identifier (str): The stored file's identifier.
+        file_size (int): The stored file's size.
+
+    Raises:
+        InvalidFileExtensionError: When the file's extension is invalid.
+        FileTooLargeError: When the file is too large.
+        FileFormatMismatchError: When the content does not match the
+            file's extension.
+    """
+    try:
+        media_manager.check_file_extension(file_identifier)
+        media_manager.check_file_size(file_size)
+
+        # Only the first bytes are fetched to sniff the format
+        head = (
+            await storage_manager.read_file(file_identifier, length=SNIFF_SIZE)
+            if file_size
+            else b""
+        )
+        media_manager.check_file_format(file_identifier, head)
+    except ValueError:
+        await storage_manager.delete_file(file_identifier)
+        raise
+
+
+async def delete_media_files(
+    storage_manager: AbstractStorageManager, media: Media
+) -> None:
+    """Deletes the media's file, thumbnails and variants from the storage.
+
+    Args:
+        storage_manager (AbstractStorageManager): The storage manager.
+        media (Media): The deleted media.
+    """
+    await asyncio.gather(
+        *(
+            storage_manager.delete_file(file_identifier)
+            for file_identifier in (
+                media.file_identifier,
+                *(media.thumbnails or {}).values(),
+                *(media.variants or {}).values(),
+            )
+        )
+    )
+
+
+async def save_output_format(
+    storage_manager: AbstractStorageManager,
+    media_manager: ImageMediaManager,
+    media: Media,
+    output_format: ImageMediaOutputFormatConfig,
+) -> str:
+    """
+    Encodes a stored image in the output format on demand, saves it next
+    to the original file and records it in the variants of all media
+    sharing the file, so deduplicated ones reuse it too. A session is only
+    opened to record it.
+
+    Args:
+        storage_manager (AbstractStorageManager): The storage manager.
+        media_manager (ImageMediaManager): The image media manager.
+        media (Media): The image's media.
+        output_format (ImageMediaOutputFormatConfig): The output format.
+
+    Raises:
+        NoResultFound: When the media was deleted meanwhile.
+
+    Returns:
+        str: The variant's file identifier.
+    """
+    file_extension = output_format.file_extension
+
+    with MediaBuffer() as file:
+        file.write(await storage_manager.read_file(media.file_identifier))
+        file.seek(0)
+
+        encoded = await media_manager.arender_output_formats(
+            media.file_identifier, file, file_extensions=[file_extension]
+        )
+
+    try:
+        variants = await save_output_formats(
+            storage_manager=storage_manager,
+            media_manager=media_manager,
+            file_identifier=media.file_identifier,
+            encoded=encoded,
+        )
+    finally:
+        for variant in encoded.values():
+            variant.close()
+
+    async with AsyncSessionLocal() as session:
+        # Serialized with deduplication and releases of the content, so
+        # media reusing the file meanwhile get the variant too
+        if media.content_hash:
+            await lock_content(session, media.storage_id, media.content_hash)
+
+        # Locked, so concurrent requests in other formats don't drop this
+        # one
+        sharing = (
+            await session.scalars(
+                sa.select(Media)
+                .where(
+                    Media.storage_id == media.storage_id,
+                    Media.file_identifier == media.file_identifier,
+                )
+                .with_for_update()
+            )
+        ).all()
+        for shared in sharing:
+            # Reassigned, as in-place changes of JSON columns aren't
+            # tracked
+            shared.variants = {**(shared.variants or {}), **variants}
+        await session.commit()
+
+    if not sharing:
+        # Variants are named after the file, only delete them once no
+        # media references it
+        await delete_files(
+            storage_manager=storage_manager,
+            file_identifiers=variants.values(),
+        )
+
+    if not any(shared.id == media.id for shared in sharing):
+        raise NoResultFound("Media was deleted.")
+
+    return variants[file_extension]
@@ -0,0 +1,163 @@
+import io
+import os
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Callable, Iterator
+
+from micro_media.settings import UPLOAD_SPOOL_MAX_SIZE
+
+
+class MemoryViewReader(io.RawIOBase):
+    """A seekable, read-only file over a memoryview which does not copy it."""
+
+    def __init__(self, view: memoryview) -> None:
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        match whence:
+            case os.SEEK_SET:
+                self._position = offset
+            case os.SEEK_CUR:
+                self._position += offset
+            case os.SEEK_END:
+                self._position = len(self._view) + offset
+
+        self._position = max(self._position, 0)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._position : self._position + len(buffer)]
+        size = len(chunk)
+
+        buffer[:size] = chunk
+        self._position += size
+
+        return size
+
+    def close(self) -> None:
+        self._view.release()
+        super().close()
+
+
+class TeeWriter(io.RawIOBase):
+    """
+    A write-only file which writes to the file and hands every written
+    chunk over to the sink too (e.g. a streaming upload).
+    """
+
+    def __init__(self, file: BinaryIO, sink: Callable[[bytes], None]) -> None:
+        self._file = file
+        self._sink = sink
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def write(self, data) -> int:
+        size = self._file.write(data)
+        self._sink(bytes(data))
+
+        return size
+
+
+class MediaBuffer(SpooledTemporaryFile):
+    """
+    A file which is kept in memory up to `max_size` bytes and spooled to
+    a temporary file beyond it. While in memory, its content can be viewed
+    and sliced as a memoryview without being copied.
+    """
+
+    def __init__(self, max_size: int = UPLOAD_SPOOL_MAX_SIZE) -> None:
+        super().__init__(max_size=max_size)
+
+    @property
+    def in_memory(self) -> bool:
+        return not self._rolled
+
+    def fileno(self) -> int:
+        # Writers preferring file descriptors (e.g. Pillow) would roll
+        # small buffers over to disk otherwise.
+        if self.in_memory:
+            raise io.UnsupportedOperation("fileno")
+
+        return super().fileno()
+
+    def getbuffer(self) -> memoryview:
+        """
+        Views the in-memory content. The buffer can't grow until the view
+        and its slices are released.
+
+        Raises:
+            io.UnsupportedOperation: When the buffer is spooled to disk.
+
+        Returns:
+            memoryview: The buffer's content.
+        """
+        if not self.in_memory:
+            raise io.UnsupportedOperation("getbuffer")
+
+        return self._file.getbuffer()
+
+    def __reduce__(self):
+        # Lets process executors' jobs return buffers, by copying them
+        position = self.tell()
+        self.seek(0)
+        content = self.read()
+        self.seek(position)
+
+        return _restore_media_buffer, (content, self._max_size)
+
+
+def _restore_media_buffer(content: bytes, max_size: int) -> MediaBuffer:
+    buffer = MediaBuffer(max_size=max_size)
+    buffer.write(content)
+    buffer.seek(0)
+
+    return buffer
+
+
+def _get_memory_view(file: BinaryIO) -> memoryview | None:
+    if isinstance(file, MediaBuffer) and file.in_memory:
+        return file.getbuffer()
+
+    if isinstance(file, io.BytesIO):
+        return file.getbuffer()
+
+    return None
+
+
+def iter_chunks(file: BinaryIO, chunk_size: int) -> Iterator[memoryview]:
+    """
+    Yields the file's content chunk by chunk. In-memory files are sliced
+    without copying, others are read. Files spooled to disk are not mapped
+    into memory, so they don't add to the resident size.
+
+    Args:
+        file (BinaryIO): The file. Must not be written to meanwhile.
+        chunk_size (int): Max chunk size in bytes.
+
+    Yields:
+        memoryview: The next chunk, valid until the following one.
+    """
+    file.seek(0)
+
+    if (view := _get_memory_view(file)) is None:
+        while chunk := file.read(chunk_size):
+            yield memoryview(chunk)
+        return
+
+    with view:
+        for offset in range(0, len(view), chunk_size):
+            with view[offset : offset + chunk_size] as chunk:
+                yield chunk
@@ -1,14 +1,23 @@
-# import asyncio
-from functools import wraps
-from typing import Awaitable, Callable, TypeVar
+import time
+import asyncio
+import contextlib
+from functools import partial, wraps
+from typing import Any, Awaitable, Callable, Sequence, TypeVar
 from typing_extensions import ParamSpec
 
+from cachetools import TLRUCache
 from redis.asyncio.client import Redis
+from redis.exceptions import LockError
+
+from .metrics import METRICS
 
 
 P = ParamSpec("P")
 T = TypeVar("T")
 
+# Seconds between checks for a result which another worker computes
+LOCK_POLL_INTERVAL = 0.05
+
 
 class AsyncRedisCache:
     prefix: str
@@ -19,6 +28,115 @@ class AsyncRedisCache:
         cls.redis = redis
         cls.prefix = prefix
 
+    @classmethod
+    async def _get(
+        cls, cache_key: str, with_ttl: bool = False
+    ) -> tuple[str | None, int | None]:
+        """Reads the cached value, along with its remaining TTL if asked.
+
+        Args:
+            cache_key (str): The prefixed cache key.
+            with_ttl (bool, optional): Whether to read the remaining TTL
+                in the same round trip. Defaults to False.
+
+        Returns:
+            tuple[str | None, int | None]: The value, None on a miss, and
+                its remaining seconds as Redis' TTL command returns them.
+        """
+        remaining = None
+
+        if with_ttl:
+            async with cls.redis.pipeline(transaction=False) as pipe:
+                pipe.get(cache_key)
+                pipe.ttl(cache_key)
+                cache_value, remaining = await pipe.execute()
+        else:
+            cache_value = await cls.redis.get(cache_key)
+
+        if isinstance(cache_value, bytes):
+            cache_value = cache_value.decode()
+
+        return cache_value, remaining
+
+    @classmethod
+    async def _get_many(
+        cls, cache_keys: list[str], with_ttl: bool = False
+    ) -> list[tuple[str | None, int | None]]:
+        """Reads many cached values in one round trip, as `_get()` does.
+
+        Args:
+            cache_keys (list[str]): The prefixed cache keys.
+            with_ttl (bool, optional): Whether to read the remaining TTLs
+                too. Defaults to False.
+
+        Returns:
+            list[tuple[str | None, int | None]]: The values and their
+                remaining seconds, in the keys' order.
+        """
+        if with_ttl:
+            async with cls.redis.pipeline(transaction=False) as pipe:
+                for cache_key in cache_keys:
+                    pipe.get(cache_key)
+                    pipe.ttl(cache_key)
+                replies = await pipe.execute()
+
+            entries = list(zip(replies[::2], replies[1::2]))
+        else:
+            entries = [
+                (cache_value, None)
+                for cache_value in await cls.redis.mget(cache_keys)
+            ]
+
+        return [
+            (
+                (
+                    cache_value.decode()
+                    if isinstance(cache_value, bytes)
+                    else cache_value
+                ),
+                remaining,
+            )
+            for cache_value, remaining in entries
+        ]
+
+    @classmethod
+    async def _wait_for(
+        cls,
+        cache_key: str,
+        lock_key: str,
+        timeout: float,
+        with_ttl: bool = False,
+    ) -> tuple[str | None, int | None]:
+        """
+        Polls the cache until the value is set, the lock computing it is
+        released without setting it or the timeout passes.
+
+        Args:
+            cache_key (str): The prefixed cache key.
+            lock_key (str): The prefixed key of the lock.
+            timeout (float): Max seconds to wait.
+            with_ttl (bool, optional): Whether to read the remaining TTL
+                too. Defaults to False.
+
+        Returns:
+            tuple[str | None, int | None]: As `_get()` returns them.
+        """
+        deadline = time.monotonic() + timeout
+
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+
+            cache_value, remaining = await cls._get(cache_key, with_ttl)
+            if cache_value is not None:
+                return cache_value, remaining
+
+            # Released without a value, the computation failed unless
+            # the value was set right after reading it
+            if not await cls.redis.exists(lock_key):
+                return await cls._get(cache_key, with_ttl)
+
+        return None, None
+
     @classmethod
     def aredis_cache(
         cls,
@@ -26,28 +144,260 @@ class AsyncRedisCache:
         cache_serializer: Callable[[T], str],
         cache_deserializer: Callable[[str], T],
         ttl: int,
+        l1_maxsize: int = 0,
+        l1_ttl: float = 0,
+        lock_timeout: float = 0,
+        name: str | None = None,
     ) -> Callable[[Callable[P, Awaitable[T]]], Callable[P, Awaitable[T]]]:
+        """
+        Caches the function's results in Redis. With `l1_maxsize`, the
+        most recently used results are also kept in process for `l1_ttl`
+        seconds, so hot keys don't cost a Redis round trip. An in-process
+        entry never outlives its Redis entry.
+
+        Concurrent calls with the same key share a single lookup. With
+        `lock_timeout`, a Redis lock also lets a single worker compute a
+        missing result while the others wait for it, for up to
+        `lock_timeout` seconds or until it fails, before computing it
+        themselves.
+
+        Hits, misses, shared lookups and lock waits are exposed as
+        `cache.{name}.*` metrics, per tier for hits and misses.
+
+        The decorated function's `invalidate()` takes the same arguments
+        and drops their cached result from Redis and this process. A lookup
+        in flight is not cached then, since it might have read the old
+        data. Other processes keep theirs for up to `l1_ttl` seconds.
+
+        Its `many()` looks many results up at once: in process first, then
+        in one Redis round trip, and computes the rest in a single call.
+
+        Args:
+            key_generator (Callable[P, str]): Builds the cache key from the
+                function's arguments.
+            cache_serializer (Callable[[T], str]): Serializes results.
+            cache_deserializer (Callable[[str], T]): Deserializes results.
+            ttl (int): Seconds results are cached in Redis.
+            l1_maxsize (int, optional): Max results cached in process, 0
+                disables the in-process cache. Defaults to 0.
+            l1_ttl (float, optional): Seconds results are cached in
+                process, must be shorter than `ttl`. Defaults to 0.
+            lock_timeout (float, optional): Seconds the Redis lock is held
+                at most, 0 disables it. Defaults to 0.
+            name (str | None, optional): The metrics' name. Defaults to
+                the function's name.
+
+        Raises:
+            ValueError: When `l1_ttl` is not between 0 and `ttl`.
+        """
+        if l1_maxsize and not 0 < l1_ttl < ttl:
+            raise ValueError("`l1_ttl` must be positive and below `ttl`.")
+
         def decorator(
             func: Callable[P, Awaitable[T]],
         ) -> Callable[P, Awaitable[T]]:
-            # lock = asyncio.Lock()
+            metric = f"cache.{name or func.__name__}"
 
-            @wraps(func)
-            async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
-                cache_key = cls.prefix + key_generator(*args, **kwargs)
+            # Entries are (result, seconds to keep it) pairs
+            l1_cache: TLRUCache[str, tuple[Any, float]] | None = (
+                TLRUCache(
+                    maxsize=l1_maxsize,
+                    ttu=lambda key, entry, now: now + entry[1],
+                )
+                if l1_maxsize
+                else None
+            )
+            in_flight: dict[str, asyncio.Task[T]] = {}
 
-                # async with lock:
-                cache_value = await cls.redis.get(cache_key)
-                if cache_value is not None:
-                    if isinstance(cache_value, bytes):
-                        cache_value = cache_value.decode()
+            def is_current(key: str) -> bool:
+                # Invalidating a key detaches its in-flight lookup, whose
+                # result may be stale already
+                return in_flight.get(key) is asyncio.current_task()
 
-                    return cache_deserializer(cache_value)
+            def set_l1(key: str, res: T, remaining: int | None) -> None:
+                if l1_cache is None:
+                    return
 
+                # -1 stands for no expiry, -2 for a vanished key
+                if remaining == -1:
+                    l1_cache[key] = (res, l1_ttl)
+                elif remaining and remaining > 0:
+                    l1_cache[key] = (res, min(l1_ttl, remaining))
+
+            async def compute(
+                key: str, *args: P.args, **kwargs: P.kwargs
+            ) -> tuple[T, int | None]:
                 res = await func(*args, **kwargs)
-                await cls.redis.setex(cache_key, ttl, cache_serializer(res))
+                if not is_current(key):
+                    return res, None
+
+                await cls.redis.setex(
+                    cls.prefix + key, ttl, cache_serializer(res)
+                )
+                return res, ttl
+
+            async def load(key: str, *args: P.args, **kwargs: P.kwargs) -> T:
+                cache_key = cls.prefix + key
+                with_ttl = l1_cache is not None
+
+                cache_value, remaining = await cls._get(cache_key, with_ttl)
+                if cache_value is not None:
+                    METRICS.incr(f"{metric}.l2.hits")
+                    res = cache_deserializer(cache_value)
+
+                elif not lock_timeout:
+                    METRICS.incr(f"{metric}.l2.misses")
+                    res, remaining = await compute(key, *args, **kwargs)
+
+                else:
+                    METRICS.incr(f"{metric}.l2.misses")
+                    lock_key = f"{cls.prefix}lock:{key}"
+                    lock = cls.redis.lock(
+                        lock_key, timeout=lock_timeout, blocking=False
+                    )
+
+                    if await lock.acquire():
+                        try:
+                            res, remaining = await compute(
+                                key, *args, **kwargs
+                            )
+                        finally:
+                            # Expired locks might be taken by others already
+                            with contextlib.suppress(LockError):
+                                await lock.release()
+                    else:
+                        METRICS.incr(f"{metric}.lock_waits")
+                        cache_value, remaining = await cls._wait_for(
+                            cache_key, lock_key, lock_timeout, with_ttl
+                        )
+
+                        if cache_value is not None:
+                            res = cache_deserializer(cache_value)
+                        else:
+                            res, remaining = await compute(
+                                key, *args, **kwargs
+                            )
+
+                if is_current(key):
+                    set_l1(key, res, remaining)
+
                 return res
 
+            def release(key: str, task: asyncio.Task[T]) -> None:
+                # Might have been replaced after an invalidation
+                if in_flight.get(key) is task:
+                    del in_flight[key]
+
+            @wraps(func)
+            async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+                key = key_generator(*args, **kwargs)
+
+                if l1_cache is not None:
+                    if (entry := l1_cache.get(key)) is not None:
+                        METRICS.incr(f"{metric}.l1.hits")
+                        return entry[0]
+
+                    METRICS.incr(f"{metric}.l1.misses")
+
+                if task := in_flight.get(key):
+                    METRICS.incr(f"{metric}.coalesced")
+                else:
+                    task = asyncio.create_task(load(key, *args, **kwargs))
+                    in_flight[key] = task
+                    task.add_done_callback(partial(release, key))
+
+                # Callers' cancellations don't cancel the shared lookup
+                return await asyncio.shield(task)
+
+            async def invalidate(*args: P.args, **kwargs: P.kwargs) -> None:
+                key = key_generator(*args, **kwargs)
+
+                # Callers waiting on it still get its result, later ones
+                # look the key up again
+                in_flight.pop(key, None)
+
+                if l1_cache is not None:
+                    l1_cache.pop(key, None)
+
+                await cls.redis.delete(cls.prefix + key)
+
+            async def many(
+                arguments: Sequence[tuple],
+                compute_many: Callable[
+                    [list[tuple]], Awaitable[Sequence[T | None]]
+                ],
+            ) -> list[T | None]:
+                """Looks the results up for many calls at once.
+
+                Args:
+                    arguments (Sequence[tuple]): The calls' positional
+                        arguments.
+                    compute_many (Callable): Computes the missing results
+                        for the given calls' arguments, in their order.
+                        None results are neither cached nor retried.
+
+                Returns:
+                    list[T | None]: The results, in the calls' order.
+                """
+                keys = [key_generator(*args) for args in arguments]
+                results: list[T | None] = [None] * len(keys)
+                pending = []
+
+                for index, key in enumerate(keys):
+                    if l1_cache is not None:
+                        if (entry := l1_cache.get(key)) is not None:
+                            METRICS.incr(f"{metric}.l1.hits")
+                            results[index] = entry[0]
+                            continue
+
+                        METRICS.incr(f"{metric}.l1.misses")
+
+                    pending.append(index)
+
+                if not pending:
+                    return results
+
+                missing = []
+                cached = await cls._get_many(
+                    [cls.prefix + keys[index] for index in pending],
+                    with_ttl=l1_cache is not None,
+                )
+                for index, (cache_value, remaining) in zip(pending, cached):
+                    if cache_value is None:
+                        METRICS.incr(f"{metric}.l2.misses")
+                        missing.append(index)
+                        continue
+
+                    METRICS.incr(f"{metric}.l2.hits")
+                    results[index] = cache_deserializer(cache_value)
+                    set_l1(keys[index], results[index], remaining)
+
+                if not missing:
+                    return results
+
+                computed = await compute_many(
+                    [arguments[index] for index in missing]
+                )
+                async with cls.redis.pipeline(transaction=False) as pipe:
+                    for index, res in zip(missing, computed):
+                        if res is None:
+                            continue
+
+                        results[index] = res
+                        pipe.setex(
+                            cls.prefix + keys[index],
+                            ttl,
+                            cache_serializer(res),
+                        )
+                        set_l1(keys[index], res, ttl)
+
+                    await pipe.execute()
+
+                return results
+
+            wrapper.invalidate = invalidate  # type: ignore[attr-defined]
+            wrapper.many = many  # type: ignore[attr-defined]
+
             return wrapper
 
         return decorator
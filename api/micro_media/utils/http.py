@@ -0,0 +1,32 @@
+def parse_accept(accept: str | None) -> dict[str, float]:
+    """Parses an Accept header into its media ranges' quality values.
+
+    Args:
+        accept (str | None): The Accept header's value.
+
+    Returns:
+        dict[str, float]: Quality values by lowercase media ranges.
+            Ranges with an invalid quality value are left out.
+    """
+    media_ranges: dict[str, float] = {}
+
+    for item in (accept or "").split(","):
+        media_range, *params = item.split(";")
+        if not (media_range := media_range.strip().lower()):
+            continue
+
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = -1
+
+        if 0 <= quality <= 1:
+            media_ranges[media_range] = max(
+                quality, media_ranges.get(media_range, 0)
+            )
+
+    return media_ranges
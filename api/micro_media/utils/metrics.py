@@ -0,0 +1,47 @@
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """
+    In-process counters and gauges. Values are per worker process and are
+    exposed through the internal metrics endpoint.
+    """
+
+    _values: defaultdict[str, float]
+
+    def __init__(self) -> None:
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increments the counter by given value.
+
+        Args:
+            name (str): The metric's name.
+            value (float, optional): The increment. Defaults to 1.
+        """
+        with self._lock:
+            self._values[name] += value
+
+    def set(self, name: str, value: float) -> None:
+        """Sets the gauge to given value.
+
+        Args:
+            name (str): The metric's name.
+            value (float): The gauge's value.
+        """
+        with self._lock:
+            self._values[name] = value
+
+    def snapshot(self) -> dict[str, float]:
+        """Returns a copy of current metric values.
+
+        Returns:
+            dict[str, float]: Metric values by their names.
+        """
+        with self._lock:
+            return dict(sorted(self._values.items()))
+
+
+METRICS = Metrics()
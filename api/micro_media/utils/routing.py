@@ -0,0 +1,42 @@
+from typing import Awaitable, Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from micro_media.media.admission import AdmissionController
+
+
+def admission_route(
+    controller: AdmissionController, max_files: int | None = None
+) -> type[APIRoute]:
+    """
+    Creates a route class which admits requests through the controller
+    before the request's body is read, so rejected requests are cheap.
+
+    Args:
+        controller (AdmissionController): The admission controller.
+        max_files (int | None, optional): Max files in multipart bodies.
+            Requests with more are rejected with 400 as soon as parsing
+            reaches the first extra file. Defaults to Starlette's limit.
+
+    Returns:
+        type[APIRoute]: The route class.
+    """
+
+    class AdmissionRoute(APIRoute):
+        def get_route_handler(
+            self,
+        ) -> Callable[[Request], Awaitable[Response]]:
+            route_handler = super().get_route_handler()
+
+            async def admitted_route_handler(request: Request) -> Response:
+                async with controller.admit():
+                    if max_files is not None:
+                        # Parsed and cached for the handler, with the limit
+                        await request.form(max_files=max_files)
+
+                    return await route_handler(request)
+
+            return admitted_route_handler
+
+    return AdmissionRoute
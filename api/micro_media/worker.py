@@ -0,0 +1,115 @@
+"""
+Media processing worker, consumes the processing queue filled by uploads
+when `MEDIA_PROCESSING_MODE` is "queue".
+
+Usage: python -m micro_media.worker
+"""
+
+import os
+import socket
+import signal
+import asyncio
+import logging
+from uuid import UUID
+
+from redis.asyncio.client import Redis
+
+from micro_media.media.executors import IMAGE_EXECUTOR
+from micro_media.processing import (
+    MediaProcessingQueue,
+    process_media,
+    fail_media_processing,
+)
+from micro_media.settings import (
+    REDIS_URL,
+    REDIS_PREFIX,
+    MEDIA_PROCESSING_CONCURRENCY,
+    MEDIA_PROCESSING_MAX_ATTEMPTS,
+)
+
+
+logger = logging.getLogger("micro_media.worker")
+
+
+async def handle_job(job_id: str, fields: dict[str, str]) -> None:
+    media_id = UUID(fields["media_id"])
+
+    try:
+        if not await process_media(
+            media_id=media_id, filename=fields["filename"]
+        ):
+            # Left pending, the worker holding the media may still fail
+            return
+
+    except ValueError as exc:
+        logger.warning("Media %s is invalid: %s", media_id, exc)
+        await fail_media_processing(media_id)
+
+    except Exception:
+        logger.exception("Could not process media %s.", media_id)
+
+        # Left pending to be claimed again once it's idle long enough
+        delivery_count = await MediaProcessingQueue.get_delivery_count(job_id)
+        if delivery_count < MEDIA_PROCESSING_MAX_ATTEMPTS:
+            return
+
+        await fail_media_processing(media_id)
+
+    await MediaProcessingQueue.ack(job_id)
+
+
+async def run(consumer: str) -> None:
+    redis = Redis.from_url(REDIS_URL, decode_responses=True)
+    await redis.ping()
+    MediaProcessingQueue.init(redis=redis, prefix=REDIS_PREFIX)
+    await MediaProcessingQueue.create_group()
+
+    await IMAGE_EXECUTOR.start()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    slots = asyncio.Semaphore(MEDIA_PROCESSING_CONCURRENCY)
+    tasks: set[asyncio.Task] = set()
+
+    def release(task: asyncio.Task) -> None:
+        tasks.discard(task)
+        slots.release()
+
+    logger.info("Worker %s started.", consumer)
+
+    while not stopping.is_set():
+        # Only take jobs which can be started right away
+        await slots.acquire()
+
+        try:
+            jobs = await MediaProcessingQueue.read(consumer=consumer)
+        except BaseException:
+            slots.release()
+            raise
+
+        if not jobs:
+            slots.release()
+            continue
+
+        for job_id, fields in jobs:
+            task = asyncio.create_task(handle_job(job_id, fields))
+            task.add_done_callback(release)
+            tasks.add(task)
+
+    logger.info("Worker %s stopping.", consumer)
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    IMAGE_EXECUTOR.shutdown()
+    await redis.aclose()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(consumer=f"{socket.gethostname()}-{os.getpid()}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import os
+from uuid import uuid4
+from typing import Iterator
+
+import boto3
+import pytest
+import fakeredis
+from moto.server import ThreadedMotoServer
+
+
+# Database tests run against this database only, its tables are dropped
+# and created for every test
+TEST_SQLALCHEMY_CONN_STR = os.environ.get("TEST_SQLALCHEMY_CONN_STR")
+if TEST_SQLALCHEMY_CONN_STR:
+    os.environ["SQLALCHEMY_CONN_STR"] = TEST_SQLALCHEMY_CONN_STR
+
+# Settings are read on import, tests only need placeholders
+for name, value in {
+    "JWT_DECODE_KEY": "test",
+    "JWT_DECODE_ALGORITHMS": "HS256",
+    "CORS_ALLOWED_ORIGINS": "*",
+    "SQLALCHEMY_CONN_STR": "postgresql+asyncpg://test@localhost/test",
+    "IMGPROXY_HOST": "http://localhost:8080",
+    "IMGPROXY_KEY": "aabb",
+    "IMGPROXY_SALT": "ccdd",
+    "REDIS_URL": "redis://localhost",
+    "STORAGE_CONFIG_FILE": "storage.yml.example",
+    "MEDIA_CONFIG_FILE": "media.yml.example",
+}.items():
+    os.environ.setdefault(name, value)
+
+from micro_media.models import Base, _engine  # noqa: E402
+from micro_media.storage import S3StorageManager  # noqa: E402
+from micro_media.storage.config import (  # noqa: E402
+    S3_MIN_PART_SIZE,
+    S3Config,
+    Storage,
+)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def redis():
+    """An in-memory Redis, empty for every test."""
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    yield client
+
+    await client.aclose()
+
+
+@pytest.fixture
+async def database():
+    """Empty tables of the test database, skips tests without one."""
+    if not TEST_SQLALCHEMY_CONN_STR:
+        pytest.skip("TEST_SQLALCHEMY_CONN_STR is not set.")
+
+    async with _engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    yield
+
+    # Pooled connections belong to the test's event loop
+    await _engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def s3_endpoint_url() -> Iterator[str]:
+    """A local moto S3 server's url."""
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+
+    server.stop()
+
+
+@pytest.fixture
+def s3_storage(s3_endpoint_url: str) -> Storage:
+    """A storage with its own, empty bucket and the smallest parts."""
+    storage = Storage(
+        id=uuid4(),
+        s3=S3Config(
+            endpoint_url=s3_endpoint_url,
+            region_name="us-east-1",
+            access_key_id="test",
+            secret_access_key="test",
+            bucket_name=f"test-{uuid4()}",
+            multipart_threshold=S3_MIN_PART_SIZE,
+            multipart_part_size=S3_MIN_PART_SIZE,
+            multipart_max_concurrency=2,
+        ),
+    )
+    return storage
+
+
+@pytest.fixture
+def s3_client(s3_storage: Storage):
+    """A synchronous client of the storage's bucket, to inspect it."""
+    client = boto3.client(
+        "s3",
+        endpoint_url=s3_storage.s3.endpoint_url,
+        region_name=s3_storage.s3.region_name,
+        aws_access_key_id=s3_storage.s3.access_key_id,
+        aws_secret_access_key=s3_storage.s3.secret_access_key,
+    )
+    client.create_bucket(Bucket=s3_storage.s3.bucket_name)
+
+    return client
+
+
+@pytest.fixture
+async def storage_manager(s3_storage: Storage, s3_client):
+    """A manager of the storage, with its bucket created."""
+    manager = S3StorageManager(s3_storage)
+    yield manager
+
+    if manager._client:
+        await manager._client.__aexit__(None, None, None)
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from micro_media.media.admission import AdmissionController
+from micro_media.media.exceptions import MediaProcessingUnavailableError
+
+
+pytestmark = pytest.mark.anyio
+
+
+def _controller(**kwargs) -> AdmissionController:
+    return AdmissionController(
+        **{
+            "name": "test",
+            "max_concurrency": 1,
+            "max_queue_size": 0,
+            "queue_timeout": 1,
+            **kwargs,
+        }
+    )
+
+
+async def test_full_queue_is_rejected_right_away():
+    controller = _controller()
+
+    async with controller.admit():
+        with pytest.raises(MediaProcessingUnavailableError) as exc_info:
+            async with controller.admit():
+                pass
+
+    assert exc_info.value.retry_after is not None
+    assert exc_info.value.retry_after >= 1
+
+    # Freed once the job is done
+    async with controller.admit():
+        pass
+
+
+async def test_waiting_job_times_out():
+    controller = _controller(max_queue_size=1, queue_timeout=0.05)
+
+    async with controller.admit():
+        with pytest.raises(MediaProcessingUnavailableError) as exc_info:
+            async with controller.admit():
+                pass
+
+        assert controller.queue_depth == 0
+
+    assert isinstance(exc_info.value.__cause__, TimeoutError)
+
+
+async def test_waiting_job_is_admitted_once_a_slot_is_free():
+    controller = _controller(max_queue_size=1)
+    admitted = asyncio.Event()
+
+    async def job():
+        async with controller.admit():
+            admitted.set()
+
+    async with controller.admit():
+        task = asyncio.create_task(job())
+        await asyncio.sleep(0.01)
+
+        assert controller.queue_depth == 1
+        assert not admitted.is_set()
+
+    await task
+    assert admitted.is_set()
+
+
+async def test_retry_after_grows_with_the_queue():
+    controller = _controller(max_concurrency=2, max_queue_size=10)
+    controller._service_time = 3
+
+    assert controller.retry_after == 2
+
+    controller._waiting = 5
+    assert controller.retry_after == 9
+
+
+async def test_jobs_wait_for_the_memory_budget():
+    controller = _controller(
+        max_concurrency=3, max_queue_size=3, memory_budget=100
+    )
+    order: list[str] = []
+
+    async def job(name: str, cost: int, duration: float):
+        async with controller.admit(cost=cost):
+            order.append(name)
+            await asyncio.sleep(duration)
+
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(job("first", 60, 0.05))
+        await asyncio.sleep(0.01)
+        tg.create_task(job("second", 60, 0))
+        tg.create_task(job("small", 40, 0))
+
+    # The small job fits next to the first one, the second waits for it
+    assert order == ["first", "small", "second"]
+    assert controller._memory_used == 0
+
+
+async def test_job_exceeding_the_budget_runs_alone():
+    controller = _controller(
+        max_concurrency=2, max_queue_size=2, memory_budget=100
+    )
+    running: list[int] = []
+    peak = 0
+
+    async def job(cost: int):
+        nonlocal peak
+
+        async with controller.admit(cost=cost):
+            running.append(cost)
+            peak = max(peak, len(running))
+            await asyncio.sleep(0.02)
+            running.remove(cost)
+
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(job(500))
+        await asyncio.sleep(0.01)
+        tg.create_task(job(10))
+
+    assert peak == 1
@@ -0,0 +1,95 @@
+import io
+import os
+import pickle
+
+import pytest
+
+from micro_media.utils.buffers import (
+    MediaBuffer,
+    MemoryViewReader,
+    TeeWriter,
+    iter_chunks,
+)
+
+
+CONTENT = os.urandom(10_000)
+
+
+def test_memory_view_reader_reads_and_seeks():
+    with io.BufferedReader(MemoryViewReader(memoryview(CONTENT))) as file:
+        assert file.read(10) == CONTENT[:10]
+
+        file.seek(-5, os.SEEK_END)
+        assert file.read() == CONTENT[-5:]
+
+        file.seek(100)
+        assert file.read(5) == CONTENT[100:105]
+
+
+def test_tee_writer_hands_chunks_to_the_sink():
+    file = io.BytesIO()
+    chunks: list[bytes] = []
+
+    with TeeWriter(file, chunks.append) as tee:
+        tee.write(b"abc")
+        tee.write(memoryview(b"def"))
+
+    assert file.getvalue() == b"abcdef"
+    assert chunks == [b"abc", b"def"]
+
+
+def test_media_buffer_is_viewed_in_memory_only():
+    buffer = MediaBuffer(max_size=len(CONTENT))
+    buffer.write(CONTENT)
+
+    assert buffer.in_memory
+    with buffer.getbuffer() as view:
+        assert view == CONTENT
+    with pytest.raises(io.UnsupportedOperation):
+        buffer.fileno()
+
+    buffer.write(b"spooled")
+
+    assert not buffer.in_memory
+    with pytest.raises(io.UnsupportedOperation):
+        buffer.getbuffer()
+    assert buffer.fileno() >= 0
+
+
+@pytest.mark.parametrize("max_size", [len(CONTENT), 10])
+def test_media_buffer_is_pickled_with_its_content(max_size: int):
+    buffer = MediaBuffer(max_size=max_size)
+    buffer.write(CONTENT)
+    buffer.seek(42)
+
+    restored = pickle.loads(pickle.dumps(buffer))
+
+    assert buffer.tell() == 42
+    assert restored.read() == CONTENT
+    assert restored._max_size == max_size
+
+
+@pytest.mark.parametrize(
+    "file",
+    [
+        io.BytesIO(CONTENT),
+        io.BufferedReader(io.BytesIO(CONTENT)),
+    ],
+    ids=["in-memory", "read"],
+)
+def test_iter_chunks_yields_the_whole_content(file):
+    chunks = [bytes(chunk) for chunk in iter_chunks(file, 4096)]
+
+    assert [len(chunk) for chunk in chunks] == [4096, 4096, 1808]
+    assert b"".join(chunks) == CONTENT
+
+
+def test_iter_chunks_releases_the_view():
+    buffer = MediaBuffer(max_size=len(CONTENT))
+    buffer.write(CONTENT)
+
+    for _ in iter_chunks(buffer, 4096):
+        pass
+
+    # A view still held would keep the buffer from growing
+    buffer.write(b"more")
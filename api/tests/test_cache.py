@@ -0,0 +1,188 @@
+import asyncio
+
+import pytest
+
+from micro_media.utils.cache import AsyncRedisCache
+
+
+pytestmark = pytest.mark.anyio
+
+PREFIX = "test:cache:"
+
+
+@pytest.fixture(autouse=True)
+def cache(redis):
+    AsyncRedisCache.init(redis=redis, prefix=PREFIX)
+
+
+def _cached(calls: list[str], **kwargs):
+    @AsyncRedisCache.aredis_cache(
+        key_generator=lambda key: key,
+        cache_serializer=str,
+        cache_deserializer=str,
+        **{"ttl": 60, **kwargs},
+    )
+    async def load(key: str) -> str:
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return f"value-{len(calls)}"
+
+    return load
+
+
+async def test_result_is_cached_in_redis(redis):
+    calls: list[str] = []
+    load = _cached(calls)
+
+    assert await load("a") == "value-1"
+    assert await load("a") == "value-1"
+
+    assert calls == ["a"]
+    assert await redis.get(PREFIX + "a") == "value-1"
+    assert 0 < await redis.ttl(PREFIX + "a") <= 60
+
+
+async def test_concurrent_calls_share_a_lookup():
+    calls: list[str] = []
+    load = _cached(calls)
+
+    results = await asyncio.gather(*(load("a") for _ in range(5)))
+
+    assert results == ["value-1"] * 5
+    assert calls == ["a"]
+
+
+async def test_cancelled_caller_does_not_cancel_the_shared_lookup():
+    calls: list[str] = []
+    load = _cached(calls)
+
+    first = asyncio.create_task(load("a"))
+    second = asyncio.create_task(load("a"))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "value-1"
+    assert calls == ["a"]
+
+
+async def test_l1_entry_does_not_outlive_the_redis_entry(redis):
+    calls: list[str] = []
+    load = _cached(calls, l1_maxsize=10, l1_ttl=30)
+    await redis.setex(PREFIX + "a", 2, "stale")
+
+    assert await load("a") == "stale"
+
+    # Replaced behind the process' back, a 30 second L1 entry would
+    # still serve the stale value
+    await redis.set(PREFIX + "a", "fresh")
+    assert await load("a") == "stale"
+
+    await asyncio.sleep(2.1)
+    assert await load("a") == "fresh"
+    assert not calls
+
+
+async def test_l1_entry_is_served_without_redis(redis):
+    calls: list[str] = []
+    load = _cached(calls, l1_maxsize=10, l1_ttl=30)
+
+    assert await load("a") == "value-1"
+    await redis.delete(PREFIX + "a")
+
+    assert await load("a") == "value-1"
+    assert calls == ["a"]
+
+
+async def test_invalidate_drops_both_tiers(redis):
+    calls: list[str] = []
+    load = _cached(calls, l1_maxsize=10, l1_ttl=30)
+
+    assert await load("a") == "value-1"
+    await load.invalidate("a")
+
+    assert await redis.get(PREFIX + "a") is None
+    assert await load("a") == "value-2"
+
+
+async def test_invalidate_during_a_lookup_does_not_cache_it(redis):
+    versions = ["old", "new"]
+    gate = asyncio.Event()
+
+    @AsyncRedisCache.aredis_cache(
+        key_generator=lambda key: key,
+        cache_serializer=str,
+        cache_deserializer=str,
+        ttl=60,
+        l1_maxsize=10,
+        l1_ttl=30,
+    )
+    async def load(key: str) -> str:
+        version = versions.pop(0)
+        await gate.wait()
+        return version
+
+    first = asyncio.create_task(load("a"))
+    await asyncio.sleep(0.01)
+    await load.invalidate("a")
+
+    # Waiting callers get the detached lookup's result, later ones don't
+    second = asyncio.create_task(load("a"))
+    await asyncio.sleep(0.01)
+    gate.set()
+
+    assert await first == "old"
+    assert await second == "new"
+    assert await redis.get(PREFIX + "a") == "new"
+    assert await load("a") == "new"
+
+
+async def test_locked_computation_is_waited_for(redis):
+    calls: list[str] = []
+    load = _cached(calls, lock_timeout=5)
+
+    async def compute_elsewhere():
+        await asyncio.sleep(0.1)
+        await redis.set(PREFIX + "a", "elsewhere")
+        await redis.delete(PREFIX + "lock:a")
+
+    await redis.set(PREFIX + "lock:a", "token")
+    task = asyncio.create_task(compute_elsewhere())
+
+    assert await load("a") == "elsewhere"
+    assert not calls
+    await task
+
+
+async def test_failed_locked_computation_is_not_waited_out(redis):
+    calls: list[str] = []
+    load = _cached(calls, lock_timeout=5)
+
+    async def fail_elsewhere():
+        await asyncio.sleep(0.1)
+        await redis.delete(PREFIX + "lock:a")
+
+    await redis.set(PREFIX + "lock:a", "token")
+    task = asyncio.create_task(fail_elsewhere())
+
+    async with asyncio.timeout(1):
+        assert await load("a") == "value-1"
+
+    assert calls == ["a"]
+    await task
+
+
+async def test_many_computes_only_the_missing_results(redis):
+    calls: list[str] = []
+    load = _cached(calls, l1_maxsize=10, l1_ttl=30)
+    await redis.set(PREFIX + "cached", "cached")
+
+    async def compute_many(arguments: list[tuple]) -> list[str | None]:
+        calls.extend(key for key, in arguments)
+        return [None if key == "none" else key.upper() for key, in arguments]
+
+    results = await load.many([("cached",), ("new",), ("none",)], compute_many)
+
+    assert results == ["cached", "NEW", None]
+    assert calls == ["new", "none"]
+    assert await redis.get(PREFIX + "new") == "NEW"
+    assert await redis.get(PREFIX + "none") is None
@@ -0,0 +1,153 @@
+import io
+from uuid import UUID, uuid4
+
+import pytest
+from PIL import Image
+from sqlalchemy.exc import IntegrityError, NoResultFound
+
+from micro_media.models import AsyncSessionLocal, Media
+from micro_media.media.config import (
+    ImageMediaConfig,
+    ImageMediaOutputFormatConfig,
+    ImageMediaOutputFormatsConfig,
+)
+from micro_media.media.manager import ImageMediaManager
+from micro_media.uploads import save_output_format
+
+
+pytestmark = pytest.mark.anyio
+
+OWNER_ID = UUID("2f6d5c1e-8d1a-4f6e-9a57-3c1e7b0f4d21")
+CONTENT_HASH = "0" * 64
+
+WEBP = ImageMediaOutputFormatConfig(
+    pil_format="WEBP", file_extension="webp", content_type="image/webp"
+)
+
+
+def _media(storage_id: UUID, file_identifier: str, **kwargs) -> Media:
+    return Media(
+        id=uuid4(),
+        media_type="image",
+        owner_id=OWNER_ID,
+        storage_id=storage_id,
+        file_identifier=file_identifier,
+        **kwargs,
+    )
+
+
+async def _insert(*media: Media) -> None:
+    async with AsyncSessionLocal() as session:
+        session.add_all(media)
+        await session.commit()
+
+
+async def test_deduplicated_media_share_files(database):
+    storage_id = uuid4()
+
+    await _insert(
+        _media(storage_id, "a.png", content_hash=CONTENT_HASH),
+        _media(storage_id, "a.png", content_hash=CONTENT_HASH),
+    )
+
+
+async def test_other_media_do_not_share_files(database):
+    storage_id = uuid4()
+    await _insert(_media(storage_id, "a.png"))
+
+    with pytest.raises(IntegrityError):
+        await _insert(_media(storage_id, "a.png"))
+
+    # Unless they're in different storages
+    await _insert(_media(uuid4(), "a.png"))
+
+
+@pytest.fixture
+def image(storage_manager, s3_client) -> str:
+    """A stored PNG's file identifier."""
+    file = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(file, format="PNG")
+    s3_client.put_object(
+        Bucket=storage_manager.storage_conf.bucket_name,
+        Key="image/2f6d5c1e/a.png",
+        Body=file.getvalue(),
+    )
+
+    return "image/2f6d5c1e/a.png"
+
+
+@pytest.fixture
+def media_manager() -> ImageMediaManager:
+    return ImageMediaManager(
+        ImageMediaConfig(
+            max_file_size=1024 * 1024,
+            allowed_formats=["png"],
+            output_formats=ImageMediaOutputFormatsConfig(formats=[WEBP]),
+        ),
+        media_type="image",
+    )
+
+
+async def test_variant_is_recorded_for_media_sharing_the_file(
+    database, storage_manager, media_manager, image: str
+):
+    media = [
+        _media(storage_manager.storage_id, image, content_hash=CONTENT_HASH)
+        for _ in range(2)
+    ]
+    await _insert(*media)
+
+    file_identifier = await save_output_format(
+        storage_manager=storage_manager,
+        media_manager=media_manager,
+        media=media[0],
+        output_format=WEBP,
+    )
+
+    async with AsyncSessionLocal() as session:
+        for shared in media:
+            shared = await session.get(Media, shared.id)
+            assert shared.variants == {"webp": file_identifier}
+
+
+async def test_variant_is_kept_while_the_file_is_shared(
+    database, storage_manager, media_manager, image: str, s3_client
+):
+    deleted = _media(
+        storage_manager.storage_id, image, content_hash=CONTENT_HASH
+    )
+    await _insert(
+        _media(storage_manager.storage_id, image, content_hash=CONTENT_HASH)
+    )
+
+    with pytest.raises(NoResultFound):
+        await save_output_format(
+            storage_manager=storage_manager,
+            media_manager=media_manager,
+            media=deleted,
+            output_format=WEBP,
+        )
+
+    assert s3_client.head_object(
+        Bucket=storage_manager.storage_conf.bucket_name,
+        Key="image/2f6d5c1e/a_webp.webp",
+    )
+
+
+async def test_variant_of_an_unreferenced_file_is_deleted(
+    database, storage_manager, media_manager, image: str, s3_client
+):
+    with pytest.raises(NoResultFound):
+        await save_output_format(
+            storage_manager=storage_manager,
+            media_manager=media_manager,
+            media=_media(storage_manager.storage_id, image),
+            output_format=WEBP,
+        )
+
+    assert [
+        obj["Key"]
+        for obj in s3_client.list_objects_v2(
+            Bucket=storage_manager.storage_conf.bucket_name
+        )["Contents"]
+    ] == [image]
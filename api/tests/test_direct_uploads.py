@@ -0,0 +1,102 @@
+import asyncio
+from uuid import UUID
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from micro_media.models import AsyncSessionLocal, Media
+from micro_media.schemas import JWTUser, v1 as schemas
+from micro_media.routers.v1.user import media as user_media
+from micro_media.direct_uploads import DirectUploads
+
+
+pytestmark = pytest.mark.anyio
+
+OWNER_ID = UUID("2f6d5c1e-8d1a-4f6e-9a57-3c1e7b0f4d21")
+# Shares the 8 characters which object keys are prefixed with
+NEIGHBOR_ID = UUID("2f6d5c1e-0000-4000-8000-000000000000")
+KEY = "image/2f6d5c1e/a.jpg"
+
+
+@pytest.fixture(autouse=True)
+def direct_uploads(redis):
+    DirectUploads.init(redis=redis, prefix="test:direct_uploads:")
+
+
+async def test_issued_key_is_only_the_owners():
+    await DirectUploads.issue(KEY, owner_id=OWNER_ID, expires_in=60)
+
+    assert await DirectUploads.is_issued_to(KEY, owner_id=OWNER_ID)
+    assert not await DirectUploads.is_issued_to(KEY, owner_id=NEIGHBOR_ID)
+
+
+async def test_unissued_key_is_nobodys():
+    assert not await DirectUploads.is_issued_to(KEY, owner_id=OWNER_ID)
+
+
+async def test_issued_key_expires(redis):
+    await DirectUploads.issue(KEY, owner_id=OWNER_ID, expires_in=60)
+
+    ttl = await redis.ttl("test:direct_uploads:" + KEY)
+    assert 60 < ttl <= 60 + 60 * 60
+
+
+@pytest.fixture
+def uploaded(storage_manager, s3_client, monkeypatch: pytest.MonkeyPatch):
+    """A document uploaded directly to a key issued to the owner."""
+    monkeypatch.setattr(
+        user_media, "SC", SimpleNamespace(default_manager=storage_manager)
+    )
+    file_identifier = storage_manager._get_object_key_prefix(
+        "document", OWNER_ID
+    ) + "a.pdf"
+    s3_client.put_object(
+        Bucket=storage_manager.storage_conf.bucket_name,
+        Key=file_identifier,
+        Body=b"%PDF-1.7\n",
+    )
+
+    return file_identifier
+
+
+async def _finalize(file_identifier: str) -> Media:
+    async with AsyncSessionLocal() as session:
+        return await user_media.finalize_media_upload(
+            user=JWTUser(sub=OWNER_ID),
+            data=schemas.MediaUploadFinalize(
+                media_type="document", file_identifier=file_identifier
+            ),
+            session=session,
+        )
+
+
+async def test_finalized_upload_is_not_finalized_again(
+    database, uploaded: str
+):
+    await DirectUploads.issue(uploaded, owner_id=OWNER_ID, expires_in=60)
+
+    media = await _finalize(uploaded)
+    assert media.file_identifier == uploaded
+
+    with pytest.raises(HTTPException) as exc_info:
+        await _finalize(uploaded)
+
+    assert exc_info.value.status_code == 409
+
+
+async def test_concurrent_finalizations_insert_one_media(
+    database, uploaded: str
+):
+    await DirectUploads.issue(uploaded, owner_id=OWNER_ID, expires_in=60)
+
+    results = await asyncio.gather(
+        _finalize(uploaded), _finalize(uploaded), return_exceptions=True
+    )
+
+    assert sum(isinstance(result, Media) for result in results) == 1
+    assert [
+        result.status_code
+        for result in results
+        if isinstance(result, HTTPException)
+    ] == [409]
@@ -0,0 +1,85 @@
+import io
+import os
+import time
+import asyncio
+from typing import BinaryIO
+
+import pytest
+
+from micro_media.media.exceptions import MediaProcessingUnavailableError
+from micro_media.media.executors import ProcessMediaExecutor
+
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = os.urandom(100_000)
+
+
+# Jobs are pickled by reference, so they must be importable
+def read_job(filename: str, file: BinaryIO) -> tuple[str, bytes, BinaryIO]:
+    return filename, file.read(), file
+
+
+def sleep_job(filename: str, file: BinaryIO) -> None:
+    time.sleep(float(file.read()))
+
+
+@pytest.fixture
+async def executor():
+    executor = ProcessMediaExecutor(
+        max_workers=1, max_queue_size=0, timeout=10
+    )
+    await executor.start()
+    yield executor
+
+    executor.shutdown()
+
+
+async def test_file_round_trips_through_shared_memory(
+    executor: ProcessMediaExecutor,
+):
+    file = io.BytesIO(CONTENT)
+    file.seek(10)
+
+    filename, content, same_file = await executor.run(read_job, "a.png", file)
+
+    assert filename == "a.png"
+    assert content == CONTENT
+    # The untouched file comes back as the caller's own, rewound
+    assert same_file is file
+    assert file.tell() == 0
+
+
+async def test_full_queue_fails_fast(executor: ProcessMediaExecutor):
+    running = asyncio.create_task(
+        executor.run(sleep_job, "a.png", io.BytesIO(b"0.5"))
+    )
+    await asyncio.sleep(0)
+
+    started_at = time.monotonic()
+    with pytest.raises(MediaProcessingUnavailableError):
+        await executor.run(read_job, "b.png", io.BytesIO(CONTENT))
+
+    assert time.monotonic() - started_at < 0.1
+    await running
+
+    # The slot is free again once the job is done
+    _, content, _ = await executor.run(read_job, "c.png", io.BytesIO(b"c"))
+    assert content == b"c"
+
+
+async def test_timed_out_job_is_reported_as_unavailable():
+    executor = ProcessMediaExecutor(
+        max_workers=1, max_queue_size=0, timeout=0.1
+    )
+
+    try:
+        with pytest.raises(MediaProcessingUnavailableError):
+            await executor.run(sleep_job, "a.png", io.BytesIO(b"1"))
+
+        # The job keeps its slot and shared memory until it's done
+        assert executor._slots.locked()
+        while executor._slots.locked():
+            await asyncio.sleep(0.05)
+    finally:
+        executor.shutdown()
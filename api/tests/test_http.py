@@ -0,0 +1,68 @@
+from micro_media.media.config import (
+    ImageMediaConfig,
+    ImageMediaOutputFormatConfig,
+    ImageMediaOutputFormatsConfig,
+)
+from micro_media.media.manager import ImageMediaManager
+from micro_media.utils.http import parse_accept
+
+
+def test_media_ranges_are_lowercased_with_their_quality():
+    assert parse_accept("Image/WebP;q=0.8, image/*;Q=0.5, */*") == {
+        "image/webp": 0.8,
+        "image/*": 0.5,
+        "*/*": 1.0,
+    }
+
+
+def test_missing_header_accepts_nothing():
+    assert parse_accept(None) == {}
+    assert parse_accept(" , ") == {}
+
+
+def test_zero_quality_is_kept_and_invalid_ones_dropped():
+    assert parse_accept("image/avif;q=0, image/webp;q=2, image/png;q=x") == {
+        "image/avif": 0.0
+    }
+
+
+def test_repeated_ranges_keep_their_highest_quality():
+    assert parse_accept("image/webp;q=0.2, image/webp;q=0.6") == {
+        "image/webp": 0.6
+    }
+
+
+def _manager(*content_types: str) -> ImageMediaManager:
+    return ImageMediaManager(
+        ImageMediaConfig(
+            max_file_size=1024,
+            allowed_formats=["png"],
+            output_formats=ImageMediaOutputFormatsConfig(
+                formats=[
+                    ImageMediaOutputFormatConfig(
+                        pil_format=content_type.split("/")[1],
+                        file_extension=content_type.split("/")[1],
+                        content_type=content_type,
+                    )
+                    for content_type in content_types
+                ]
+            ),
+        ),
+        media_type="image",
+    )
+
+
+def test_configured_order_wins_over_the_clients():
+    manager = _manager("image/webp", "image/png")
+    output_format = manager.negotiate_output_format(
+        "image/png, image/webp;q=0.5"
+    )
+
+    assert output_format and output_format.content_type == "image/webp"
+
+
+def test_wildcards_and_refused_formats_are_not_negotiated():
+    manager = _manager("image/webp")
+
+    assert manager.negotiate_output_format("image/*, */*") is None
+    assert manager.negotiate_output_format("image/webp;q=0") is None
@@ -0,0 +1,78 @@
+import io
+import zlib
+import struct
+
+import pytest
+from PIL import Image
+
+from micro_media.media import ImageTooLargeError
+from micro_media.media.config import ImageMediaConfig
+from micro_media.media.manager import ImageMediaManager
+
+pytestmark = pytest.mark.anyio
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data))
+    )
+
+
+def _png_header(width: int, height: int) -> io.BytesIO:
+    # A valid header followed by undecodable pixel data
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return io.BytesIO(
+        b"\x89PNG\r\n\x1a\n"
+        + _chunk(b"IHDR", ihdr)
+        + _chunk(b"IDAT", b"not deflated")
+        + _chunk(b"IEND", b"")
+    )
+
+
+def _manager(max_pixels: int | None) -> ImageMediaManager:
+    return ImageMediaManager(
+        ImageMediaConfig(
+            max_file_size=1024, allowed_formats=["png"], max_pixels=max_pixels
+        ),
+        media_type="image",
+    )
+
+
+@pytest.fixture(autouse=True)
+def decompression_limit(monkeypatch):
+    # Restored after each test, managers change it
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", Image.MAX_IMAGE_PIXELS)
+
+
+async def test_header_above_max_pixels_is_rejected_before_decode():
+    with pytest.raises(ImageTooLargeError) as exc_info:
+        await _manager(max_pixels=1000).avalidate_media(
+            "a.png", _png_header(100, 100)
+        )
+
+    assert exc_info.value.pixels == 10000
+    assert exc_info.value.max_pixels == 1000
+
+
+async def test_pillow_bomb_check_is_reported_as_too_large():
+    manager = _manager(max_pixels=None)
+    Image.MAX_IMAGE_PIXELS = 1000
+
+    with pytest.raises(ImageTooLargeError) as exc_info:
+        await manager.avalidate_media("a.png", _png_header(100, 100))
+
+    assert exc_info.value.pixels is None
+    assert exc_info.value.max_pixels == 2000
+
+
+def test_decompression_limit_is_raised_to_the_largest_max_pixels():
+    Image.MAX_IMAGE_PIXELS = 1000
+
+    _manager(max_pixels=5000)
+    _manager(max_pixels=2000)
+    _manager(max_pixels=None)
+
+    assert Image.MAX_IMAGE_PIXELS == 5000
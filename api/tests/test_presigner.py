@@ -0,0 +1,137 @@
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlsplit
+
+import boto3
+import pytest
+from botocore.config import Config
+
+from micro_media.links import LINK_CACHE_TTL, LINK_EXPIRES_IN
+from micro_media.storage import presigner as presigner_module
+from micro_media.storage.presigner import (
+    AMZ_DATE_FORMAT,
+    S3Presigner,
+    get_link_expiry,
+)
+
+
+ACCESS_KEY_ID = "AKIDEXAMPLE"
+SECRET_ACCESS_KEY = "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY"
+
+KEYS = [
+    "image/ffa45b1e/0b6c5a3e-1f0e-4a4e-9c57-7d3b1b0e8f3a.jpg",
+    "a/b c~+=&?#%.jpg",
+    "sp ace/!*'()$,;:@.txt",
+    "a//b/./../c",
+    "é/日本.png",
+]
+
+
+@pytest.mark.parametrize(
+    ("bucket_name", "region_name", "endpoint_url"),
+    [
+        pytest.param("media-bucket", None, None, id="aws-virtual-host"),
+        pytest.param("media.bucket", None, None, id="aws-dotted-bucket"),
+        pytest.param("media-bucket", "eu-west-1", None, id="aws-eu-west-1"),
+        pytest.param(
+            "media.bucket", "eu-west-1", None, id="aws-eu-west-1-dotted"
+        ),
+        pytest.param(
+            "media-bucket",
+            None,
+            "http://localhost:9000",
+            id="custom-endpoint-port",
+        ),
+        pytest.param(
+            "media-bucket",
+            "ir-thr",
+            "https://s3.ir-thr-at1.arvanstorage.ir",
+            id="custom-endpoint-region",
+        ),
+        pytest.param(
+            "media-bucket",
+            "eu-west-1",
+            "https://storage.example.com:8443/base/",
+            id="custom-endpoint-path",
+        ),
+    ],
+)
+@pytest.mark.parametrize("key", KEYS)
+@pytest.mark.parametrize("expires_in", [60, 3600])
+def test_presign_matches_botocore(
+    bucket_name: str,
+    region_name: str | None,
+    endpoint_url: str | None,
+    key: str,
+    expires_in: int,
+):
+    client = boto3.client(
+        "s3",
+        region_name=region_name or "us-east-1",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=ACCESS_KEY_ID,
+        aws_secret_access_key=SECRET_ACCESS_KEY,
+        config=Config(signature_version="s3v4"),
+    )
+    presigner = S3Presigner(
+        access_key_id=ACCESS_KEY_ID,
+        secret_access_key=SECRET_ACCESS_KEY,
+        bucket_name=bucket_name,
+        region_name=region_name,
+        endpoint_url=endpoint_url,
+    )
+
+    expected = client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": bucket_name, "Key": key},
+        ExpiresIn=expires_in,
+    )
+    # Signed at the same second, as links embed their signing time
+    signed_at = datetime.strptime(
+        parse_qs(urlsplit(expected).query)["X-Amz-Date"][0], AMZ_DATE_FORMAT
+    ).replace(tzinfo=timezone.utc)
+
+    assert presigner.presign(key, expires_in, signed_at) == expected
+    assert presigner.presign_many([key, key], expires_in, signed_at) == [
+        expected,
+        expected,
+    ]
+
+
+WINDOW = 15 * 60
+WINDOW_START = 1_700_000_100 // WINDOW * WINDOW
+
+
+def _windowed_presigner() -> S3Presigner:
+    return S3Presigner(
+        access_key_id=ACCESS_KEY_ID,
+        secret_access_key=SECRET_ACCESS_KEY,
+        bucket_name="media-bucket",
+        signing_window=WINDOW,
+    )
+
+
+def _presign_at(monkeypatch, now: float, expires_in: int = 3600) -> str:
+    monkeypatch.setattr(presigner_module.time, "time", lambda: now)
+    return _windowed_presigner().presign(KEYS[0], expires_in)
+
+
+def test_links_within_a_signing_window_are_identical(monkeypatch):
+    first = _presign_at(monkeypatch, WINDOW_START)
+    last = _presign_at(monkeypatch, WINDOW_START + WINDOW - 1)
+    next_window = _presign_at(monkeypatch, WINDOW_START + WINDOW)
+
+    assert first == last
+    assert next_window != first
+
+
+@pytest.mark.parametrize("elapsed", [0, 1, WINDOW // 2, WINDOW - 1])
+def test_signing_window_extends_validity_by_less_than_a_window(
+    monkeypatch, elapsed: int
+):
+    now = WINDOW_START + elapsed
+    link = _presign_at(monkeypatch, now, expires_in=LINK_EXPIRES_IN)
+
+    remaining = get_link_expiry(link) - now
+    assert LINK_EXPIRES_IN <= remaining <= LINK_EXPIRES_IN + WINDOW
+    # Cached links are always still valid when they're served
+    assert LINK_CACHE_TTL < remaining
@@ -0,0 +1,92 @@
+import time
+import asyncio
+from uuid import UUID
+
+import pytest
+from redis.exceptions import LockError, LockNotOwnedError
+
+from micro_media.resumable import ResumableUpload, ResumableUploads
+
+
+pytestmark = pytest.mark.anyio
+
+OWNER_ID = UUID("2f6d5c1e-8d1a-4f6e-9a57-3c1e7b0f4d21")
+
+
+@pytest.fixture(autouse=True)
+def resumable_uploads(redis):
+    ResumableUploads.init(redis=redis, prefix="test:resumable_uploads:")
+
+
+def _upload(offset: int = 0) -> ResumableUpload:
+    return ResumableUpload(
+        id="upload",
+        owner_id=OWNER_ID,
+        storage_id=OWNER_ID,
+        media_type="video",
+        filename="a.mp4",
+        file_identifier="video/2f6d5c1e/a.mp4",
+        upload_id="multipart",
+        length=100,
+        offset=offset,
+        expires_at=0,
+    )
+
+
+async def test_held_lock_outlives_its_timeout():
+    async with ResumableUploads.hold("upload", timeout=0.3):
+        await asyncio.sleep(0.6)
+
+        with pytest.raises(LockError):
+            async with ResumableUploads.hold("upload"):
+                pass
+
+    async with ResumableUploads.hold("upload"):
+        pass
+
+
+async def test_state_is_saved_while_the_lock_is_held():
+    async with ResumableUploads.hold("upload") as lock:
+        await ResumableUploads.save(_upload(offset=10), lock=lock)
+
+    upload = await ResumableUploads.get("upload")
+    assert upload and upload.offset == 10
+    assert upload.expires_at > time.time()
+
+
+async def test_state_is_not_saved_once_the_lock_is_lost(redis):
+    await ResumableUploads.save(_upload(offset=10))
+
+    async with ResumableUploads.hold("upload") as lock:
+        # Expired and taken over by another request
+        await redis.set(lock.name, "another")
+
+        with pytest.raises(LockNotOwnedError):
+            await ResumableUploads.save(_upload(offset=50), lock=lock)
+
+    upload = await ResumableUploads.get("upload")
+    assert upload and upload.offset == 10
+
+
+async def test_cleanup_runs_in_one_process_at_a_time(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    cleanups = 0
+
+    async def cleanup_expired() -> int:
+        nonlocal cleanups
+        cleanups += 1
+        await asyncio.sleep(0.05)
+        return 0
+
+    monkeypatch.setattr(ResumableUploads, "cleanup_expired", cleanup_expired)
+
+    tasks = [
+        asyncio.create_task(ResumableUploads.run_cleanup(interval=0.1))
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0.25)
+    for task in tasks:
+        task.cancel()
+
+    assert cleanups == 2
@@ -0,0 +1,82 @@
+import io
+import os
+
+import pytest
+
+from micro_media.storage import S3StorageManager
+from micro_media.storage.config import S3_MIN_PART_SIZE
+
+
+pytestmark = pytest.mark.anyio
+
+OWNER_ID = "2f6d5c1e-8d1a-4f6e-9a57-3c1e7b0f4d21"
+
+
+async def test_small_file_is_put_whole(
+    storage_manager: S3StorageManager, s3_client
+):
+    content = os.urandom(1024)
+
+    key = await storage_manager.save_media(
+        media_type="image",
+        owner_id=OWNER_ID,
+        filename="a.jpg",
+        file=io.BytesIO(content),
+    )
+
+    obj = s3_client.get_object(
+        Bucket=storage_manager.storage_conf.bucket_name, Key=key
+    )
+    assert obj["Body"].read() == content
+    assert "-" not in obj["ETag"]
+
+
+async def test_large_file_is_uploaded_in_parts(
+    storage_manager: S3StorageManager, s3_client
+):
+    content = os.urandom(S3_MIN_PART_SIZE * 2 + 1024)
+
+    key = await storage_manager.save_media(
+        media_type="video",
+        owner_id=OWNER_ID,
+        filename="a.mp4",
+        file=io.BytesIO(content),
+        content_type="video/mp4",
+    )
+
+    obj = s3_client.get_object(
+        Bucket=storage_manager.storage_conf.bucket_name, Key=key
+    )
+    assert obj["Body"].read() == content
+    assert obj["ContentType"] == "video/mp4"
+    # Multipart ETags end with their part count
+    assert obj["ETag"].strip('"').endswith("-3")
+
+
+async def test_failed_multipart_upload_is_aborted(
+    storage_manager: S3StorageManager,
+    s3_client,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    async with storage_manager.client() as client:
+        upload_part = client.upload_part
+
+        async def failing_upload_part(**kwargs):
+            if kwargs["PartNumber"] == 2:
+                raise ConnectionError("Part failed.")
+
+            return await upload_part(**kwargs)
+
+        monkeypatch.setattr(client, "upload_part", failing_upload_part)
+
+    with pytest.raises(ConnectionError):
+        await storage_manager.save_media(
+            media_type="video",
+            owner_id=OWNER_ID,
+            filename="a.mp4",
+            file=io.BytesIO(os.urandom(S3_MIN_PART_SIZE * 3)),
+        )
+
+    bucket = storage_manager.storage_conf.bucket_name
+    assert not s3_client.list_multipart_uploads(Bucket=bucket).get("Uploads")
+    assert not s3_client.list_objects_v2(Bucket=bucket).get("Contents")
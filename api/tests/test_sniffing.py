@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import pytest
+
+from micro_media.media.sniffing import SNIFF_SIZE, sniff_formats
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _head(filename: str) -> bytes:
+    with open(FIXTURES / filename, "rb") as file:
+        return file.read(SNIFF_SIZE)
+
+
+@pytest.mark.parametrize(
+    "filename, formats",
+    [
+        ("image.png", {"png"}),
+        ("image.jpg", {"jpg", "jpeg"}),
+        ("document.pdf", {"pdf"}),
+        ("document.odt", {"odt"}),
+        ("document.docx", {"docx"}),
+        ("spreadsheet.xlsx", {"xlsx"}),
+        ("presentation.pptx", {"pptx"}),
+    ],
+)
+def test_sniff_formats(filename, formats):
+    assert sniff_formats(_head(filename)) == formats
+
+
+@pytest.mark.parametrize("filename", ["thumbnail_first.docx", "archive.zip"])
+def test_sniff_undecided_zip(filename):
+    # The telling entries are beyond the head, any of them is possible
+    assert sniff_formats(_head(filename)) == {"docx", "xlsx", "pptx", "zip"}
+
+
+def test_sniff_unknown():
+    assert sniff_formats(b"plain text") == frozenset()
@@ -0,0 +1,122 @@
+import os
+import asyncio
+
+import pytest
+
+from micro_media.storage import S3StorageManager
+from micro_media.storage.config import S3_MIN_PART_SIZE
+from micro_media.storage.streaming import StreamingUpload
+
+
+pytestmark = pytest.mark.anyio
+
+OWNER_ID = "2f6d5c1e-8d1a-4f6e-9a57-3c1e7b0f4d21"
+
+
+def _upload(storage_manager: S3StorageManager) -> StreamingUpload:
+    return StreamingUpload(
+        storage_manager,
+        media_type="image",
+        owner_id=OWNER_ID,
+        filename="a.webp",
+        content_type="image/webp",
+    )
+
+
+async def _write(upload: StreamingUpload, content: bytes) -> None:
+    # Written in chunks from a worker thread, as encoders do
+    def write():
+        for offset in range(0, len(content), 1024 * 1024):
+            upload.write(content[offset : offset + 1024 * 1024])
+
+    await asyncio.to_thread(write)
+
+
+def _uploads(s3_client, bucket: str) -> list:
+    return s3_client.list_multipart_uploads(Bucket=bucket).get("Uploads", [])
+
+
+async def test_file_is_uploaded_while_written(
+    storage_manager: S3StorageManager, s3_client
+):
+    bucket = storage_manager.storage_conf.bucket_name
+    content = os.urandom(S3_MIN_PART_SIZE * 3 + 1024)
+    upload = _upload(storage_manager)
+
+    await _write(upload, content)
+    key = await upload.complete()
+
+    assert key
+    obj = s3_client.get_object(Bucket=bucket, Key=key)
+    assert obj["Body"].read() == content
+    assert obj["ETag"].strip('"').endswith("-4")
+    assert not _uploads(s3_client, bucket)
+
+
+async def test_small_file_is_left_to_the_caller(
+    storage_manager: S3StorageManager, s3_client
+):
+    upload = _upload(storage_manager)
+
+    await _write(upload, b"small")
+
+    assert await upload.complete() is None
+    assert not s3_client.list_objects_v2(
+        Bucket=storage_manager.storage_conf.bucket_name
+    ).get("Contents")
+
+
+async def test_upload_is_closed_after_complete(
+    storage_manager: S3StorageManager, s3_client
+):
+    bucket = storage_manager.storage_conf.bucket_name
+    upload = _upload(storage_manager)
+
+    await _write(upload, os.urandom(S3_MIN_PART_SIZE + 1))
+    key = await upload.complete()
+
+    with pytest.raises(RuntimeError):
+        await _write(upload, b"late")
+
+    # Aborting a completed upload leaves the file alone
+    await upload.abort()
+    assert s3_client.head_object(Bucket=bucket, Key=key)
+
+
+async def test_failed_upload_is_aborted(
+    storage_manager: S3StorageManager,
+    s3_client,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    bucket = storage_manager.storage_conf.bucket_name
+    upload_part = storage_manager.upload_part
+    part_started = asyncio.Event()
+
+    async def failing_upload_part(**kwargs):
+        if kwargs["part_number"] == 2:
+            raise ConnectionError("Part failed.")
+
+        if kwargs["part_number"] == 3:
+            # Still in flight when the failure is noticed
+            part_started.set()
+            await asyncio.sleep(0.2)
+
+        return await upload_part(**kwargs)
+
+    monkeypatch.setattr(storage_manager, "upload_part", failing_upload_part)
+    upload = _upload(storage_manager)
+
+    await _write(upload, os.urandom(S3_MIN_PART_SIZE * 3))
+    await part_started.wait()
+
+    with pytest.raises(ConnectionError):
+        await upload.complete()
+
+    assert _uploads(s3_client, bucket)
+    await upload.abort()
+
+    assert not _uploads(s3_client, bucket)
+    assert not s3_client.list_objects_v2(Bucket=bucket).get("Contents")
+
+    with pytest.raises(RuntimeError):
+        await _write(upload, os.urandom(S3_MIN_PART_SIZE))